@@ -1,32 +1,37 @@
 # TRD_BOT_V3/src/client/binance_client.py
 
 import logging
-import time
 import pandas as pd
-from binance.client import Client as BinancePyClient
 from binance.exceptions import BinanceAPIException
 
+from utils.metrics import timed_methods
+from client.request_scheduler import (
+    RequestScheduler, ScheduledClient, shared_scheduler, SPOT_WEIGHT_PER_MINUTE
+)
+
+@timed_methods("exchange.spot")
 class BinanceClient:
-    def __init__(self, api_key: str, api_secret: str, testnet: bool = True):
+    def __init__(self, api_key: str, api_secret: str, testnet: bool = True,
+                 scheduler: RequestScheduler = None, api_url: str = None):
         """
         Wrapper sobre python-binance.Client. Si testnet=True, apunta a Testnet.
+        Los rate limits los gestiona el scheduler (por defecto el compartido
+        "spot" del proceso): presupuesto de peso por minuto, prioridad para
+        órdenes y cancelaciones. api_url permite apuntar a un servidor local.
         """
+        self.scheduler = scheduler or shared_scheduler("spot", weight_per_minute=SPOT_WEIGHT_PER_MINUTE)
+        ping = api_url is None
         if testnet:
             # El constructor nativo de python-binance diferencia testnet mediante un flag
-            self.client = BinancePyClient(api_key, api_secret, testnet=True)
+            self.client = ScheduledClient(api_key, api_secret, testnet=True, ping=ping, scheduler=self.scheduler)
             # Redefinimos la URL para Testnet
             self.client.API_URL = "https://testnet.binance.vision/api"
             logging.info("BinanceClient inicializado en TESTNET")
         else:
-            self.client = BinancePyClient(api_key, api_secret)
+            self.client = ScheduledClient(api_key, api_secret, ping=ping, scheduler=self.scheduler)
             logging.info("BinanceClient inicializado en LIVE")
-
-        # Pausa breve para respetar rate limits
-        self._sleep_interval = 0.5
-
-    def _sleep(self):
-        """ Pequeña espera tras cada llamada para no saturar rate limit. """
-        time.sleep(self._sleep_interval)
+        if api_url:
+            self.client.API_URL = api_url.rstrip("/")
 
     def get_historical_klines(self, symbol: str, interval: str, limit: int) -> pd.DataFrame:
         """
@@ -36,7 +41,6 @@ class BinanceClient:
         """
         try:
             raw = self.client.get_klines(symbol=symbol, interval=interval, limit=limit)
-            self._sleep()
 
             df = pd.DataFrame(raw, columns=[
                 "open_time", "open", "high", "low", "close", "volume",
@@ -63,7 +67,6 @@ class BinanceClient:
         """
         try:
             bal = self.client.get_asset_balance(asset=asset)
-            self._sleep()
             return float(bal["free"])
         except BinanceAPIException as e:
             logging.error(f"[get_balance] BinanceAPIException para {asset}: {e}")
@@ -95,7 +98,6 @@ class BinanceClient:
         try:
             order = self.client.create_order(**params)
             logging.info(f"[place_order] {order_type} {side} en {symbol}, qty={quantity}, price={price} -> orderId={order['orderId']}")
-            self._sleep()
             return order
         except BinanceAPIException as e:
             logging.error(f"[place_order] BinanceAPIException: {e}")
@@ -112,7 +114,6 @@ class BinanceClient:
         try:
             result = self.client.cancel_order(symbol=symbol, orderId=order_id)
             logging.info(f"[cancel_order] Orden {order_id} cancelada en {symbol}")
-            self._sleep()
             return result
         except BinanceAPIException as e:
             logging.error(f"[cancel_order] BinanceAPIException: {e}")
@@ -127,7 +128,6 @@ class BinanceClient:
         """
         try:
             orders = self.client.get_open_orders(symbol=symbol)
-            self._sleep()
             return orders
         except BinanceAPIException as e:
             logging.error(f"[get_open_orders] BinanceAPIException: {e}")
@@ -3,9 +3,17 @@
 import os
 import time
 import yaml
-from binance.client import Client
 from binance.exceptions import BinanceAPIException
 
+from client.request_scheduler import ScheduledClient, shared_scheduler, FUTURES_WEIGHT_PER_MINUTE
+from utils.kline_cache import KlineCache
+from utils.metrics import timed_methods
+from utils.price_snapshot import MarkPriceSnapshot
+
+BATCH_PLACE_MAX = 5     # orders per POST /fapi/v1/batchOrders
+BATCH_CANCEL_MAX = 10   # orderIds per DELETE /fapi/v1/batchOrders
+
+@timed_methods("exchange")
 class FuturesClient:
     """
     Wrapper around python-binance Client for Binance Futures (USDT-M perpetual).
@@ -27,7 +35,8 @@ class FuturesClient:
         test_secret = bn.get("testnet_api_secret")
 
         # 2) Determine whether to use testnet
-        use_test = cfg.get("exchange", {}).get("testnet", False)
+        ex_cfg = cfg.get("exchange", {})
+        use_test = ex_cfg.get("testnet", False)
 
         if use_test:
             if not (test_key and test_secret):
@@ -40,11 +49,25 @@ class FuturesClient:
 
         # 3) Instantiate the python-binance client
         #    Note: in python-binance v1.x, you can pass testnet=True for futures
-        self.client = Client(api_key, api_secret, testnet=use_test)
+        #    All requests share the process-wide futures weight budget and go
+        #    out by priority (orders first); see client/request_scheduler.py
+        rl_cfg = ex_cfg.get("rate_limit") or {}
+        self.scheduler = shared_scheduler(
+            "futures",
+            weight_per_minute=rl_cfg.get("weight_per_minute", FUTURES_WEIGHT_PER_MINUTE),
+            headroom=rl_cfg.get("headroom", 0.9),
+            order_reserve=rl_cfg.get("order_reserve", 0.1)
+        )
+        self.client = ScheduledClient(api_key, api_secret, testnet=use_test, ping=False,
+                                      scheduler=self.scheduler,
+                                      pool_size=rl_cfg.get("pool_size", 20))
+        # Optional REST base override (e.g. a local stand-in: http://127.0.0.1:8080/fapi)
+        if ex_cfg.get("rest_url"):
+            self.client.FUTURES_URL = self.client.FUTURES_TESTNET_URL = ex_cfg["rest_url"].rstrip("/")
 
         # 4) Sync time offset to avoid timestamp errors (±1s tolerance)
         try:
-            server_time = self.client.get_server_time()
+            server_time = self.client.futures_time()
             server_ts = int(server_time["serverTime"])
             local_ts = int(time.time() * 1000)
             self.client.TIME_OFFSET = server_ts - local_ts
@@ -52,15 +75,63 @@ class FuturesClient:
             # If time sync fails, log but continue; signed calls may fail
             print(f"[FuturesClient] Warning: failed to sync server time: {e}")
 
-    def get_mark_price(self, symbol: str) -> float:
+        # 5) Shared cache of closed klines, served by get_historical_klines()
+        self.klines = KlineCache(
+            self.get_klines,
+            clock=lambda: int(time.time() * 1000) + getattr(self.client, "TIME_OFFSET", 0)
+        )
+
+        # 6) Snapshot of all mark prices (one request), served by get_mark_price()
+        self.mark_prices = MarkPriceSnapshot(
+            self.client.futures_mark_price,
+            max_age=ex_cfg.get("mark_price_max_age", 5.0)
+        )
+
+        # 7) Per-symbol price/quantity filters, from one exchangeInfo call on first use
+        self._symbol_filters = None
+
+    def get_mark_price(self, symbol: str, max_age: float = None) -> float:
+        """
+        Returns the current mark price for a symbol, from the shared snapshot
+        of all mark prices (refreshed once it is older than max_age seconds,
+        default exchange.mark_price_max_age).
+        """
+        return self.mark_prices.get(symbol, max_age)
+
+    def get_symbol_filters(self, symbol: str) -> dict:
+        """
+        {"tick_size", "qty_step"} of a symbol (PRICE_FILTER tickSize and
+        LOT_SIZE stepSize), from exchangeInfo fetched once per client.
+        """
+        if self._symbol_filters is None:
+            filters = {}
+            for info in self.client.futures_exchange_info().get("symbols", []):
+                by_type = {f["filterType"]: f for f in info.get("filters", [])}
+                filters[info["symbol"]] = {
+                    "tick_size": float(by_type.get("PRICE_FILTER", {}).get("tickSize", 0)),
+                    "qty_step": float(by_type.get("LOT_SIZE", {}).get("stepSize", 0)),
+                }
+            self._symbol_filters = filters
+        if symbol not in self._symbol_filters:
+            raise KeyError(f"{symbol} not listed in futures exchangeInfo")
+        return self._symbol_filters[symbol]
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 500, start_time: int = None) -> list:
+        """
+        Raw futures klines (oldest first), optionally starting at start_time (ms).
+        """
+        params = {"symbol": symbol, "interval": interval, "limit": limit}
+        if start_time is not None:
+            params["startTime"] = start_time
+        return self.client.futures_klines(**params)
+
+    def get_historical_klines(self, symbol: str, interval: str, lookback: int):
         """
-        Returns the current mark price for a symbol.
+        The last `lookback` closed bars as a DataFrame
+        (open_time, open, high, low, close, volume), served from the shared
+        kline cache: only bars closed since the previous call are fetched.
         """
-        resp = self.client.futures_mark_price(symbol=symbol)
-        # futures_mark_price returns a dict or list; ensure dict
-        if isinstance(resp, list):
-            resp = resp[0]
-        return float(resp["markPrice"])
+        return self.klines.get(symbol, interval, lookback)
 
     def place_order(
         self,
@@ -101,18 +172,65 @@ class FuturesClient:
             print(f"[FuturesClient] Order error: {e}")
             raise
 
+    def place_orders(self, orders: list) -> list:
+        """
+        Places several futures orders, BATCH_PLACE_MAX per request.
+        - orders: dicts of order params as the API names them
+          (symbol, side, type, quantity, price, timeInForce, positionSide,
+          newClientOrderId, ...)
+        Returns one entry per order, in the same order: the order response,
+        or {"code", "msg"} for an order the exchange rejected.
+        """
+        results = []
+        for i in range(0, len(orders), BATCH_PLACE_MAX):
+            # batchOrders is sent as JSON; the API expects every value as a string
+            chunk = [{k: str(v) for k, v in o.items() if v is not None}
+                     for o in orders[i:i + BATCH_PLACE_MAX]]
+            try:
+                results.extend(self.client.futures_place_batch_order(batchOrders=chunk))
+            except BinanceAPIException as e:
+                print(f"[FuturesClient] Batch order error: {e}")
+                raise
+        return results
+
     def cancel_order(self, symbol: str, orderId: int) -> dict:
         """
         Cancels a futures order by ID.
         """
         return self.client.futures_cancel_order(symbol=symbol, orderId=orderId)
 
-    def get_open_orders(self, symbol: str) -> list:
+    def cancel_orders(self, symbol: str, order_ids: list) -> list:
+        """
+        Cancels several orders of one symbol, BATCH_CANCEL_MAX per request.
+        Returns one entry per order id: the cancelled order, or {"code", "msg"}.
+        """
+        results = []
+        for i in range(0, len(order_ids), BATCH_CANCEL_MAX):
+            chunk = [int(o) for o in order_ids[i:i + BATCH_CANCEL_MAX]]
+            results.extend(self.client.futures_cancel_orders(symbol=symbol, orderidlist=chunk))
+        return results
+
+    def get_order(self, symbol: str, orderId: int) -> dict:
         """
-        Returns a list of open futures orders for the symbol.
+        Returns one order by ID, whatever its status (NEW, FILLED, CANCELED, ...).
         """
+        return self.client.futures_get_order(symbol=symbol, orderId=orderId)
+
+    def get_open_orders(self, symbol: str = None) -> list:
+        """
+        Returns a list of open futures orders for the symbol
+        (for all symbols in one call when symbol is None).
+        """
+        if symbol is None:
+            return self.client.futures_get_open_orders()
         return self.client.futures_get_open_orders(symbol=symbol)
 
+    def get_account_trades(self, symbol: str) -> list:
+        """
+        Returns the account's futures trades (fills) for a symbol.
+        """
+        return self.client.futures_account_trades(symbol=symbol)
+
     def get_account_positions(self) -> list:
         """
         Returns current futures position information.
@@ -0,0 +1,230 @@
+# TRD_BOT_V3/src/client/request_scheduler.py
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+from urllib.parse import urlparse
+
+from binance.client import Client
+from requests.adapters import HTTPAdapter
+
+from utils.kline_cache import klines_weight
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Request scheduling for the Binance REST clients.
+#
+# Every request is admitted by a RequestScheduler before it is sent:
+#   - a token bucket holds the per-minute weight budget (refilled continuously)
+#     and is corrected from the X-MBX-USED-WEIGHT-1M header of each response
+#   - waiting requests are served by priority (orders/cancels first, then
+#     account queries, then market data), FIFO within a priority
+#   - part of the budget is reserved for orders, so a burst of data fetches
+#     can never leave an order waiting
+#   - a 429/418 pauses all requests for Retry-After seconds
+# ScheduledClient is the python-binance Client that goes through a scheduler
+# and keeps a pool of keep-alive connections large enough for the runtime's
+# worker threads.
+# ──────────────────────────────────────────────────────────────────────────────
+
+PRIORITY_ORDER = 0     # place / cancel
+PRIORITY_ACCOUNT = 1   # open orders, positions, balances
+PRIORITY_DATA = 2      # klines, prices, exchange info
+
+FUTURES_WEIGHT_PER_MINUTE = 2400   # USDT-M futures REQUEST_WEIGHT per IP
+SPOT_WEIGHT_PER_MINUTE = 6000
+
+# (api, METHOD, endpoint) → weight, or a function of the request params.
+# Anything not listed costs 1.
+_WEIGHTS = {
+    ("fapi", "GET", "klines"): lambda p: klines_weight(int(p.get("limit", 500))),
+    ("fapi", "GET", "openOrders"): lambda p: 1 if p.get("symbol") else 40,
+    ("fapi", "GET", "premiumIndex"): lambda p: 1 if p.get("symbol") else 10,
+    ("fapi", "GET", "positionRisk"): 5,
+    ("fapi", "GET", "account"): 5,
+    ("fapi", "GET", "balance"): 5,
+    ("fapi", "POST", "batchOrders"): 5,
+    ("api", "GET", "klines"): 2,
+    ("api", "GET", "openOrders"): lambda p: 6 if p.get("symbol") else 80,
+    ("api", "GET", "account"): 20,
+    ("api", "GET", "exchangeInfo"): 20,
+    ("api", "GET", "order"): 4,
+}
+
+_ORDER_ENDPOINTS = {"order", "batchOrders", "allOpenOrders", "countdownCancelAll"}
+_ACCOUNT_ENDPOINTS = {"order", "openOrders", "allOrders", "positionRisk", "account",
+                      "balance", "userTrades", "leverage", "positionSide"}
+
+def _split(path: str):
+    """URL path → (api, endpoint), e.g. "/fapi/v1/klines" → ("fapi", "klines")."""
+    api = "fapi" if "/fapi/" in path else "api"
+    return api, path.rstrip("/").rsplit("/", 1)[-1]
+
+def request_weight(method: str, path: str, params: dict = None) -> int:
+    api, endpoint = _split(path)
+    weight = _WEIGHTS.get((api, method.upper(), endpoint), 1)
+    return weight(params or {}) if callable(weight) else weight
+
+def request_priority(method: str, path: str) -> int:
+    _, endpoint = _split(path)
+    method = method.upper()
+    if endpoint in _ORDER_ENDPOINTS and method in ("POST", "PUT", "DELETE"):
+        return PRIORITY_ORDER
+    if endpoint in _ACCOUNT_ENDPOINTS:
+        return PRIORITY_ACCOUNT
+    return PRIORITY_DATA
+
+class TokenBucket:
+    """Weight budget refilled continuously at `rate` per second, up to `capacity` (not thread-safe)."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = float(capacity)
+        self.rate = float(rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float):
+        self._refill()
+        self.tokens -= amount
+
+    def limit(self, available: float):
+        """Never assume more than `available` tokens (e.g. what the server says is left)."""
+        self._refill()
+        self.tokens = min(self.tokens, available)
+
+class RequestScheduler:
+    """
+    Admits requests against a shared weight budget, highest priority first.
+
+    weight_per_minute: the exchange limit for this API and IP.
+    headroom: fraction of the limit the bot allows itself (the rest absorbs
+    requests from other processes and clock skew with the server's window).
+    order_reserve: fraction of the budget only PRIORITY_ORDER requests may use.
+    """
+
+    def __init__(self, weight_per_minute: int = FUTURES_WEIGHT_PER_MINUTE,
+                 headroom: float = 0.9, order_reserve: float = 0.1):
+        self.weight_per_minute = weight_per_minute
+        capacity = weight_per_minute * headroom
+        self.bucket = TokenBucket(capacity, capacity / 60.0)
+        self.reserve = capacity * order_reserve
+        self._cond = threading.Condition()
+        self._queue = []   # heap of (priority, seq) tickets
+        self._seq = itertools.count()
+        self._paused_until = 0.0
+        self.stats = {"requests": 0, "weight": 0, "wait_seconds": 0.0,
+                      "used_weight": None, "throttled": 0}
+
+    def _delay(self, weight: int, priority: int) -> float:
+        pause = self._paused_until - time.monotonic()
+        if pause > 0:
+            return pause
+        need = weight if priority == PRIORITY_ORDER else weight + self.reserve
+        return self.bucket.wait_time(need)
+
+    def acquire(self, weight: int, priority: int = PRIORITY_DATA):
+        """Block until a request of `weight` may be sent, then charge it."""
+        ticket = (priority, next(self._seq))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            self._cond.notify_all()   # a new head may have arrived
+            try:
+                while True:
+                    if self._queue[0] == ticket:
+                        delay = self._delay(weight, priority)
+                        if delay <= 0:
+                            break
+                    else:
+                        delay = None   # woken when the queue changes
+                    self._cond.wait(timeout=delay)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+            self.bucket.take(weight)
+            self.stats["requests"] += 1
+            self.stats["weight"] += weight
+            self.stats["wait_seconds"] += time.monotonic() - started
+
+    def observe(self, status_code: int, headers):
+        """Correct the budget from a response (used weight, 429/418 back-off)."""
+        used = headers.get("X-MBX-USED-WEIGHT-1M") or headers.get("X-MBX-USED-WEIGHT")
+        with self._cond:
+            if used is not None:
+                self.stats["used_weight"] = int(used)
+                self.bucket.limit(self.bucket.capacity - int(used))
+            if status_code in (418, 429):
+                retry_after = float(headers.get("Retry-After") or 60)
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+                self.bucket.limit(0)
+                self.stats["throttled"] += 1
+                logging.warning(f"Rate limited (HTTP {status_code}); pausing requests for {retry_after:.0f}s")
+            self._cond.notify_all()
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+def shared_scheduler(name: str, **kwargs) -> RequestScheduler:
+    """
+    The process-wide scheduler for one API ("futures", "spot"): Binance limits
+    are per IP, so every client of that API must draw from the same budget.
+    kwargs only apply when the scheduler is first created.
+    """
+    with _shared_lock:
+        if name not in _shared:
+            _shared[name] = RequestScheduler(**kwargs)
+        return _shared[name]
+
+class ScheduledClient(Client):
+    """
+    python-binance Client whose requests go through a RequestScheduler.
+
+    pool_size: keep-alive connections kept per host (requests' default of 10
+    makes extra worker threads open and drop a connection per call).
+    The last response is tracked per thread, so concurrent calls from the
+    runtime's threads never read each other's response.
+    """
+
+    def __init__(self, *args, scheduler: RequestScheduler = None, pool_size: int = 20, **kwargs):
+        self.scheduler = scheduler or RequestScheduler()
+        self.pool_size = pool_size
+        self._local = threading.local()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def response(self):
+        return getattr(self._local, "response", None)
+
+    @response.setter
+    def response(self, value):
+        self._local.response = value
+
+    def _init_session(self):
+        session = super()._init_session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        session.hooks["response"].append(
+            lambda r, *args, **kwargs: self.scheduler.observe(r.status_code, r.headers)
+        )
+        return session
+
+    def _request(self, method, uri: str, signed: bool, force_params: bool = False, **kwargs):
+        path = urlparse(uri).path
+        params = kwargs.get("data")
+        params = params if isinstance(params, dict) else {}
+        self.scheduler.acquire(request_weight(method, path, params), request_priority(method, path))
+        return super()._request(method, uri, signed, force_params, **kwargs)
@@ -0,0 +1,537 @@
+# TRD_BOT_V3/src/client/sim_exchange.py
+
+import bisect
+import glob
+import itertools
+import json
+import math
+import os
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from binance.exceptions import BinanceAPIException
+
+from utils.kline_cache import KLINE_COLUMNS, interval_ms
+from utils.kline_store import find_kline_csv, open_klines
+from utils.metrics import timed_methods
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Local exchange simulator for load-testing the live loop (main.py, strategy
+# run(), PositionManager) without the Binance testnet.
+#
+# SimExchange replays data/klines for every symbol at once: each bar is split
+# into ticks_per_bar ticks along open → low → high → close (open → high → low
+# → close for down bars) and step() advances all symbols one tick with a few
+# vectorised NumPy operations. Resting LIMIT orders are matched with
+# price-time priority whenever the tick's price path crosses them, at the
+# order's price; each tick offers at most `participation` of the bar's volume
+# per symbol, so large ladders fill partially, best price first.
+# Marketable LIMIT and MARKET orders fill at once at the current price.
+#
+# SimFuturesClient exposes the FuturesClient API on top of it, with
+# configurable latency and error injection. Errors are raised as
+# BinanceAPIException, like python-binance does.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _api_error(code: int, msg: str, status: int = 400) -> BinanceAPIException:
+    return BinanceAPIException(None, status, json.dumps({"code": code, "msg": msg}))
+
+def _fmt(x: float) -> str:
+    return f"{x:.8f}".rstrip("0").rstrip(".") or "0"
+
+class SimExchange:
+    """
+    Matching engine and accounts for a set of replayed symbols.
+
+    sources: source name → kline columns (as utils.kline_store.open_klines returns)
+    symbols: symbol → (source name, bar offset); several symbols may replay
+      the same source, shifted by their offset.
+    start_bar: bars of history available before the first tick (lookback
+      for the strategies).
+    participation: share of a bar's volume that can fill resting orders
+      (None = unlimited).
+    """
+
+    def __init__(self, sources: Dict[str, Dict[str, np.ndarray]], symbols: Dict[str, tuple],
+                 interval: str = "1h", ticks_per_bar: int = 60, start_bar: int = 1000,
+                 participation: Optional[float] = 0.1, maker_fee: float = 0.0002,
+                 taker_fee: float = 0.0005, balance: float = 10_000.0):
+        self.interval = interval
+        self.bar_ms = interval_ms(interval)
+        self.ticks_per_bar = int(ticks_per_bar)
+        self.participation = participation
+        self.maker_fee = maker_fee
+        self.taker_fee = taker_fee
+        self.balance = float(balance)
+        self._lock = threading.RLock()
+
+        # Sources stacked into (n_sources, max_len) arrays; symbols index rows
+        names = list(sources)
+        max_len = max(len(sources[n]["close"]) for n in names)
+        def stack(col, fill):
+            out = np.full((len(names), max_len), fill, dtype=np.int64 if col == "open_time" else np.float64)
+            for i, n in enumerate(names):
+                out[i, :len(sources[n][col])] = sources[n][col]
+            return out
+        self._time = stack("open_time", 0) // 1_000_000   # ns → ms
+        self._o, self._h, self._l, self._c, self._v = (stack(c, np.nan) for c in ("open", "high", "low", "close", "volume"))
+
+        self.symbols = list(symbols)
+        self._index = {s: i for i, s in enumerate(self.symbols)}
+        self._row = np.array([names.index(symbols[s][0]) for s in self.symbols])
+        offsets = np.array([int(symbols[s][1]) for s in self.symbols])
+        lengths = np.array([len(sources[symbols[s][0]]["close"]) for s in self.symbols])
+        self._base = offsets + start_bar              # bar index of the first tick per symbol
+        if (self._base >= lengths).any():
+            raise ValueError("start_bar + offset is beyond the data of some symbols")
+        self.n_bars = int((lengths - self._base).min())
+        self.bar = 0          # bars elapsed since the start
+        self.sub = -1         # tick within the bar (-1 = before the first tick)
+
+        n = len(self.symbols)
+        self.price = self._c[self._row, self._base - 1].copy()
+        self._bar_high = self.price.copy()
+        self._bar_low = self.price.copy()
+        self._liquidity = np.full(n, np.inf)
+
+        # Orders, books (per symbol: bids/asks as sorted (key, seq, order)), accounts
+        self._ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self.orders: Dict[int, dict] = {}
+        self._bids: List[list] = [[] for _ in range(n)]
+        self._asks: List[list] = [[] for _ in range(n)]
+        self._active = set()  # symbol indices with resting orders
+        self.positions: Dict[tuple, list] = {}   # (symbol, positionSide) → [amount, entry price]
+        self.trades: Dict[str, list] = {s: [] for s in self.symbols}
+        self.stats = {"ticks": 0, "fills": 0}
+        self._runner = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_klines(cls, data_dir: str = "data/klines", symbols: List[str] = None,
+                    n_symbols: int = None, stagger: int = 97, interval: str = "1h",
+                    contract_type: str = "PERPETUAL", **kwargs) -> "SimExchange":
+        """
+        Exchange replaying data_dir. With n_symbols larger than the number of
+        source symbols, the extra symbols (SIM001USDT, SIM002USDT, ...) replay
+        the sources in turn, each shifted by `stagger` more bars.
+        """
+        if symbols is None:
+            pattern = os.path.join(data_dir, f"*_{contract_type}_{interval}.csv")
+            symbols = sorted(os.path.basename(p).split("_")[0] for p in glob.glob(pattern))
+        if not symbols:
+            raise FileNotFoundError(f"No {interval} klines in {data_dir}")
+        sources = {s: open_klines(find_kline_csv(data_dir, s, interval, contract_type))[1] for s in symbols}
+        mapping = {s: (s, 0) for s in symbols}
+        for k in range(len(symbols), n_symbols or 0):
+            mapping[f"SIM{k:03d}USDT"] = (symbols[k % len(symbols)], (k // len(symbols)) * stagger)
+        return cls(sources, mapping, interval=interval, **kwargs)
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # Replay
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def _idx(self, i) -> int:
+        """Source bar index of the current bar of symbol i (or all symbols)."""
+        return self._base[i] + self.bar
+
+    def step(self, n: int = 1) -> bool:
+        """Advance all symbols n ticks; False once the data is exhausted."""
+        with self._lock:
+            for _ in range(n):
+                if not self._tick():
+                    return False
+            return True
+
+    def _tick(self) -> bool:
+        tpb = self.ticks_per_bar
+        if self.sub + 1 >= tpb:
+            if self.bar + 1 >= self.n_bars:
+                return False
+            self.bar, self.sub = self.bar + 1, 0
+        else:
+            self.sub += 1
+        new_bar = self.sub == 0
+
+        rows, idx = self._row, self._base + self.bar
+        o, h, l, c = self._o[rows, idx], self._h[rows, idx], self._l[rows, idx], self._c[rows, idx]
+        up = c >= o
+        p1, p2 = np.where(up, l, h), np.where(up, h, l)
+
+        # Position along the path (0..3) before and after this tick
+        s0, s1 = 3.0 * self.sub / tpb, 3.0 * (self.sub + 1) / tpb
+        if s1 <= 1:
+            price = o + (p1 - o) * s1
+        elif s1 <= 2:
+            price = p1 + (p2 - p1) * (s1 - 1)
+        else:
+            price = p2 + (c - p2) * (s1 - 2)
+
+        # Range traded during the tick: previous price, anchors passed, new price
+        prev = o if new_bar else self.price
+        lo, hi = np.minimum(prev, price), np.maximum(prev, price)
+        if new_bar:
+            lo, hi = np.minimum(lo, self.price), np.maximum(hi, self.price)  # gap from last close
+        for anchor, at in ((p1, 1.0), (p2, 2.0)):
+            if s0 < at <= s1:
+                lo, hi = np.minimum(lo, anchor), np.maximum(hi, anchor)
+
+        self.price = price
+        if new_bar:
+            self._bar_high, self._bar_low = np.maximum(o, price), np.minimum(o, price)
+        else:
+            self._bar_high, self._bar_low = np.maximum(self._bar_high, hi), np.minimum(self._bar_low, lo)
+        if self.participation is not None:
+            self._liquidity = self._v[rows, idx] * self.participation / tpb
+        self.stats["ticks"] += 1
+
+        for i in list(self._active):
+            self._match(i, lo[i], hi[i])
+        return True
+
+    def start(self, ticks_per_second: float):
+        """Advance the replay on a background thread until stop() or the end of the data."""
+        self._stop.clear()
+        def loop():
+            period = 1.0 / ticks_per_second
+            due = time.monotonic()
+            while not self._stop.is_set() and self.step():
+                due += period
+                self._stop.wait(max(0.0, due - time.monotonic()))
+        self._runner = threading.Thread(target=loop, name="sim-exchange", daemon=True)
+        self._runner.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._runner is not None:
+            self._runner.join()
+
+    def now_ms(self, symbol: str) -> int:
+        i = self._sym(symbol)
+        frac = (self.sub + 1) / self.ticks_per_bar if self.sub >= 0 else 0.0
+        return int(self._time[self._row[i], self._idx(i)] + frac * self.bar_ms)
+
+    def _sym(self, symbol: str) -> int:
+        try:
+            return self._index[symbol]
+        except KeyError:
+            raise _api_error(-1121, "Invalid symbol.")
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # Matching and accounts
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def _match(self, i: int, lo: float, hi: float):
+        """Fill resting orders of symbol i crossed by the range [lo, hi], best price first."""
+        liquidity = [self._liquidity[i]]
+        for book, crossed in ((self._bids[i], lambda p: p >= lo), (self._asks[i], lambda p: p <= hi)):
+            while book and liquidity[0] > 0:
+                order = book[0][2]
+                if not crossed(order["price"]):
+                    break
+                qty = min(order["origQty"] - order["executedQty"], liquidity[0])
+                liquidity[0] -= qty
+                self._fill(order, qty, order["price"], maker=True)
+                if order["status"] == "FILLED":
+                    book.pop(0)
+        self._liquidity[i] = liquidity[0]
+        if not self._bids[i] and not self._asks[i]:
+            self._active.discard(i)
+
+    def _fill(self, order: dict, qty: float, price: float, maker: bool):
+        symbol = order["symbol"]
+        key = (symbol, order["positionSide"])
+        amount, entry = self.positions.get(key, [0.0, 0.0])
+        signed = qty if order["side"] == "BUY" else -qty
+
+        pnl = 0.0
+        if amount == 0 or (amount > 0) == (signed > 0):
+            new = amount + signed
+            entry = (entry * abs(amount) + price * qty) / abs(new)
+        else:
+            closing = min(qty, abs(amount))
+            pnl = closing * (price - entry) * (1 if amount > 0 else -1)
+            new = amount + signed
+            if abs(new) < 1e-12:
+                new, entry = 0.0, 0.0
+            elif (new > 0) != (amount > 0):
+                entry = price   # flipped: the remainder opens at this price
+        self.positions[key] = [new, entry]
+
+        fee = qty * price * (self.maker_fee if maker else self.taker_fee)
+        self.balance += pnl - fee
+        order["executedQty"] += qty
+        order["cumQuote"] += qty * price
+        order["status"] = "FILLED" if order["origQty"] - order["executedQty"] <= 1e-12 else "PARTIALLY_FILLED"
+        order["updateTime"] = self.now_ms(symbol)
+        self.trades[symbol].append({
+            "symbol": symbol, "id": next(self._trade_ids), "orderId": order["orderId"],
+            "side": order["side"], "positionSide": order["positionSide"],
+            "price": _fmt(price), "qty": _fmt(qty), "quoteQty": _fmt(qty * price),
+            "realizedPnl": _fmt(pnl), "commission": _fmt(fee), "commissionAsset": "USDT",
+            "time": order["updateTime"], "buyer": order["side"] == "BUY", "maker": maker,
+        })
+        self.stats["fills"] += 1
+
+    def place_order(self, symbol: str, side: str, order_type: str, quantity: float,
+                    price: float = None, time_in_force: str = "GTC", position_side: str = None,
+                    client_order_id: str = None) -> dict:
+        with self._lock:
+            i = self._sym(symbol)
+            quantity = float(quantity)
+            if side not in ("BUY", "SELL"):
+                raise _api_error(-1117, "Invalid side.")
+            if quantity <= 0:
+                raise _api_error(-4003, "Quantity less than or equal to zero.")
+            if order_type == "LIMIT" and price is None:
+                raise _api_error(-1102, "Mandatory parameter 'price' was not sent, was empty/null, or malformed.")
+            if order_type not in ("LIMIT", "MARKET"):
+                raise _api_error(-1116, "Invalid orderType.")
+
+            now = self.now_ms(symbol)
+            order_id = next(self._ids)
+            order = {
+                "orderId": order_id, "symbol": symbol, "side": side, "type": order_type,
+                "positionSide": position_side or "BOTH", "timeInForce": time_in_force,
+                "clientOrderId": client_order_id or f"sim_{order_id}",
+                "price": float(price) if price is not None else 0.0,
+                "origQty": quantity, "executedQty": 0.0, "cumQuote": 0.0,
+                "status": "NEW", "time": now, "updateTime": now,
+            }
+            self.orders[order_id] = order
+
+            current = float(self.price[i])
+            marketable = (order_type == "MARKET"
+                          or (side == "BUY" and order["price"] >= current)
+                          or (side == "SELL" and order["price"] <= current))
+            if marketable:
+                self._fill(order, quantity, current, maker=False)
+            else:
+                key = -order["price"] if side == "BUY" else order["price"]
+                book = self._bids[i] if side == "BUY" else self._asks[i]
+                bisect.insort(book, (key, order_id, order))   # (key, id) is unique
+                self._active.add(i)
+            return self._order_view(order)
+
+    def cancel_order(self, symbol: str, order_id: int) -> dict:
+        with self._lock:
+            i = self._sym(symbol)
+            order = self.orders.get(int(order_id))
+            if order is None or order["symbol"] != symbol or order["status"] not in ("NEW", "PARTIALLY_FILLED"):
+                raise _api_error(-2011, "Unknown order sent.")
+            book = self._bids[i] if order["side"] == "BUY" else self._asks[i]
+            book[:] = [e for e in book if e[1] != order["orderId"]]
+            if not self._bids[i] and not self._asks[i]:
+                self._active.discard(i)
+            order["status"] = "CANCELED"
+            order["updateTime"] = self.now_ms(symbol)
+            return self._order_view(order)
+
+    def get_order(self, symbol: str, order_id: int) -> dict:
+        with self._lock:
+            self._sym(symbol)
+            order = self.orders.get(int(order_id))
+            if order is None or order["symbol"] != symbol:
+                raise _api_error(-2013, "Order does not exist.")
+            return self._order_view(order)
+
+    def open_orders(self, symbol: str = None) -> List[dict]:
+        with self._lock:
+            indices = [self._sym(symbol)] if symbol else sorted(self._active)
+            return [self._order_view(e[2]) for i in indices
+                    for e in self._bids[i] + self._asks[i]]
+
+    def account_positions(self) -> List[dict]:
+        with self._lock:
+            out = []
+            for (symbol, side), (amount, entry) in self.positions.items():
+                if amount == 0:
+                    continue
+                mark = float(self.price[self._index[symbol]])
+                out.append({
+                    "symbol": symbol, "positionSide": side, "positionAmt": _fmt(amount),
+                    "entryPrice": _fmt(entry), "markPrice": _fmt(mark),
+                    "unRealizedProfit": _fmt(amount * (mark - entry)),
+                })
+            return out
+
+    def account_trades(self, symbol: str) -> List[dict]:
+        with self._lock:
+            return list(self.trades[self.symbols[self._sym(symbol)]])
+
+    @staticmethod
+    def _order_view(order: dict) -> dict:
+        """Order as the REST API returns it (numbers as strings)."""
+        view = dict(order)
+        for k in ("price", "origQty", "executedQty", "cumQuote"):
+            view[k] = _fmt(order[k])
+        view["avgPrice"] = _fmt(order["cumQuote"] / order["executedQty"]) if order["executedQty"] else "0"
+        return view
+
+    # ──────────────────────────────────────────────────────────────────────────
+    # Market data
+    # ──────────────────────────────────────────────────────────────────────────
+
+    def symbol_filters(self, symbol: str) -> dict:
+        """
+        {"tick_size", "qty_step"} for a symbol, scaled to its price level the
+        way exchange filters roughly are: about five significant digits of
+        price, and a quantity step worth between 1 and 10 USDT or less.
+        """
+        with self._lock:
+            i = self._sym(symbol)
+            price = float(self._c[self._row[i], self._base[i] - 1])
+        magnitude = math.floor(math.log10(price)) if price > 0 else 0
+        return {"tick_size": 10.0 ** (magnitude - 4),
+                "qty_step": min(1.0, 10.0 ** -magnitude) if magnitude > 0 else 1.0}
+
+    def mark_price(self, symbol: str) -> float:
+        with self._lock:
+            return float(self.price[self._sym(symbol)])
+
+    def _check_interval(self, interval: str):
+        if interval != self.interval:
+            raise _api_error(-1120, f"Invalid interval (simulator replays {self.interval} bars).")
+
+    def closed_bars(self, symbol: str, interval: str, lookback: int) -> pd.DataFrame:
+        """The last `lookback` closed bars as a DataFrame of KLINE_COLUMNS."""
+        self._check_interval(interval)
+        with self._lock:
+            i = self._sym(symbol)
+            row, end = self._row[i], self._idx(i)   # current bar is still forming
+            start = max(0, end - lookback)
+            return pd.DataFrame({
+                "open_time": pd.to_datetime(self._time[row, start:end], unit="ms"),
+                "open": self._o[row, start:end], "high": self._h[row, start:end],
+                "low": self._l[row, start:end], "close": self._c[row, start:end],
+                "volume": self._v[row, start:end],
+            }, columns=KLINE_COLUMNS)
+
+    def raw_klines(self, symbol: str, interval: str, limit: int = 500, start_time: int = None) -> list:
+        """Kline rows as GET /fapi/v1/klines returns them, including the forming bar."""
+        self._check_interval(interval)
+        with self._lock:
+            i = self._sym(symbol)
+            row, cur = self._row[i], self._idx(i)
+            times = self._time[row, :cur + 1]
+            first = int(np.searchsorted(times, start_time)) if start_time is not None else max(0, cur + 1 - limit)
+            last = min(cur + 1, first + limit)
+            rows = []
+            for k in range(first, last):
+                if k == cur:
+                    frac = (self.sub + 1) / self.ticks_per_bar if self.sub >= 0 else 0.0
+                    o, h, l, c = self._o[row, k], self._bar_high[i], self._bar_low[i], self.price[i]
+                    v = self._v[row, k] * frac
+                else:
+                    o, h, l, c, v = self._o[row, k], self._h[row, k], self._l[row, k], self._c[row, k], self._v[row, k]
+                t = int(self._time[row, k])
+                rows.append([t, _fmt(o), _fmt(h), _fmt(l), _fmt(c), _fmt(v), t + self.bar_ms - 1,
+                             _fmt(v * c), 0, "0", "0", "0"])
+            return rows
+
+@timed_methods("exchange")
+class SimFuturesClient:
+    """
+    FuturesClient API backed by a SimExchange (several clients may share one).
+
+    latency_ms / jitter_ms: delay added to every call (normal distribution).
+    error_rate: probability that a call fails with an injected
+    BinanceAPIException (-1001, HTTP 503) before reaching the exchange.
+    """
+
+    def __init__(self, exchange: SimExchange, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, seed: int = None):
+        self.exchange = exchange
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self.stats = {"calls": 0, "injected_errors": 0}
+
+    @classmethod
+    def from_config(cls, sim_cfg: dict) -> "SimFuturesClient":
+        """Client and exchange from the exchange.simulator block of config.yaml."""
+        exchange = SimExchange.from_klines(
+            data_dir=sim_cfg.get("data_dir", "data/klines"),
+            symbols=sim_cfg.get("symbols"),
+            n_symbols=sim_cfg.get("n_symbols"),
+            interval=sim_cfg.get("interval", "1h"),
+            ticks_per_bar=sim_cfg.get("ticks_per_bar", 60),
+            start_bar=sim_cfg.get("start_bar", 1000),
+            participation=sim_cfg.get("participation", 0.1),
+            balance=sim_cfg.get("balance", 10_000.0),
+        )
+        return cls(exchange, latency_ms=sim_cfg.get("latency_ms", 0.0),
+                   jitter_ms=sim_cfg.get("jitter_ms", 0.0),
+                   error_rate=sim_cfg.get("error_rate", 0.0), seed=sim_cfg.get("seed"))
+
+    def _call(self, fn, *args, **kwargs):
+        self.stats["calls"] += 1
+        if self.latency_ms or self.jitter_ms:
+            time.sleep(max(0.0, self._rng.gauss(self.latency_ms, self.jitter_ms)) / 1000.0)
+        if self.error_rate and self._rng.random() < self.error_rate:
+            self.stats["injected_errors"] += 1
+            raise _api_error(-1001, "Internal error; unable to process your request. Please try again.", 503)
+        return fn(*args, **kwargs)
+
+    def get_mark_price(self, symbol: str, max_age: float = None) -> float:
+        return self._call(self.exchange.mark_price, symbol)
+
+    def get_klines(self, symbol: str, interval: str, limit: int = 500, start_time: int = None) -> list:
+        return self._call(self.exchange.raw_klines, symbol, interval, limit, start_time)
+
+    def get_historical_klines(self, symbol: str, interval: str, lookback: int):
+        return self._call(self.exchange.closed_bars, symbol, interval, lookback)
+
+    def get_symbol_filters(self, symbol: str) -> dict:
+        return self._call(self.exchange.symbol_filters, symbol)
+
+    def place_order(self, symbol: str, side: str, order_type: str, quantity: float,
+                    price: float = None, timeInForce: str = "GTC", positionSide: str = None,
+                    leverage: int = None) -> dict:
+        return self._call(self.exchange.place_order, symbol, side, order_type, quantity,
+                          price, timeInForce, positionSide)
+
+    def place_orders(self, orders: list) -> list:
+        def place_all():
+            results = []
+            for o in orders:
+                try:
+                    results.append(self.exchange.place_order(
+                        o["symbol"], o["side"], o["type"], float(o["quantity"]),
+                        float(o["price"]) if o.get("price") is not None else None,
+                        o.get("timeInForce", "GTC"), o.get("positionSide"), o.get("newClientOrderId")))
+                except BinanceAPIException as e:
+                    results.append({"code": e.code, "msg": e.message})
+            return results
+        return self._call(place_all)
+
+    def cancel_order(self, symbol: str, orderId: int) -> dict:
+        return self._call(self.exchange.cancel_order, symbol, orderId)
+
+    def cancel_orders(self, symbol: str, order_ids: list) -> list:
+        def cancel_all():
+            results = []
+            for order_id in order_ids:
+                try:
+                    results.append(self.exchange.cancel_order(symbol, order_id))
+                except BinanceAPIException as e:
+                    results.append({"code": e.code, "msg": e.message})
+            return results
+        return self._call(cancel_all)
+
+    def get_order(self, symbol: str, orderId: int) -> dict:
+        return self._call(self.exchange.get_order, symbol, orderId)
+
+    def get_open_orders(self, symbol: str = None) -> list:
+        return self._call(self.exchange.open_orders, symbol)
+
+    def get_account_positions(self) -> list:
+        return self._call(self.exchange.account_positions)
+
+    def get_account_trades(self, symbol: str) -> list:
+        return self._call(self.exchange.account_trades, symbol)
@@ -1,11 +1,18 @@
 # src/main.py
 
-import time
+import asyncio
+import copy
+import signal
 import yaml
 
 from client.futures_client import FuturesClient
+from client.sim_exchange import SimFuturesClient
 from utils.position_manager import PositionManager
 from utils.risk_management import RiskManager
+from utils.async_runtime import AsyncRuntime
+from utils.logger import setup_logger
+from utils.metrics import METRICS
+from ml.model_registry import MODELS
 
 from strategies.mean_reversion import MeanReversionStrategy
 from strategies.grid_strategy import GridStrategy
@@ -15,12 +22,46 @@ def load_config(path: str = "config/config.yaml") -> dict:
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
+def add_simulated_symbols(cfg: dict, sim_cfg: dict, exchange) -> list:
+    """
+    Config entries for the replayed symbols that config.yaml does not list
+    (SIM001USDT, ...), each a copy of exchange.simulator.template. Returns
+    the symbols added.
+    """
+    template = sim_cfg.get("template")
+    if not template:
+        return []
+    added = []
+    for symbol in exchange.symbols:
+        if symbol not in cfg["symbols"]:
+            cfg["symbols"][symbol] = dict(copy.deepcopy(template), enabled=True)
+            added.append(symbol)
+    return added
+
+async def serve(runtime: AsyncRuntime):
+    """Run until SIGINT/SIGTERM, letting in-flight ticks finish."""
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, runtime.stop)
+        except NotImplementedError:
+            pass  # e.g. Windows; Ctrl-C then cancels the tasks instead
+    await runtime.run()
+
 def main():
     # 1) Load configuration (includes exchange.api_key, api_secret, testnet flag)
     cfg = load_config()
+    setup_logger()
 
-    # 2) Instantiate Binance Futures client
-    client = FuturesClient(cfg)
+    # 2) Instantiate Binance Futures client (or the local simulator, for load tests)
+    sim_cfg = cfg.get("exchange", {}).get("simulator")
+    if sim_cfg:
+        client = SimFuturesClient.from_config(sim_cfg)
+        client.exchange.start(sim_cfg.get("ticks_per_second", 10))
+        positions_path = "state/sim_positions.json"
+    else:
+        client = FuturesClient(cfg)
+        positions_path = "state/positions.json"
 
     # 3) Portfolio‐Level Risk Manager (correlation & allocation)
     rm = RiskManager(cfg, data_dir="data/klines")
@@ -34,9 +75,15 @@ def main():
         cfg["symbols"][s]["allocation_pct"] = final_allocs.get(s, 0)
 
     # 4) PositionManager: one shared instance
-    pm = PositionManager("state/positions.json")
+    pm = PositionManager(positions_path)
     pm.reconcile(client)
 
+    # 4a) Simulator: the replayed symbols without their own config entry trade
+    #     the template; they have no klines of their own in data_dir, so they
+    #     keep the template allocation instead of going through 3a)
+    if sim_cfg:
+        symbols += add_simulated_symbols(cfg, sim_cfg, client.exchange)
+
     # 5) Build strategy instances
     strategies = []
     for symbol in symbols:
@@ -55,14 +102,28 @@ def main():
 
         strategies.append(strat)
 
-    # 6) Main loop: invoke each strategy
-    while True:
-        for strat in strategies:
-            try:
-                strat.run()
-            except Exception as e:
-                print(f"[ERROR] {strat.symbol} ({strat.__class__.__name__}): {e}")
-        time.sleep(60)
+    # 6) Main loop: each strategy is its own task, ticking on wall-clock
+    #    boundaries; blocking run() calls go to a thread pool so one slow
+    #    symbol never delays the others
+    rt_cfg = cfg.get("runtime", {})
+    runtime = AsyncRuntime(
+        strategies,
+        tick_seconds=rt_cfg.get("tick_seconds", 60),
+        offset_seconds=rt_cfg.get("tick_offset_seconds", 1),
+        max_workers=rt_cfg.get("max_workers")
+    )
+    # 7) Latency histograms (exchange calls, run(), reconcile, loop lag)
+    #    exported to a local JSON file; a final snapshot is written on exit
+    m_cfg = cfg.get("metrics", {})
+    metrics_path = m_cfg.get("path", "logs/metrics.json")
+    METRICS.start_exporter(metrics_path, m_cfg.get("interval_seconds", 60))
+    # 8) Swap in retrained ML models when their files change
+    MODELS.start_watcher(cfg.get("models", {}).get("reload_interval_seconds", 30))
+    try:
+        asyncio.run(serve(runtime))
+    finally:
+        MODELS.stop_watcher()
+        METRICS.stop_exporter(metrics_path)
 
 if __name__ == "__main__":
     main()
@@ -1,5 +1,8 @@
 import os, glob, pandas as pd
+import numpy as np
+from utils.kline_store import read_klines
 from utils.trade_history_manager import TradeHistoryManager
+from ml.feature_store import FeatureStore, FeatureSpec, shared_store
 
 def load_features_and_trade_labels(
     symbol: str,
@@ -7,31 +10,32 @@ def load_features_and_trade_labels(
     data_dir: str,
     lookback: int,
     client,
-    refresh_interval: int = 3600
+    refresh_interval: int = 3600,
+    store: FeatureStore = None
 ):
     # 1) Find the OHLC CSV via glob: SYMBOL_*_INTERVAL.csv
     pattern = os.path.join(data_dir, f"{symbol}_*_{interval}.csv")
     files = glob.glob(pattern)
     if not files:
         raise FileNotFoundError(f"No OHLC CSV matching: {pattern}")
-    df = pd.read_csv(files[0], parse_dates=["open_time"])
+    df = read_klines(files[0])
 
     # 2) Fetch trades via TradeHistoryManager
     thm = TradeHistoryManager(symbol, client, cache_dir="state", refresh_interval=refresh_interval)
     trades_df = thm.get_trade_history()
 
-    # 3) Build a simple features DataFrame (returns + moving average)
-    df_feat = pd.DataFrame({
-        "close": df["close"],
-        "return": df["close"].pct_change(),
-        "ma":    df["close"].rolling(window=lookback).mean()
-    })
+    # 3) Features from the feature store: the engineer_features() columns
+    #    MLStrategy predicts on, only new bars computed since the last run
+    store = store or shared_store()
+    df_feat = store.features(symbol, interval, FeatureSpec(lookback), df)
 
     # 4) Label: next bar up/down
     labels = (df["close"].shift(-1) > df["close"]).astype(int)
 
-    # 5) Drop lookback rows + last NaN
-    X = df_feat.iloc[lookback:-1].reset_index(drop=True)
-    y = labels.iloc[lookback:-1].reset_index(drop=True)
+    # 5) Keep bars with a complete feature row (drops warmup) and a next bar
+    valid = np.isfinite(df_feat.to_numpy(dtype=np.float64)).all(axis=1)
+    valid[-1:] = False
+    X = df_feat[valid].reset_index(drop=True)
+    y = labels[valid].reset_index(drop=True)
 
     return X, y
@@ -3,25 +3,24 @@
 import pandas as pd
 import numpy as np
 
+from utils import indicator_engine as ie
+from utils.indicator_engine import IndicatorEngine
+
+def _rsi_from_gain_loss(avg_gain: np.ndarray, avg_loss: np.ndarray) -> np.ndarray:
+    rs = avg_gain / np.where(avg_loss == 0, 1e-8, avg_loss)
+    return 100 - (100 / (1 + rs))
+
 def compute_rsi(series: pd.Series, period: int = 14) -> pd.Series:
     """
     Compute the RSI (Relative Strength Index) over `period` bars.
     Returns a Series of same length, with NaN for the first `period` bars.
     """
-    delta = series.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
-
-    avg_gain = gain.rolling(window=period, min_periods=period).mean()
-    avg_loss = loss.rolling(window=period, min_periods=period).mean()
-
-    rs = avg_gain / (avg_loss.replace(0, 1e-8))
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+    avg_gain, avg_loss = ie.average_gain_loss(series.to_numpy(dtype=np.float64), period)
+    return pd.Series(_rsi_from_gain_loss(avg_gain, avg_loss), index=series.index)
 
 def compute_sma(series: pd.Series, period: int) -> pd.Series:
     """Simple moving average."""
-    return series.rolling(window=period, min_periods=period).mean()
+    return pd.Series(ie.rolling_mean(series.to_numpy(dtype=np.float64), period), index=series.index)
 
 def compute_ema(series: pd.Series, period: int) -> pd.Series:
     """Exponential moving average."""
@@ -33,20 +32,15 @@ def compute_atr(df: pd.DataFrame, period: int = 14) -> pd.Series:
     Expects df with columns ['high','low','close'].
     Returns a Series of ATR values.
     """
-    high = df["high"]
-    low = df["low"]
-    close = df["close"]
-    prev_close = close.shift(1)
-
-    tr1 = high - low
-    tr2 = (high - prev_close).abs()
-    tr3 = (low - prev_close).abs()
-    tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-
-    atr = tr.rolling(window=period, min_periods=period).mean()
-    return atr
-
-def engineer_features(df: pd.DataFrame, lookback: int = 50) -> pd.DataFrame:
+    atr = ie.atr(
+        df["high"].to_numpy(dtype=np.float64),
+        df["low"].to_numpy(dtype=np.float64),
+        df["close"].to_numpy(dtype=np.float64),
+        period
+    )
+    return pd.Series(atr, index=df.index)
+
+def engineer_features(df: pd.DataFrame, lookback: int = 50, engine: IndicatorEngine = None) -> pd.DataFrame:
     """
     Create a DataFrame of features for each bar in df:
       • RSI(14)
@@ -56,7 +50,13 @@ def engineer_features(df: pd.DataFrame, lookback: int = 50) -> pd.DataFrame:
       • Momentum: close / close.shift(lookback) - 1
       • Volume change: volume / volume.shift(lookback) - 1
     Returns a DataFrame of shape (len(df), n_features), with NaNs for early rows.
+
+    If `engine` (an IndicatorEngine built over the same df) is given, the
+    indicator columns are taken from its cache instead of being recomputed.
     """
+    if engine is not None:
+        return _engineer_features_from_engine(df, lookback, engine)
+
     features = pd.DataFrame(index=df.index)
 
     close = df["close"]
@@ -82,3 +82,54 @@ def engineer_features(df: pd.DataFrame, lookback: int = 50) -> pd.DataFrame:
     features[f"vol_chg_{lookback}"] = volume / volume.shift(lookback) - 1
 
     return features
+
+def _engineer_features_from_engine(df: pd.DataFrame, lookback: int, engine: IndicatorEngine) -> pd.DataFrame:
+    """Same columns as engineer_features(), read from a full-series IndicatorEngine."""
+    if len(engine) != len(df):
+        raise ValueError("IndicatorEngine length does not match df")
+
+    features = pd.DataFrame(index=df.index)
+    close = df["close"]
+    volume = df["volume"]
+    half_lb = max(2, lookback // 2)
+
+    features["rsi_14"] = _rsi_from_gain_loss(*engine.average_gain_loss(14))
+    features[f"sma_{lookback}"] = engine.sma(lookback)
+    features[f"ema_{half_lb}"] = engine.ema(half_lb)
+    features["atr_14"] = engine.atr(14)
+    features[f"mom_{lookback}"] = close / close.shift(lookback) - 1
+    features[f"vol_chg_{lookback}"] = volume / volume.shift(lookback) - 1
+    return features
+
+def engineer_features_windowed(df: pd.DataFrame, lookback: int, window: int,
+                               engine: IndicatorEngine = None) -> pd.DataFrame:
+    """
+    Features of every bar exactly as engineer_features() computes them for the
+    last row of the `window`-bar slice ending at that bar, i.e. what a per-bar
+    backtest sees, for the whole series at once.
+
+    Rolling columns only look back inside the slice, so they equal the
+    full-series values (or are NaN when the slice is too short for them); the
+    EMA is the one column that depends on where the slice starts.
+    """
+    if engine is None:
+        engine = IndicatorEngine(df)
+    if len(engine) != len(df):
+        raise ValueError("IndicatorEngine length does not match df")
+
+    features = _engineer_features_from_engine(df, lookback, engine)
+    half_lb = max(2, lookback // 2)
+    features[f"ema_{half_lb}"] = engine.window_ema(half_lb, window)
+
+    # Bars each column needs inside one slice
+    needs = {
+        "rsi_14": 15,
+        f"sma_{lookback}": lookback,
+        "atr_14": 15,   # its first true range needs the previous close
+        f"mom_{lookback}": lookback + 1,
+        f"vol_chg_{lookback}": lookback + 1,
+    }
+    for col, n in needs.items():
+        if window < n:
+            features[col] = np.nan
+    return features
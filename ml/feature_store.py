@@ -0,0 +1,269 @@
+# TRD_BOT_V3/src/ml/feature_store.py
+
+import hashlib
+import json
+import os
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+
+from ml.feature_engineering import engineer_features, engineer_features_windowed, compute_ema
+from utils.kline_cache import interval_ms
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Persistent store of engineered ML features, shared by training (ml/train.py
+# via ml/data_loader), backtests (MLStrategy.run_sim) and live inference
+# (MLStrategy.run), so all three use the same feature definitions.
+#
+# One entry per (symbol, interval, feature-spec hash), stored at
+#   {root}/{symbol}/{interval}/{spec_hash}.npz
+# with the raw bars it was computed from (open_time + OHLCV), one array per
+# feature column and a JSON header (spec, n_rows, data_version = hash of the
+# raw bars). A request for features of a klines frame is matched against the
+# stored bars by open_time:
+#   - rows already stored with identical bars are read back;
+#   - bars after the stored ones are appended, computing only the new rows
+#     (with just enough stored bars before them as context);
+#   - a bar that differs from the stored one truncates the entry there and
+#     everything from it on is recomputed;
+#   - a frame spanning all the stored bars (starting earlier) replaces the entry;
+#   - any other frame that does not connect to the stored bars (e.g. a short
+#     live window after a gap) is computed on its own and not stored, so it
+#     never costs the entry its history. missing_bars() tells a caller how
+#     many bars to fetch to make such a frame connect.
+# Incremental rows are identical to a full recomputation: rolling columns only
+# look back `context` bars, and the full-history EMA is continued from its
+# last stored value with the same recursion.
+# ──────────────────────────────────────────────────────────────────────────────
+
+# Bump when ml.feature_engineering changes what a column means
+FEATURE_SET_VERSION = 1
+RAW_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+class FeatureSpec:
+    """
+    Which features to materialize:
+      lookback: engineer_features() lookback
+      window: None → features over the full history (training, live);
+              k → as engineer_features() computes them for the last row of the
+              k-bar window ending at each bar (the per-bar backtest path)
+    """
+
+    def __init__(self, lookback: int = 50, window: Optional[int] = None):
+        self.lookback = lookback
+        self.window = window
+
+    def params(self) -> dict:
+        return {"set": "engineer_features", "version": FEATURE_SET_VERSION,
+                "lookback": self.lookback, "window": self.window}
+
+    @property
+    def hash(self) -> str:
+        blob = json.dumps(self.params(), sort_keys=True).encode()
+        return hashlib.sha256(blob).hexdigest()[:16]
+
+    @property
+    def context(self) -> int:
+        """Bars before a row that its features can depend on."""
+        if self.window is not None:
+            return self.window - 1
+        return max(self.lookback + 1, 15)
+
+    def compute(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self.window is not None:
+            return engineer_features_windowed(df, self.lookback, self.window)
+        return engineer_features(df, lookback=self.lookback)
+
+def _raw_arrays(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """open_time as int64 epoch ns plus float64 OHLCV columns of a klines frame."""
+    raw = {"open_time": df["open_time"].to_numpy(dtype="datetime64[ns]").view(np.int64)}
+    for col in RAW_COLUMNS:
+        raw[col] = df[col].to_numpy(dtype=np.float64)
+    return raw
+
+def _raw_frame(raw: Dict[str, np.ndarray]) -> pd.DataFrame:
+    data = {"open_time": raw["open_time"].astype("datetime64[ns]")}
+    for col in RAW_COLUMNS:
+        data[col] = raw[col]
+    return pd.DataFrame(data)
+
+def _data_version(raw: Dict[str, np.ndarray]) -> str:
+    h = hashlib.sha256()
+    for col in ["open_time"] + RAW_COLUMNS:
+        h.update(np.ascontiguousarray(raw[col]).tobytes())
+    return h.hexdigest()[:16]
+
+class _Entry:
+    """Stored bars and their feature columns for one (symbol, interval, spec)."""
+
+    def __init__(self, raw: Dict[str, np.ndarray], features: pd.DataFrame):
+        self.raw = raw
+        self.features = features.reset_index(drop=True)
+
+    def __len__(self) -> int:
+        return len(self.raw["open_time"])
+
+    def truncate(self, n: int):
+        self.raw = {k: v[:n] for k, v in self.raw.items()}
+        self.features = self.features.iloc[:n]
+
+class FeatureStore:
+    """
+    features(symbol, interval, spec, klines) → engineered features for every
+    row of `klines` (same index), materialized under `root`.
+    Thread-safe; entries stay in memory once loaded.
+    """
+
+    def __init__(self, root: str = "data/features"):
+        self.root = root
+        self._entries: Dict[Tuple[str, str, str], _Entry] = {}
+        self._locks: Dict[Tuple[str, str, str], threading.Lock] = {}
+        self._locks_lock = threading.Lock()
+        self.stats = {"rows_read": 0, "rows_computed": 0, "rebuilds": 0, "unstored": 0}
+
+    def path(self, symbol: str, interval: str, spec: FeatureSpec) -> str:
+        return os.path.join(self.root, symbol, interval, f"{spec.hash}.npz")
+
+    def _lock(self, key) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _entry(self, key, symbol: str, interval: str, spec: FeatureSpec) -> Optional[_Entry]:
+        """The entry for key, loaded from disk on first use (call with its lock held)."""
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = self._load(self.path(symbol, interval, spec))
+            if entry is not None:
+                self._entries[key] = entry
+        return entry
+
+    def features(self, symbol: str, interval: str, spec: FeatureSpec, klines: pd.DataFrame) -> pd.DataFrame:
+        key = (symbol, interval, spec.hash)
+        raw = _raw_arrays(klines)
+        n = len(raw["open_time"])
+        with self._lock(key):
+            entry = self._entry(key, symbol, interval, spec)
+            start = self._match(entry, raw, interval_ms(interval)) if entry is not None and n else None
+            if start is None:
+                computed = spec.compute(klines)
+                self.stats["rows_computed"] += n
+                if entry is not None and len(entry) and not self._covers(entry, raw):
+                    # Does not connect: serve it, keep the stored history
+                    self.stats["unstored"] += 1
+                    return computed
+                entry = _Entry(raw, computed)
+                self.stats["rebuilds"] += 1
+                start, changed = 0, True
+            else:
+                changed = self._sync(entry, spec, raw, start)
+            self._entries[key] = entry
+            if changed:
+                self._save(self.path(symbol, interval, spec), spec, entry)
+
+            out = entry.features.iloc[start:start + n].copy()
+            out.index = klines.index
+            return out
+
+    def missing_bars(self, symbol: str, interval: str, spec: FeatureSpec, first_open_time) -> Optional[int]:
+        """
+        Bars between the last stored bar and a frame starting at first_open_time:
+        0 if such a frame connects to the entry, None if there is no entry or
+        the frame would start before it.
+        """
+        key = (symbol, interval, spec.hash)
+        first = pd.Timestamp(first_open_time).as_unit("ns").value
+        with self._lock(key):
+            entry = self._entry(key, symbol, interval, spec)
+            if entry is None or not len(entry) or first < entry.raw["open_time"][0]:
+                return None
+            step_ns = interval_ms(interval) * 1_000_000
+            return max(0, int((first - entry.raw["open_time"][-1]) // step_ns) - 1)
+
+    @staticmethod
+    def _covers(entry: _Entry, raw: Dict[str, np.ndarray]) -> bool:
+        """True if the bars in raw span every stored bar's open_time."""
+        stored = entry.raw["open_time"]
+        return raw["open_time"][0] <= stored[0] and raw["open_time"][-1] >= stored[-1]
+
+    def _match(self, entry: _Entry, raw: Dict[str, np.ndarray], step_ms: int) -> Optional[int]:
+        """Position of the first klines bar in the entry (len(entry) if it follows it), or None."""
+        stored = entry.raw["open_time"]
+        first = raw["open_time"][0]
+        pos = int(np.searchsorted(stored, first))
+        if pos < len(stored) and stored[pos] == first:
+            return pos
+        if pos == len(stored) and len(stored) and first - stored[-1] == step_ms * 1_000_000:
+            return pos
+        return None
+
+    def _sync(self, entry: _Entry, spec: FeatureSpec, raw: Dict[str, np.ndarray], start: int) -> bool:
+        """Bring entry in line with bars raw[...] placed at `start`; True if it changed."""
+        overlap = min(len(entry) - start, len(raw["open_time"]))
+        same = np.ones(overlap, dtype=bool)
+        for col in ["open_time"] + RAW_COLUMNS:
+            same &= entry.raw[col][start:start + overlap] == raw[col][:overlap]
+        changed = False
+        if not same.all():
+            entry.truncate(start + int(np.argmin(same)))
+            changed = True
+        new_from = len(entry) - start
+        self.stats["rows_read"] += new_from
+        if new_from < len(raw["open_time"]):
+            self._extend(entry, spec, {k: v[new_from:] for k, v in raw.items()})
+            changed = True
+        return changed
+
+    def _extend(self, entry: _Entry, spec: FeatureSpec, new: Dict[str, np.ndarray]):
+        """Append bars `new` to the entry, computing features for them only."""
+        ctx = min(spec.context, len(entry))
+        frame = _raw_frame({k: np.concatenate([v[len(entry) - ctx:], new[k]]) for k, v in entry.raw.items()})
+        feats = spec.compute(frame).iloc[ctx:]
+        if spec.window is None and len(entry):
+            # Continue the full-history EMA from its last stored value
+            half_lb = max(2, spec.lookback // 2)
+            col = f"ema_{half_lb}"
+            seeded = pd.Series(np.concatenate([[entry.features[col].iloc[-1]], new["close"]]))
+            feats[col] = compute_ema(seeded, half_lb).to_numpy()[1:]
+        entry.raw = {k: np.concatenate([entry.raw[k], new[k]]) for k in entry.raw}
+        entry.features = pd.concat([entry.features, feats], ignore_index=True)
+        self.stats["rows_computed"] += len(feats)
+
+    def _load(self, path: str) -> Optional[_Entry]:
+        if not os.path.isfile(path):
+            return None
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                meta = json.loads(str(z["meta"]))
+                raw = {col: z[col] for col in ["open_time"] + RAW_COLUMNS}
+                features = pd.DataFrame({c: z[f"f:{c}"] for c in meta["columns"]})
+        except (OSError, ValueError, KeyError):
+            # Unreadable entry: recompute rather than fail
+            return None
+        if meta.get("data_version") != _data_version(raw):
+            return None
+        return _Entry(raw, features)
+
+    def _save(self, path: str, spec: FeatureSpec, entry: _Entry):
+        """Write the entry to a temp file and rename it into place."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        meta = {"spec": spec.params(), "n_rows": len(entry),
+                "data_version": _data_version(entry.raw),
+                "columns": list(entry.features.columns)}
+        arrays = dict(entry.raw)
+        for col in entry.features.columns:
+            arrays[f"f:{col}"] = entry.features[col].to_numpy(dtype=np.float64)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **arrays)
+        os.replace(tmp, path)
+
+_SHARED: Dict[str, FeatureStore] = {}
+_SHARED_LOCK = threading.Lock()
+
+def shared_store(root: str = "data/features") -> FeatureStore:
+    """Process-wide FeatureStore for `root` (one in-memory copy per entry)."""
+    with _SHARED_LOCK:
+        if root not in _SHARED:
+            _SHARED[root] = FeatureStore(root)
+        return _SHARED[root]
@@ -1,36 +1,179 @@
 # TRD_BOT_V3/src/ml/model.py
 
-import os
-import pickle
 import numpy as np
 import pandas as pd
 from typing import Union
 
+from ml.model_registry import MODELS, ModelRegistry
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Flat tree-ensemble evaluator.
+#
+# sklearn's predict_proba() on one row costs milliseconds, nearly all of it
+# input validation and joblib dispatch over the trees. FlatForest copies a
+# fitted forest into a few flat arrays (all trees' nodes concatenated) and
+# walks every (row, tree) pair at once, one tree level per NumPy step, so a
+# single row costs tens of microseconds. Leaves point to themselves, so the
+# walk simply runs max_depth steps. Splits compare float32 inputs against
+# the thresholds as sklearn does, and tree outputs are summed in the same
+# order, so the probabilities are the same as sklearn's.
+# sklearn's compiled walk is still faster per row once its call overhead is
+# spread over a large batch, so MLModel only uses FlatForest up to
+# COMPILED_MAX_ROWS rows per call.
+# ──────────────────────────────────────────────────────────────────────────────
+
+COMPILED_MAX_ROWS = 1000
+
+class FlatForest:
+    """
+    Node arrays of a fitted forest classifier (RandomForestClassifier,
+    ExtraTreesClassifier, single output):
+      feature, threshold, left, right, missing_left: per node
+      value: per node class probabilities (n_nodes, n_classes)
+      roots: index of each tree's root node
+    """
+
+    def __init__(self, feature, threshold, left, right, missing_left, value, roots,
+                 max_depth: int, classes, n_features: int, feature_names=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value
+        self.roots = roots
+        self.max_depth = max_depth
+        self.classes_ = classes
+        self.n_features = n_features
+        self.feature_names = feature_names
+
+    @staticmethod
+    def supports(clf) -> bool:
+        """True for fitted single-output forests of decision-tree classifiers."""
+        trees = getattr(clf, "estimators_", None)
+        return (isinstance(trees, list) and len(trees) > 0
+                and all(hasattr(t, "tree_") for t in trees)
+                and getattr(clf, "n_outputs_", 1) == 1
+                and hasattr(clf, "classes_"))
+
+    @classmethod
+    def from_sklearn(cls, clf) -> "FlatForest":
+        if not cls.supports(clf):
+            raise ValueError(f"Cannot flatten {type(clf).__name__}: not a fitted forest classifier")
+        features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+        offset, max_depth = 0, 0
+        for est in clf.estimators_:
+            t = est.tree_
+            n = t.node_count
+            node = np.arange(offset, offset + n)
+            leaf = t.children_left == -1
+            features.append(np.where(leaf, 0, t.feature))
+            thresholds.append(np.where(leaf, 0.0, t.threshold))
+            lefts.append(np.where(leaf, node, t.children_left + offset))
+            rights.append(np.where(leaf, node, t.children_right + offset))
+            mgl = getattr(t, "missing_go_to_left", None)
+            missing.append(np.zeros(n, dtype=bool) if mgl is None else mgl.astype(bool))
+            # Per-leaf class fractions, normalized as DecisionTreeClassifier.predict_proba does
+            v = t.value[:, 0, :].astype(np.float64)
+            norm = v.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            values.append(v / norm)
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, t.max_depth)
+        return cls(
+            feature=np.concatenate(features).astype(np.intp),
+            threshold=np.concatenate(thresholds),
+            left=np.concatenate(lefts).astype(np.intp),
+            right=np.concatenate(rights).astype(np.intp),
+            missing_left=np.concatenate(missing),
+            value=np.concatenate(values),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=clf.classes_,
+            n_features=clf.n_features_in_,
+            feature_names=getattr(clf, "feature_names_in_", None),
+        )
+
+    def _as_array(self, X) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names is not None and list(X.columns) != list(self.feature_names):
+                raise ValueError("Feature names do not match those the model was fitted with")
+            X = X.to_numpy()
+        # Trees split on float32 inputs
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        X = X.reshape(1, -1) if X.ndim == 1 else X
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, the model expects {self.n_features}")
+        return X
+
+    def predict_proba(self, X) -> np.ndarray:
+        """Class probabilities (n_rows, n_classes), columns in classes_ order."""
+        X = self._as_array(X)
+        n = len(X)
+        # Tree-major: nodes[t, i] is where row i currently is in tree t
+        X_cols = np.ascontiguousarray(X.T).ravel()
+        col = np.arange(n)
+        nodes = np.repeat(self.roots[:, None], n, axis=1)
+        has_nan = np.isnan(X).any()
+        for _ in range(self.max_depth):
+            x = X_cols.take(self.feature.take(nodes) * n + col)
+            go_left = x <= self.threshold.take(nodes)
+            if has_nan:
+                go_left |= np.isnan(x) & self.missing_left.take(nodes)
+            nodes = np.where(go_left, self.left.take(nodes), self.right.take(nodes))
+        # Summed tree by tree in order, then averaged, as sklearn accumulates them
+        return self.value.take(nodes, axis=0).sum(axis=0) / len(self.roots)
+
 class MLModel:
     """
     Wrapper around a scikit-learn classifier for predicting P(Up).
-    Expects model files saved as pickles.
+    Expects model files saved with joblib.dump (as ml/train.py does) or
+    pickle. The classifier comes from a ModelRegistry (the process-wide one
+    by default), so models sharing a path share one loaded instance and pick
+    up a retrained file without a restart.
+    compiled=True (default): calls of up to COMPILED_MAX_ROWS rows on a forest
+    are scored with a FlatForest built from the loaded classifier; larger
+    batches and other models go through sklearn.
     """
-    def __init__(self, model_path: str):
-        if not os.path.isfile(model_path):
-            raise FileNotFoundError(f"ML model not found at {model_path}")
-        with open(model_path, "rb") as f:
-            self.clf = pickle.load(f)
+    def __init__(self, model_path: str, registry: ModelRegistry = None, compiled: bool = True):
+        self.model_path = model_path
+        self.registry = MODELS if registry is None else registry
+        self.compiled = compiled
+        self._flat = (None, None)   # (classifier it was built from, FlatForest or None)
+        # Loads (and validates) the model now rather than on the first prediction
+        self.registry.get(model_path)
+
+    @property
+    def clf(self):
+        """The currently loaded classifier (replaced when the file is reloaded)."""
+        return self.registry.get(self.model_path).clf
 
-        # Check that the classifier has predict_proba
-        if not hasattr(self.clf, "predict_proba"):
-            raise ValueError("Loaded model does not support predict_proba()")
+    @property
+    def sha256(self) -> str:
+        return self.registry.get(self.model_path).sha256
 
     def predict_proba(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """
         Return the probability of the “Up” class for each row in X.
         If `clf.classes_` is [0,1], index 1 corresponds to P(Up).
         """
-        probs = self.clf.predict_proba(X)
+        clf = self.clf   # one model for the whole call, even if a reload lands meanwhile
+        flat = self.flat_forest(clf) if self.compiled and len(X) <= COMPILED_MAX_ROWS else None
+        probs = clf.predict_proba(X) if flat is None else flat.predict_proba(X)
         # Find index of class '1'
-        idx_up = list(self.clf.classes_).index(1)
+        idx_up = list(clf.classes_).index(1)
         return probs[:, idx_up]
 
+    def flat_forest(self, clf=None):
+        """FlatForest of the current classifier (rebuilt after a reload), or None if it is not a forest."""
+        clf = self.clf if clf is None else clf
+        built_from, flat = self._flat
+        if built_from is not clf:
+            flat = FlatForest.from_sklearn(clf) if FlatForest.supports(clf) else None
+            self._flat = (clf, flat)
+        return flat
+
     def predict(self, X: Union[pd.DataFrame, np.ndarray]) -> np.ndarray:
         """
         Return binary predictions (0 or 1).
@@ -0,0 +1,147 @@
+# TRD_BOT_V3/src/ml/model_registry.py
+
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Tuple
+
+import joblib
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Process-wide cache of loaded classifiers, keyed by model path and file hash.
+#
+# Every MLModel on the same path reads the one loaded instance, and paths
+# whose files hash the same share it too. Models are loaded fully into memory
+# (no mmap_mode): an array mapped from the file would fault (SIGBUS) as soon
+# as a retrain rewrote it. ml/train.py writes models to a temp file and
+# renames it into place, so a reader never sees a half-written file.
+#
+# Hot reload: a watcher thread stats each file every interval; when the
+# (mtime, size) signature changes it hashes and loads the file on that thread,
+# then replaces the entry in one assignment. Predictions never wait on a load:
+# they use whichever entry is current, and a file that fails to load leaves
+# the previous model in place.
+# ──────────────────────────────────────────────────────────────────────────────
+
+class LoadedModel:
+    """One loaded classifier: `clf`, the file's `sha256` and when it was loaded."""
+
+    def __init__(self, path: str, sha256: str, clf, signature: Tuple):
+        self.path = path
+        self.sha256 = sha256
+        self.clf = clf
+        self.signature = signature   # (mtime_ns, size) the file had when hashed
+        self.loaded_at = time.time()
+
+def _signature(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def load_classifier(path: str):
+    """
+    Unpickle a model file: joblib, falling back to plain pickle.
+    Raises ValueError if it has no predict_proba().
+    """
+    try:
+        clf = joblib.load(path)
+    except Exception:
+        with open(path, "rb") as f:
+            clf = pickle.load(f)
+    if not hasattr(clf, "predict_proba"):
+        raise ValueError("Loaded model does not support predict_proba()")
+    return clf
+
+class ModelRegistry:
+    """
+    get(path) → current LoadedModel for `path`, loading it on first use.
+    Thread-safe; the first load of a path happens on the caller's thread,
+    reloads on the watcher's.
+    """
+
+    def __init__(self):
+        self._models: Dict[str, LoadedModel] = {}   # realpath → current entry
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._stop = threading.Event()
+        self.stats = {"loads": 0, "shared": 0, "reloads": 0, "reload_errors": 0}
+
+    def get(self, path: str) -> LoadedModel:
+        key = os.path.realpath(path)
+        entry = self._models.get(key)
+        if entry is not None:
+            return entry
+        if not os.path.isfile(key):
+            raise FileNotFoundError(f"ML model not found at {path}")
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is None:
+                entry = self._load(key)
+                self._models[key] = entry
+            return entry
+
+    def _load(self, path: str) -> LoadedModel:
+        """Hash and load `path`, reusing a loaded classifier with the same hash."""
+        signature = _signature(path)
+        sha256 = _sha256(path)
+        same = next((m for m in self._models.values() if m.sha256 == sha256), None)
+        if same is not None:
+            self.stats["shared"] += 1
+            return LoadedModel(path, sha256, same.clf, signature)
+        clf = load_classifier(path)
+        self.stats["loads"] += 1
+        return LoadedModel(path, sha256, clf, signature)
+
+    def check(self):
+        """Reload every model whose file changed since it was loaded."""
+        for path, entry in list(self._models.items()):
+            try:
+                if _signature(path) == entry.signature:
+                    continue
+                with self._lock:
+                    fresh = self._load(path)
+                    if fresh.sha256 == entry.sha256:
+                        entry.signature = fresh.signature   # touched, same content
+                        continue
+                    self._models[path] = fresh
+                self.stats["reloads"] += 1
+                logging.info(f"ModelRegistry: reloaded {path} ({entry.sha256[:12]} → {fresh.sha256[:12]})")
+            except Exception as e:
+                # Missing or half-written file: keep serving the old model and
+                # retry once the file changes again
+                self.stats["reload_errors"] += 1
+                try:
+                    entry.signature = _signature(path)
+                except OSError:
+                    pass
+                logging.error(f"ModelRegistry: reload of {path} failed, keeping the loaded model: {e}")
+
+    def start_watcher(self, interval_seconds: float = 30.0):
+        """Call check() every interval on a background thread."""
+        self._stop.clear()
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                self.check()
+        self._watcher = threading.Thread(target=loop, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+# Process-wide registry used by MLModel
+MODELS = ModelRegistry()
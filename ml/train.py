@@ -10,21 +10,30 @@ if SRC_DIR not in sys.path:
     sys.path.insert(0, SRC_DIR)
 
 import argparse
+import itertools
+import json
+import tempfile
+import time
 import joblib
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
-from sklearn.metrics import classification_report, roc_auc_score
+from sklearn.metrics import classification_report, roc_auc_score, accuracy_score
 
 from client.futures_client import FuturesClient
 from ml.data_loader import load_features_and_trade_labels
+from ml.feature_store import FeatureStore, FeatureSpec
 import yaml
 
-def parse_args():
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description="Train ML model from trade history + OHLC.")
-    parser.add_argument("--symbol",           type=str,   required=True,
-                        help="Trading pair, e.g. XRPUSDT")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--symbol",           type=str,
+                        help="Trading pair, e.g. XRPUSDT (single chronological train/test split)")
+    target.add_argument("--symbols",          type=str,   nargs="+",
+                        help="Several pairs: time-series CV over the parameter grid, best model per symbol")
     parser.add_argument("--interval",         type=str,   default="1h",
                         help="OHLC interval, e.g. 1h")
     parser.add_argument("--data_dir",         type=str,   default="data/klines",
@@ -32,30 +41,231 @@ def parse_args():
     parser.add_argument("--lookback",         type=int,   default=50,
                         help="Feature lookback window")
     parser.add_argument("--test_size",        type=float, default=0.2,
-                        help="Test split fraction")
+                        help="Test split fraction (--symbol)")
     parser.add_argument("--model_dir",        type=str,   default="models",
                         help="Where to save the trained model")
-    parser.add_argument("--n_estimators",     type=int,   default=100,
-                        help="RandomForest n_estimators")
-    parser.add_argument("--max_depth",        type=int,   default=5,
-                        help="RandomForest max_depth")
+    parser.add_argument("--n_estimators",     type=int,   nargs="+", default=[100],
+                        help="RandomForest n_estimators (several values form a grid with --symbols)")
+    parser.add_argument("--max_depth",        type=int,   nargs="+", default=[5],
+                        help="RandomForest max_depth (several values form a grid with --symbols)")
+    parser.add_argument("--min_samples_leaf", type=int,   nargs="+", default=[1],
+                        help="RandomForest min_samples_leaf (several values form a grid with --symbols)")
     parser.add_argument("--refresh_interval", type=int,   default=3600,
                         help="Seconds before trade history cache refresh")
-    return parser.parse_args()
+    parser.add_argument("--feature_dir",      type=str,   default="data/features",
+                        help="Feature store folder (engineered features, reused across runs)")
+    parser.add_argument("--cv",               type=str,   default="walk_forward",
+                        choices=["walk_forward", "purged"],
+                        help="walk_forward: train on all bars before each test block; "
+                             "purged: train on all bars outside it (--symbols)")
+    parser.add_argument("--folds",            type=int,   default=5,
+                        help="Number of test blocks (--symbols)")
+    parser.add_argument("--purge",            type=int,   default=1,
+                        help="Bars dropped from training before a test block, "
+                             "at least the label horizon (--symbols)")
+    parser.add_argument("--embargo",          type=int,   default=None,
+                        help="Bars dropped from training after a test block (purged CV), at least "
+                             "the bars a feature row looks back; default: the feature spec's context")
+    parser.add_argument("--jobs",             type=int,   default=os.cpu_count(),
+                        help="Worker processes for folds and final fits (--symbols)")
+    parser.add_argument("--report",           type=str,   default=None,
+                        help="Metrics report path (default: <model_dir>/train_report.json)")
+    args = parser.parse_args(argv)
+    if args.symbol and any(len(v) > 1 for v in (args.n_estimators, args.max_depth, args.min_samples_leaf)):
+        parser.error("parameter grids need --symbols")
+    return args
 
 def load_config(path="config/config.yaml") -> dict:
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
-def main():
-    args = parse_args()
+def save_model(clf, model_path: str):
+    """
+    joblib.dump to a temp file next to model_path, then rename it into place,
+    so a running bot reloading the model never reads a truncated file.
+    """
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    tmp = f"{model_path}.{os.getpid()}.tmp"
+    try:
+        joblib.dump(clf, tmp)
+        os.replace(tmp, model_path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
-    # 0) Load full bot config (for API credentials & symbols settings)
-    cfg = load_config()
+def model_path_for(model_dir: str, symbol: str) -> str:
+    return os.path.join(model_dir, f"{symbol.lower()}_ml_from_trades.pkl")
 
-    # 1) Instantiate FuturesClient (will pick live/testnet keys)
-    client = FuturesClient(cfg)
+# ──────────────────────────────────────────────────────────────────────────────
+# Time-series CV
+#
+# Every (symbol, params, fold) fit is one task on a process pool, so wall time
+# scales with tasks / cores. Each symbol's feature matrix is built once
+# (through the feature store) and saved as .npy; workers memory-map it and
+# slice folds out of it, so no task copies or rebuilds features.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def time_series_folds(n: int, n_folds: int, scheme: str = "walk_forward", purge: int = 1,
+                      embargo: int = 0) -> list:
+    """
+    [(train_ranges, (test_start, test_end)), ...] over n chronological rows.
+    walk_forward: n is cut into n_folds+1 blocks; fold k tests on block k+1
+      and trains on everything before it, minus `purge` bars.
+    purged: n is cut into n_folds blocks; fold k tests on block k and trains
+      on everything else, minus `purge` bars before it and max(purge, embargo)
+      bars after it (rows whose features still look back into the block).
+    Raises ValueError if any fold would have no training or no test rows.
+    """
+    if n_folds < 1:
+        raise ValueError(f"Need at least one fold, got {n_folds}")
+    if scheme == "walk_forward":
+        bounds = np.linspace(0, n, n_folds + 2).astype(int).tolist()
+        folds = [([(0, bounds[k] - purge)], (bounds[k], bounds[k + 1])) for k in range(1, n_folds + 1)]
+    elif scheme == "purged":
+        bounds = np.linspace(0, n, n_folds + 1).astype(int).tolist()
+        after = max(purge, embargo)
+        folds = [([(0, bounds[k] - purge), (bounds[k + 1] + after, n)], (bounds[k], bounds[k + 1]))
+                 for k in range(n_folds)]
+    else:
+        raise ValueError(f"Unknown CV scheme: {scheme}")
+    folds = [([(a, b) for a, b in train if b > a], test) for train, test in folds]
+    for k, (train, (t0, t1)) in enumerate(folds):
+        if not train or t1 <= t0:
+            missing = "test" if t1 <= t0 else "training"
+            raise ValueError(f"{n} rows are too few for {n_folds} {scheme} folds "
+                             f"(purge {purge}, embargo {embargo}): fold {k} has no {missing} rows "
+                             f"(use fewer --folds or more data)")
+    return folds
+
+_MATRICES = {}   # per worker process: symbol → (X, y) memory-mapped
+
+def _matrix(matrix_dir: str, symbol: str):
+    if symbol not in _MATRICES:
+        _MATRICES[symbol] = (np.load(os.path.join(matrix_dir, f"{symbol}_X.npy"), mmap_mode="r"),
+                             np.load(os.path.join(matrix_dir, f"{symbol}_y.npy"), mmap_mode="r"))
+    return _MATRICES[symbol]
+
+def _make_clf(params: dict) -> RandomForestClassifier:
+    # One core per fit: the parallelism is across tasks
+    return RandomForestClassifier(random_state=42, n_jobs=1, **params)
+
+def _fit_fold(task: dict) -> dict:
+    """Fit one (symbol, params, fold) and score it on the fold's test block."""
+    X, y = _matrix(task["matrix_dir"], task["symbol"])
+    train = np.concatenate([np.arange(a, b) for a, b in task["train"]])
+    t0, t1 = task["test"]
+    X_train = pd.DataFrame(X[train], columns=task["columns"])
+    X_test = pd.DataFrame(X[t0:t1], columns=task["columns"])
+    y_train, y_test = y[train], y[t0:t1]
+
+    clf = _make_clf(task["params"]).fit(X_train, y_train)
+    if len(clf.classes_) < 2:
+        prob = np.zeros(len(y_test)) if clf.classes_[0] == 0 else np.ones(len(y_test))
+    else:
+        prob = clf.predict_proba(X_test)[:, list(clf.classes_).index(1)]
+    auc = roc_auc_score(y_test, prob) if len(np.unique(y_test)) == 2 else float("nan")
+    return {
+        "symbol": task["symbol"], "params": task["params"], "fold": task["fold"],
+        "n_train": int(len(train)), "n_test": int(t1 - t0),
+        "auc": float(auc), "accuracy": float(accuracy_score(y_test, prob >= 0.5)),
+    }
+
+def _fit_final(task: dict) -> dict:
+    """Refit the chosen params on all rows of a symbol and save the model."""
+    X, y = _matrix(task["matrix_dir"], task["symbol"])
+    clf = _make_clf(task["params"]).fit(pd.DataFrame(np.asarray(X), columns=task["columns"]), np.asarray(y))
+    save_model(clf, task["model_path"])
+    return {"symbol": task["symbol"], "model_path": task["model_path"]}
+
+def param_grid(args) -> list:
+    keys = ["n_estimators", "max_depth", "min_samples_leaf"]
+    return [dict(zip(keys, values))
+            for values in itertools.product(args.n_estimators, args.max_depth, args.min_samples_leaf)]
+
+def train_grid(args, client) -> dict:
+    """
+    --symbols mode: CV every grid point on every symbol in parallel, refit the
+    best (highest mean fold AUC) on all of a symbol's rows, save it and write
+    a JSON report. Returns the report.
+    """
+    store = FeatureStore(args.feature_dir)
+    grid = param_grid(args)
+    # Training rows after a test block must not have features built from it
+    embargo = FeatureSpec(args.lookback).context if args.embargo is None else args.embargo
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory(prefix="trd_train_") as matrix_dir:
+        # 1) One feature matrix per symbol, shared by every fold and grid point
+        columns, folds = {}, {}
+        for symbol in args.symbols:
+            X, y = load_features_and_trade_labels(
+                symbol=symbol,
+                interval=args.interval,
+                data_dir=args.data_dir,
+                lookback=args.lookback,
+                client=client,
+                refresh_interval=args.refresh_interval,
+                store=store
+            )
+            np.save(os.path.join(matrix_dir, f"{symbol}_X.npy"), X.to_numpy(dtype=np.float64))
+            np.save(os.path.join(matrix_dir, f"{symbol}_y.npy"), y.to_numpy(dtype=np.int64))
+            columns[symbol] = list(X.columns)
+            folds[symbol] = time_series_folds(len(X), args.folds, args.cv, args.purge, embargo)
+            print(f"{symbol}: {len(X)} rows, {len(folds[symbol])} folds, label distribution {y.value_counts().to_dict()}")
 
+        tasks = [
+            {"matrix_dir": matrix_dir, "symbol": symbol, "columns": columns[symbol],
+             "params": params, "fold": k, "train": train, "test": test}
+            for symbol in args.symbols
+            for params in grid
+            for k, (train, test) in enumerate(folds[symbol])
+        ]
+        # Biggest fits first so the pool does not end waiting on one of them
+        tasks.sort(key=lambda t: -t["params"]["n_estimators"] * sum(b - a for a, b in t["train"]))
+        print(f"{len(tasks)} fits ({len(args.symbols)} symbols × {len(grid)} params × {args.folds} folds) "
+              f"on {args.jobs} workers")
+
+        # 2) All folds in parallel, then the final refits
+        with ProcessPoolExecutor(max_workers=args.jobs) as pool:
+            results = list(pool.map(_fit_fold, tasks))
+
+            report = {"cv": args.cv, "folds": args.folds, "purge": args.purge, "embargo": embargo,
+                      "interval": args.interval, "lookback": args.lookback, "symbols": {}}
+            finals = []
+            for symbol in args.symbols:
+                rows = []
+                for params in grid:
+                    scores = [r for r in results if r["symbol"] == symbol and r["params"] == params]
+                    scores.sort(key=lambda r: r["fold"])
+                    aucs = np.array([r["auc"] for r in scores])
+                    rows.append({
+                        "params": params,
+                        "auc_mean": float(np.nanmean(aucs)) if np.isfinite(aucs).any() else float("nan"),
+                        "auc_std": float(np.nanstd(aucs)) if np.isfinite(aucs).any() else float("nan"),
+                        "accuracy_mean": float(np.mean([r["accuracy"] for r in scores])),
+                        "folds": [{k: r[k] for k in ("fold", "n_train", "n_test", "auc", "accuracy")} for r in scores],
+                    })
+                best = max(rows, key=lambda r: -np.inf if np.isnan(r["auc_mean"]) else r["auc_mean"])
+                path = model_path_for(args.model_dir, symbol)
+                report["symbols"][symbol] = {"best_params": best["params"], "best_auc": best["auc_mean"],
+                                             "model_path": path, "grid": rows}
+                finals.append({"matrix_dir": matrix_dir, "symbol": symbol, "columns": columns[symbol],
+                               "params": best["params"], "model_path": path})
+            list(pool.map(_fit_final, finals))
+
+    report["wall_seconds"] = round(time.perf_counter() - started, 2)
+    report_path = args.report or os.path.join(args.model_dir, "train_report.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    for symbol, r in report["symbols"].items():
+        print(f"{symbol}: best {r['best_params']} AUC {r['best_auc']:.4f} → {r['model_path']}")
+    print(f"Report written to {report_path} ({report['wall_seconds']}s)")
+    return report
+
+def train_single(args, client):
+    """--symbol mode: one chronological train/test split, fixed parameters."""
     # 2) Load features & labels
     X, y = load_features_and_trade_labels(
         symbol=args.symbol,
@@ -63,7 +273,8 @@ def main():
         data_dir=args.data_dir,
         lookback=args.lookback,
         client=client,
-        refresh_interval=args.refresh_interval
+        refresh_interval=args.refresh_interval,
+        store=FeatureStore(args.feature_dir)
     )
     print(f"Loaded {len(X)} rows for {args.symbol}. Label distribution:")
     print(y.value_counts().to_dict(), "\n")
@@ -75,8 +286,9 @@ def main():
 
     # 4) Initialize & fit classifier
     clf = RandomForestClassifier(
-        n_estimators=args.n_estimators,
-        max_depth=args.max_depth,
+        n_estimators=args.n_estimators[0],
+        max_depth=args.max_depth[0],
+        min_samples_leaf=args.min_samples_leaf[0],
         random_state=42,
         n_jobs=-1
     )
@@ -91,10 +303,23 @@ def main():
 
     # 6) Save model
     os.makedirs(args.model_dir, exist_ok=True)
-    fname = f"{args.symbol.lower()}_ml_from_trades.pkl"
-    model_path = os.path.join(args.model_dir, fname)
-    joblib.dump(clf, model_path)
+    model_path = model_path_for(args.model_dir, args.symbol)
+    save_model(clf, model_path)
     print(f"Model saved to {model_path}")
 
+def main():
+    args = parse_args()
+
+    # 0) Load full bot config (for API credentials & symbols settings)
+    cfg = load_config()
+
+    # 1) Instantiate FuturesClient (will pick live/testnet keys)
+    client = FuturesClient(cfg)
+
+    if args.symbols:
+        train_grid(args, client)
+    else:
+        train_single(args, client)
+
 if __name__ == "__main__":
     main()
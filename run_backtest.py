@@ -1,10 +1,12 @@
 # run_backtest.py (in project root)
 
 import os
+import argparse
 import yaml
 import pandas as pd
 
 from src.backtesting.backtester import Backtester
+from src.backtesting.portfolio import PortfolioBacktester
 
 def load_config(path="config/config.yaml"):
     with open(path, "r") as f:
@@ -13,9 +15,39 @@ def load_config(path="config/config.yaml"):
 def ensure_dir(path):
     os.makedirs(path, exist_ok=True)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Backtest all enabled symbols.")
+    parser.add_argument("--portfolio", action="store_true",
+                        help="Run all symbols together with shared cash and RiskManager allocations")
+    return parser.parse_args()
+
+def run_portfolio(cfg: dict, hist_dir: str):
+    """Backtest every enabled symbol as one portfolio; results go to backtesting/portfolio_results."""
+    out_dir = os.path.join("backtesting", "portfolio_results")
+    ensure_dir(out_dir)
+
+    pb = PortfolioBacktester(cfg, hist_dir)
+    print(f"Backtesting portfolio: {', '.join(pb.symbols)}…")
+    metrics = pb.run()
+    print(f"→ Portfolio metrics: {metrics}\n")
+
+    for symbol in pb.symbols:
+        print(f"  {symbol}: {pb.symbol_metrics[symbol]}")
+        pd.DataFrame(pb.trades[symbol]).to_csv(os.path.join(out_dir, f"trades_{symbol}.csv"), index=False)
+    pb.equity_frame().to_csv(os.path.join(out_dir, "equity_portfolio.csv"), index=False)
+
+    df_summary = pd.DataFrame([{"symbol": s, **pb.symbol_metrics[s]} for s in pb.symbols])
+    df_summary.to_csv(os.path.join(out_dir, "summary_symbols.csv"), index=False)
+    pd.DataFrame([metrics]).to_csv(os.path.join(out_dir, "summary_portfolio.csv"), index=False)
+    print(f"\n✅ Portfolio backtest complete. Results saved in {out_dir}/")
+
 def main():
+    args = parse_args()
     cfg = load_config()
     hist_dir = os.path.join("data", "klines")
+    if args.portfolio:
+        return run_portfolio(cfg, hist_dir)
+
     out_dir = os.path.join("backtesting", "default_results")
     ensure_dir(out_dir)
 
@@ -0,0 +1,238 @@
+# scripts/benchmark_backtest.py
+#
+# Backtester speed benchmark.
+#
+#   python scripts/benchmark_backtest.py --out backtesting/benchmarks/baseline.json
+#   python scripts/benchmark_backtest.py --baseline backtesting/benchmarks/baseline.json
+#
+# Runs Backtester.run() for grid, mean_reversion and ml (with a small stub
+# model) on the bundled data/klines files and on synthetic series, each case
+# in a fresh process so peak RSS is per case. Reports bars/sec (fastest of
+# --repeat runs), peak RSS and per-phase timings (load, setup, loop, metrics)
+# as JSON; with --baseline, flags cases that got slower or bigger than
+# --tolerance and exits with 1.
+
+import os
+import sys
+import glob
+import json
+import time
+import pickle
+import argparse
+import platform
+import resource
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from src.backtesting.backtester import Backtester
+from utils.kline_store import open_klines
+
+STRATEGIES = ["grid", "mean_reversion", "ml"]
+SYNTHETIC_SIZES = [10_000, 100_000, 1_000_000]
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark Backtester.run() throughput.")
+    parser.add_argument("--data_dir", type=str, default="data/klines",
+                        help="Folder with the bundled OHLC CSVs")
+    parser.add_argument("--strategies", nargs="+", default=STRATEGIES, choices=STRATEGIES)
+    parser.add_argument("--sizes", nargs="*", type=int, default=SYNTHETIC_SIZES,
+                        help="Synthetic series lengths in bars (none to skip)")
+    parser.add_argument("--symbols", nargs="*", default=None,
+                        help="Bundled symbols to run (default: all in data_dir; none to skip)")
+    parser.add_argument("--ml_max_bars", type=int, default=5000,
+                        help="ml cases replay only the last N bars (keeps the per-bar path, ml.batch_inference off, affordable)")
+    parser.add_argument("--out", type=str, default="backtesting/benchmarks/latest.json",
+                        help="Where the JSON report is written")
+    parser.add_argument("--baseline", type=str, default=None,
+                        help="Earlier report to compare against")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Runs per case; the fastest loop is reported")
+    parser.add_argument("--tolerance", type=float, default=0.15,
+                        help="Allowed relative drop in bars/sec (and growth in peak RSS)")
+    return parser.parse_args()
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Inputs: synthetic series, stub model, per-case config
+# ──────────────────────────────────────────────────────────────────────────────
+
+def synthetic_klines(n: int, seed: int = 0) -> pd.DataFrame:
+    """Hourly random-walk OHLCV series with n bars (deterministic for a seed)."""
+    rng = np.random.default_rng(seed)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, n)))
+    open_ = np.concatenate([[100.0], close[:-1]])
+    spread = np.abs(rng.normal(0.0, 0.005, n)) * close
+    return pd.DataFrame({
+        "open_time": pd.date_range("2020-01-01", periods=n, freq="h"),
+        "open": open_,
+        "high": np.maximum(open_, close) + spread,
+        "low": np.minimum(open_, close) - spread,
+        "close": close,
+        "volume": rng.uniform(100.0, 1000.0, n),
+    })
+
+def write_stub_model(path: str, df: pd.DataFrame, lookback: int = 50):
+    """Tiny RandomForest on engineered features (next-bar up/down), pickled for MLModel."""
+    from sklearn.ensemble import RandomForestClassifier
+    from ml.feature_engineering import engineer_features
+
+    df = df.iloc[:5000]
+    X = engineer_features(df, lookback=lookback).replace([np.inf, -np.inf], np.nan)
+    y = (df["close"].shift(-1) > df["close"]).astype(int)
+    mask = X.notna().all(axis=1)
+    mask.iloc[-1] = False
+    clf = RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0)
+    clf.fit(X[mask], y[mask])
+    with open(path, "wb") as f:
+        pickle.dump(clf, f)
+
+def bench_config(symbol: str, strategy: str, model_path: str, feature_dir: str) -> dict:
+    """
+    Minimal config for one symbol, using each strategy's default parameters.
+    ml runs the per-bar path (batch_inference off) and keeps its feature
+    store in feature_dir, so benchmark symbols never land in data/features.
+    """
+    sym_cfg = {"contract_type": "PERPETUAL", "strategy": strategy, "allocation_pct": 10}
+    if strategy == "ml":
+        sym_cfg["ml"] = {"model_path": model_path, "threshold_buy": 0.55,
+                         "threshold_sell": 0.45, "lookback": 50,
+                         "batch_inference": False, "feature_dir": feature_dir}
+    return {
+        "capital_usdt": 1000,
+        "symbols": {symbol: sym_cfg},
+        "defaults": {"leverage": 1, "position_mode": "ONE_WAY"},
+        "risk_defaults": {"max_position_size_pct": 100, "stop_loss_pct": 0.05, "take_profit_pct": 0.15},
+    }
+
+# ──────────────────────────────────────────────────────────────────────────────
+# One case = one Backtester.run() in a fresh process
+# ──────────────────────────────────────────────────────────────────────────────
+
+def run_case(case: dict) -> dict:
+    cfg = bench_config(case["symbol"], case["strategy"], case["model_path"], case["feature_dir"])
+    best = None
+    for _ in range(case["repeat"]):
+        bt = Backtester(case["symbol"], cfg, case["data_dir"], case["strategy"], start=case["start"])
+        metrics = bt.run()
+        if best is None or bt.timings["loop"] < best.timings["loop"]:
+            best = bt
+    bt = best
+    bars = bt.end - bt.start
+    loop = bt.timings["loop"]
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_mb = rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+    return {
+        "case": f"{case['strategy']}/{case['dataset']}",
+        "strategy": case["strategy"],
+        "dataset": case["dataset"],
+        "bars": bars,
+        "bars_per_sec": bars / loop if loop > 0 else float("inf"),
+        "peak_rss_mb": round(rss_mb, 1),
+        "timings": {k: round(v, 4) for k, v in bt.timings.items()},
+        "n_trades": metrics["n_trades"],
+    }
+
+def run_isolated(case: dict) -> dict:
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        return pool.submit(run_case, case).result()
+
+def compare(results: list, baseline: dict, tolerance: float) -> list:
+    """Messages for cases slower (bars/sec) or bigger (peak RSS) than baseline beyond tolerance."""
+    before = {r["case"]: r for r in baseline.get("results", [])}
+    regressions = []
+    for r in results:
+        b = before.get(r["case"])
+        if b is None:
+            continue
+        speed = r["bars_per_sec"] / b["bars_per_sec"] - 1
+        rss = r["peak_rss_mb"] / b["peak_rss_mb"] - 1
+        if speed < -tolerance:
+            regressions.append(f"{r['case']}: bars/sec {b['bars_per_sec']:.0f} → {r['bars_per_sec']:.0f} ({speed:+.0%})")
+        if rss > tolerance:
+            regressions.append(f"{r['case']}: peak RSS {b['peak_rss_mb']:.0f} → {r['peak_rss_mb']:.0f} MB ({rss:+.0%})")
+    return regressions
+
+def main():
+    args = parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="trd_bench_") as tmp:
+        # 2) Datasets: bundled CSVs plus synthetic series written next to them in tmp
+        datasets = []
+        bundled = sorted(glob.glob(os.path.join(args.data_dir, "*_PERPETUAL_1h.csv")))
+        for path in bundled:
+            symbol = os.path.basename(path).split("_")[0]
+            if args.symbols is None or symbol in args.symbols:
+                datasets.append((symbol, args.data_dir, symbol))
+        for n in args.sizes or []:
+            symbol = f"SYN{n}"
+            synthetic_klines(n).to_csv(os.path.join(tmp, f"{symbol}_PERPETUAL_1h.csv"), index=False)
+            datasets.append((f"synthetic_{n}", tmp, symbol))
+
+        # Build binary caches up front so "load" always measures a warm read
+        n_rows = {}
+        for name, data_dir, symbol in datasets:
+            meta, _ = open_klines(os.path.join(data_dir, f"{symbol}_PERPETUAL_1h.csv"))
+            n_rows[name] = meta["n_rows"]
+
+        model_path = os.path.join(tmp, "stub_model.pkl")
+        if "ml" in args.strategies:
+            write_stub_model(model_path, synthetic_klines(5000, seed=1))
+
+        # 3) Run every (strategy, dataset) case
+        results = []
+        for name, data_dir, symbol in datasets:
+            n = n_rows[name]
+            for strategy in args.strategies:
+                start = max(0, n - args.ml_max_bars) if strategy == "ml" else 0
+                case = dict(strategy=strategy, dataset=name, symbol=symbol, data_dir=data_dir,
+                            model_path=model_path, feature_dir=os.path.join(tmp, "features"),
+                            start=start,
+                            repeat=1 if strategy == "ml" else args.repeat)
+                r = run_isolated(case)
+                results.append(r)
+                t = r["timings"]
+                print(f"{r['case']:<32} {r['bars']:>9} bars  {r['bars_per_sec']:>10.0f} bars/s  "
+                      f"{r['peak_rss_mb']:>7.1f} MB  load={t.get('load', 0):.3f}s "
+                      f"loop={t['loop']:.3f}s metrics={t['metrics']:.3f}s")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    out_dir = os.path.dirname(args.out)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved benchmark report to {args.out}")
+
+    # 4) Compare against a saved baseline
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"⚠️  {len(regressions)} regression(s) vs {args.baseline}:")
+            for msg in regressions:
+                print(f"  {msg}")
+            sys.exit(1)
+        print(f"✅ No regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# scripts/benchmark_inference.py
+#
+# ML inference micro-benchmark.
+#
+#   python scripts/benchmark_inference.py
+#   python scripts/benchmark_inference.py --n_estimators 300 --max_depth 8 --out backtesting/benchmarks/inference.json
+#
+# Fits a RandomForest on engineered features of a synthetic series (next-bar
+# up/down) and times predict_proba() for one row, the way live MLStrategy.run()
+# calls it, and for a full batch: sklearn vs the FlatForest evaluator used by
+# MLModel. Reports median/p99 microseconds per call, rows/sec for the batch
+# and the largest probability difference between the two.
+
+import os
+import sys
+import json
+import time
+import argparse
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from ml.feature_engineering import engineer_features
+from ml.model import FlatForest
+from scripts.benchmark_backtest import synthetic_klines
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark single-row and batch forest inference.")
+    parser.add_argument("--bars", type=int, default=20_000, help="Synthetic bars (training + scoring)")
+    parser.add_argument("--n_estimators", type=int, default=100)
+    parser.add_argument("--max_depth", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=500, help="Single-row calls timed per evaluator")
+    parser.add_argument("--out", type=str, default=None, help="Optional JSON report path")
+    return parser.parse_args()
+
+def time_calls(fn, rows) -> np.ndarray:
+    """Seconds per call of fn(row) for each row."""
+    out = np.empty(len(rows))
+    for i, row in enumerate(rows):
+        t0 = time.perf_counter()
+        fn(row)
+        out[i] = time.perf_counter() - t0
+    return out
+
+def main():
+    args = parse_args()
+
+    # 2) Features and labels as in the backtest stub model
+    df = synthetic_klines(args.bars, seed=2)
+    X = engineer_features(df, lookback=50).replace([np.inf, -np.inf], np.nan)
+    y = (df["close"].shift(-1) > df["close"]).astype(int)
+    mask = X.notna().all(axis=1)
+    mask.iloc[-1] = False
+    X, y = X[mask], y[mask]
+    half = len(X) // 2
+    clf = RandomForestClassifier(n_estimators=args.n_estimators, max_depth=args.max_depth, random_state=0)
+    clf.fit(X.iloc[:half], y.iloc[:half])
+    X_test = X.iloc[half:]
+
+    t0 = time.perf_counter()
+    flat = FlatForest.from_sklearn(clf)
+    export_s = time.perf_counter() - t0
+
+    # 3) Single rows (one-row DataFrames, as MLStrategy passes them)
+    rows = [X_test.iloc[[i]] for i in range(min(args.calls, len(X_test)))]
+    for row in rows[:5]:   # warm up both paths
+        clf.predict_proba(row), flat.predict_proba(row)
+    single = {
+        "sklearn": time_calls(clf.predict_proba, rows),
+        "flat": time_calls(flat.predict_proba, rows),
+    }
+
+    # 4) Whole test set in one call
+    batch = {}
+    for name, fn in (("sklearn", clf.predict_proba), ("flat", flat.predict_proba)):
+        t0 = time.perf_counter()
+        probs = fn(X_test)
+        batch[name] = (time.perf_counter() - t0, probs)
+    max_diff = float(np.abs(batch["sklearn"][1] - batch["flat"][1]).max())
+
+    us = 1e6
+    report = {
+        "model": {"n_estimators": args.n_estimators, "max_depth": args.max_depth,
+                  "nodes": int(len(flat.feature)), "export_ms": round(export_s * 1000, 3)},
+        "single_row": {name: {"median_us": round(float(np.median(t)) * us, 1),
+                              "p99_us": round(float(np.percentile(t, 99)) * us, 1)}
+                       for name, t in single.items()},
+        "batch": {name: {"rows": len(X_test), "rows_per_sec": round(len(X_test) / secs)}
+                  for name, (secs, _) in batch.items()},
+        "max_abs_diff": max_diff,
+    }
+    speedup = np.median(single["sklearn"]) / np.median(single["flat"])
+
+    for name in ("sklearn", "flat"):
+        s, b = report["single_row"][name], report["batch"][name]
+        print(f"{name:<8} single row: median {s['median_us']:>9.1f} µs  p99 {s['p99_us']:>9.1f} µs   "
+              f"batch: {b['rows_per_sec']:>10} rows/s")
+    print(f"single-row speedup x{speedup:.0f}, max |Δp| = {max_diff:.3g} "
+          f"({report['model']['nodes']} nodes, exported in {report['model']['export_ms']} ms)")
+
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.out}")
+
+if __name__ == "__main__":
+    main()
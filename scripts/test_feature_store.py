@@ -0,0 +1,129 @@
+# scripts/test_feature_store.py
+#
+# Checks for ml.feature_store.FeatureStore: features built incrementally
+# (appended bars, revised bars, reloads from disk) are bit-identical to a
+# full engineer_features() recomputation; frames that do not connect never
+# overwrite stored history; and MLStrategy's live window joins the stored
+# history across a gap longer than one klines request.
+#
+#   python scripts/test_feature_store.py
+
+import os, sys, tempfile
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+import pandas as pd
+
+from ml.feature_engineering import engineer_features, engineer_features_windowed
+from ml.feature_store import FeatureStore, FeatureSpec
+from strategies.ml_strategy import MLStrategy
+from utils.kline_cache import MAX_LIMIT
+from scripts.benchmark_backtest import synthetic_klines
+
+def identical(a: pd.DataFrame, b: pd.DataFrame) -> bool:
+    """Same columns and bit-identical values (NaN where the other has NaN)."""
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    x, y = a.to_numpy(dtype=np.float64), b.to_numpy(dtype=np.float64)
+    return np.array_equal(x.view(np.int64), y.view(np.int64)) or np.array_equal(x, y, equal_nan=True)
+
+LOOKBACK = 50
+df = synthetic_klines(4000, seed=11)
+full = engineer_features(df, lookback=LOOKBACK)
+spec = FeatureSpec(LOOKBACK)
+root = tempfile.mkdtemp(prefix="trd_features_")
+
+# 2) Growing history, a few bars at a time, matches the full recomputation
+store = FeatureStore(root)
+end = 300
+assert identical(store.features("S", "1h", spec, df.iloc[:end]), full.iloc[:end])
+for chunk in (1, 1, 7, 50, 142, 1, 499):
+    end += chunk
+    out = store.features("S", "1h", spec, df.iloc[:end])
+    assert identical(out, full.iloc[:end]), end
+assert store.stats["rows_computed"] == end and store.stats["rebuilds"] == 1
+
+# 3) Reloaded from disk: read back, nothing recomputed
+store = FeatureStore(root)
+assert identical(store.features("S", "1h", spec, df.iloc[:end]), full.iloc[:end])
+assert store.stats["rows_computed"] == 0 and store.stats["rows_read"] == end
+# a window inside the stored range keeps its own index
+window = df.iloc[500:600]
+out = store.features("S", "1h", spec, window)
+assert out.index.equals(window.index) and identical(out, full.iloc[500:600])
+
+# 4) A revised bar truncates the entry there and recomputes from it on
+revised = df.iloc[:end].copy()
+revised.loc[800, "close"] *= 1.01
+out = store.features("S", "1h", spec, revised)
+assert identical(out, engineer_features(revised, lookback=LOOKBACK))
+assert store.stats["rows_computed"] == end - 800
+
+# 5) Windowed features (the per-bar backtest path) extend the same way
+wspec = FeatureSpec(LOOKBACK, window=LOOKBACK + 2)
+wfull = engineer_features_windowed(df.iloc[:1500], LOOKBACK, LOOKBACK + 2)
+wstore = FeatureStore(root)
+wstore.features("S", "1h", wspec, df.iloc[:700])
+assert identical(wstore.features("S", "1h", wspec, df.iloc[:1500]), wfull)
+
+# 6) Frames that do not connect are served but never stored; one spanning
+#    every stored bar replaces the entry
+root2 = tempfile.mkdtemp(prefix="trd_features_")
+store = FeatureStore(root2)
+store.features("S", "1h", spec, df.iloc[:1000])
+path = store.path("S", "1h", spec)
+size = os.path.getsize(path)
+live = df.iloc[3000:3051]
+out = store.features("S", "1h", spec, live)
+assert identical(out, engineer_features(live, lookback=LOOKBACK)) and out.index.equals(live.index)
+assert store.stats["unstored"] == 1 and os.path.getsize(path) == size
+assert FeatureStore(root2).missing_bars("S", "1h", spec, live["open_time"].iloc[0]) == 2000
+later = df.iloc[200:1100]                     # starts inside, extends: appended
+store.features("S", "1h", spec, later)
+assert len(FeatureStore(root2)._load(path)) == 1100
+store.features("S", "1h", spec, df.iloc[:1300])   # spans everything: replaces
+assert store.stats["rebuilds"] == 1 and len(FeatureStore(root2)._load(path)) == 1300
+
+# 7) Live: MLStrategy fetches the gap in pages, then every bar just appends.
+#    The last row equals the full-history features bit for bit.
+class KlineClient:
+    """get_klines over df, as GET /fapi/v1/klines returns rows."""
+    def __init__(self, frame):
+        self.ms = frame["open_time"].to_numpy(dtype="datetime64[ms]").astype(np.int64)
+        self.frame, self.requests = frame, 0
+
+    def get_klines(self, symbol, interval, limit=500, start_time=None):
+        self.requests += 1
+        assert limit <= MAX_LIMIT
+        first = int(np.searchsorted(self.ms, start_time))
+        sl = self.frame.iloc[first:first + limit]
+        return [[int(t), str(o), str(h), str(l), str(c), str(v), int(t) + 3_599_999]
+                for t, o, h, l, c, v in zip(self.ms[first:first + limit], sl["open"], sl["high"],
+                                            sl["low"], sl["close"], sl["volume"])]
+
+class Probe:
+    def predict_proba(self, X):
+        self.X = X
+        return np.array([0.5])
+
+root3 = tempfile.mkdtemp(prefix="trd_features_")
+FeatureStore(root3).features("S", "1h", spec, df.iloc[:1000])     # training run
+gap = 1800                                                        # > one klines request
+strat = MLStrategy.__new__(MLStrategy)
+strat.symbol, strat.interval, strat.lookback = "S", "1h", LOOKBACK
+strat.features, strat.model, strat.feature_gap_bars = FeatureStore(root3), Probe(), 2000
+strat.client = KlineClient(df)
+first = 1000 + gap
+for bar in range(first + LOOKBACK, first + LOOKBACK + 3):
+    window = df.iloc[bar - LOOKBACK:bar + 1].reset_index(drop=True)
+    assert strat._predict_live(window) == 0.5
+    assert identical(strat.model.X.reset_index(drop=True), full.iloc[[bar]].reset_index(drop=True)), bar
+assert strat.client.requests == 2                 # the gap once, in two pages
+assert strat.features.stats["unstored"] == 0
+assert len(FeatureStore(root3)._load(strat.features.path("S", "1h", spec))) == first + LOOKBACK + 3
+
+print("FeatureStore checks passed")
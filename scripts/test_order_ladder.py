@@ -0,0 +1,233 @@
+# scripts/test_order_ladder.py
+#
+# Checks for utils.order_ladder (diff_ladder, OrderLadder.refresh/sync) and
+# the GridStrategy ladder mode on the exchange simulator: HEDGE mode closes
+# the LONG leg instead of opening SHORT, and fills reach the PositionManager
+# as one record per symbol. Simulated symbols get the template config and
+# their filters from the simulator.
+#
+#   python scripts/test_order_ladder.py
+
+import os, sys, tempfile
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from utils.order_ladder import OrderLadder, diff_ladder, round_step
+from utils.position_manager import PositionManager
+from client.sim_exchange import SimExchange, SimFuturesClient
+from strategies.grid_strategy import GridStrategy
+from scripts.benchmark_backtest import synthetic_klines
+
+def resting(order_id, side, price, qty, position_side="BOTH", tag="grid_"):
+    return {"orderId": order_id, "side": side, "price": str(price), "origQty": str(qty),
+            "positionSide": position_side, "clientOrderId": f"{tag}{order_id}"}
+
+# 2) diff_ladder: keep / cancel / create
+desired = [{"side": "BUY", "price": 99.0, "qty": 1.0},
+           {"side": "BUY", "price": 98.0, "qty": 1.0},
+           {"side": "SELL", "price": 101.0, "qty": 1.0}]
+book = [resting(1, "BUY", 99.0, 1.0),          # exact → keep
+        resting(2, "BUY", 98.04, 1.0),         # within tolerance → keep
+        resting(3, "SELL", 102.0, 1.0),        # price too far → cancel
+        resting(4, "BUY", 97.0, 1.0)]          # no level → cancel
+keep, cancel, create = diff_ladder(desired, book, price_tolerance=0.05)
+assert sorted(o["orderId"] for o in keep) == [1, 2]
+assert sorted(o["orderId"] for o in cancel) == [3, 4]
+assert create == [{"side": "SELL", "price": 101.0, "qty": 1.0}]
+
+# quantity outside qty_tolerance, or the wrong side, never matches
+keep, cancel, create = diff_ladder([{"side": "BUY", "price": 99.0, "qty": 1.0}],
+                                   [resting(1, "BUY", 99.0, 1.02), resting(2, "SELL", 99.0, 1.0)],
+                                   price_tolerance=0.5, qty_tolerance=0.01)
+assert not keep and len(cancel) == 2 and len(create) == 1
+keep, _, _ = diff_ladder([{"side": "BUY", "price": 99.0, "qty": 1.0}],
+                         [resting(1, "BUY", 99.0, 1.005)], price_tolerance=0.0, qty_tolerance=0.01)
+assert len(keep) == 1
+
+# HEDGE: positionSide must match (missing on either side means BOTH)
+level = {"side": "SELL", "price": 101.0, "qty": 1.0, "positionSide": "LONG"}
+keep, cancel, create = diff_ladder([level], [resting(1, "SELL", 101.0, 1.0, "SHORT")], 0.1)
+assert not keep and len(cancel) == 1 and create == [level]
+keep, _, _ = diff_ladder([level], [resting(1, "SELL", 101.0, 1.0, "LONG")], 0.1)
+assert len(keep) == 1
+keep, _, _ = diff_ladder([{"side": "BUY", "price": 99.0, "qty": 1.0}],
+                         [resting(1, "BUY", 99.0, 1.0, "BOTH")], 0.0)
+assert len(keep) == 1
+
+# each open order satisfies one level only; a level takes the nearest order
+keep, cancel, create = diff_ladder([{"side": "BUY", "price": 99.0, "qty": 1.0},
+                                    {"side": "BUY", "price": 99.2, "qty": 1.0}],
+                                   [resting(1, "BUY", 99.15, 1.0)], price_tolerance=0.5)
+assert len(keep) == 1 and len(create) == 1 and not cancel
+keep, _, _ = diff_ladder([{"side": "BUY", "price": 99.0, "qty": 1.0}],
+                         [resting(1, "BUY", 99.3, 1.0), resting(2, "BUY", 99.1, 1.0)], 0.5)
+assert [o["orderId"] for o in keep] == [2]
+
+# 3) round_step and the required filters
+assert round_step(99.04, 0.1) == 99.0 and round_step(0.12351, 0.001) == 0.124
+for bad in (None, 0, -0.1):
+    try:
+        round_step(1.0, bad)
+        raise AssertionError("round_step must reject an unset step")
+    except ValueError:
+        pass
+try:
+    OrderLadder(object(), "X", tick_size=0.1)
+    raise AssertionError("OrderLadder must require qty_step")
+except ValueError:
+    pass
+
+# 4) sync against a fake client: rounding, minimal changes, fills vs outside cancels
+class FakeClient:
+    def __init__(self):
+        self.book, self.orders, self.next_id = {}, {}, 100
+        self.calls = {"place": 0, "cancel": 0, "get_order": 0}
+        self.fail_lookup = set()
+
+    def get_open_orders(self, symbol):
+        return [dict(o) for o in self.book.values()]
+
+    def get_order(self, symbol, orderId):
+        self.calls["get_order"] += 1
+        if orderId in self.fail_lookup:
+            raise RuntimeError("timeout")
+        return dict(self.orders[orderId])
+
+    def place_orders(self, orders):
+        self.calls["place"] += 1
+        out = []
+        for o in orders:
+            self.next_id += 1
+            order = {"orderId": self.next_id, "symbol": o["symbol"], "side": o["side"],
+                     "price": str(o["price"]), "origQty": str(o["quantity"]),
+                     "executedQty": "0", "status": "NEW", "updateTime": self.next_id,
+                     "positionSide": o.get("positionSide") or "BOTH",
+                     "clientOrderId": o["newClientOrderId"]}
+            self.book[self.next_id] = order
+            self.orders[self.next_id] = order
+            out.append(dict(order))
+        return out
+
+    def cancel_orders(self, symbol, order_ids):
+        self.calls["cancel"] += 1
+        out = []
+        for oid in order_ids:
+            order = self.book.pop(int(oid))
+            order["status"] = "CANCELED"
+            out.append(dict(order))
+        return out
+
+    def fill(self, order_id):
+        order = self.book.pop(order_id)
+        order.update(status="FILLED", executedQty=order["origQty"])
+
+    def cancel_outside(self, order_id):
+        self.book.pop(order_id)["status"] = "CANCELED"
+
+client = FakeClient()
+manual = resting(1, "BUY", 50.0, 1.0, tag="manual_")
+client.book[1] = client.orders[1] = manual
+ladder = OrderLadder(client, "X", tick_size=0.1, qty_step=0.001)
+grid = [{"side": "BUY", "price": 99.04, "qty": 0.12345},
+        {"side": "BUY", "price": 98.01, "qty": 0.12345},
+        {"side": "SELL", "price": 101.06, "qty": 0.12345}]
+r = ladder.sync(grid, price_tolerance=0.05)
+assert (r["kept"], r["cancelled"], r["created"]) == (0, 0, 3) and not r["errors"]
+prices = sorted(o["price"] for o in client.book.values() if o["clientOrderId"].startswith("grid_"))
+assert prices == ["101.1", "98.0", "99.0"]
+assert all(o["origQty"] == "0.123" for o in client.book.values() if o["orderId"] != 1)
+
+r = ladder.sync(grid, price_tolerance=0.05)          # nothing changed: no requests
+assert (r["kept"], r["cancelled"], r["created"]) == (3, 0, 0)
+assert client.calls["place"] == 1 and client.calls["cancel"] == 0
+
+by_price = {o["price"]: o["orderId"] for o in client.book.values()}
+client.fill(by_price["99.0"])
+client.cancel_outside(by_price["98.0"])
+client.fail_lookup.add(by_price["101.1"])
+client.fill(by_price["101.1"])
+r = ladder.sync(grid, price_tolerance=0.05)
+assert [o["orderId"] for o in r["filled"]] == [by_price["99.0"]]
+assert r["filled"][0]["status"] == "FILLED"
+assert [o["orderId"] for o in r["removed"]] == [by_price["98.0"]]
+assert r["created"] == 3 and 1 in client.book           # manual order untouched
+client.fail_lookup.clear()
+r = ladder.sync(grid, price_tolerance=0.05)           # failed lookup retried
+assert [o["orderId"] for o in r["filled"]] == [by_price["101.1"]] and not r["removed"]
+r = ladder.sync(grid, price_tolerance=0.05)
+assert not r["filled"] and not r["removed"]
+
+# an order the ladder cancelled itself is neither filled nor removed
+r = ladder.sync(grid[:2], price_tolerance=0.05)
+assert r["cancelled"] == 1
+r = ladder.sync(grid[:2], price_tolerance=0.05)
+assert not r["filled"] and not r["removed"]
+assert ladder.cancel_all() == 2 and list(client.book) == [1]
+assert not ladder.sync([], 0.0)["removed"]
+
+# 5) GridStrategy ladder on the simulator, HEDGE mode
+df = synthetic_klines(3000, seed=5)
+source = {"open_time": df["open_time"].to_numpy(dtype="datetime64[ns]").view(np.int64)}
+for col in ("open", "high", "low", "close", "volume"):
+    source[col] = df[col].to_numpy(dtype=np.float64)
+exchange = SimExchange({"SYN": source}, {"SIMUSDT": ("SYN", 0)}, ticks_per_bar=6,
+                       start_bar=200, participation=0.5, balance=10_000.0)
+sim = SimFuturesClient(exchange)
+cfg = {
+    "capital_usdt": 10_000,
+    "defaults": {"leverage": 1, "position_mode": "HEDGE"},
+    "risk_defaults": {"stop_loss_pct": 0.05, "take_profit_pct": 0.15},
+    "symbols": {"SIMUSDT": {"allocation_pct": 50, "position_mode": "HEDGE",
+                            "grid": {"vol_lookback": 20, "vol_multiplier": 2.0,
+                                     "base_spacing_pct": 0.005, "ladder": True,
+                                     "tick_size": 0.01, "qty_step": 0.001}}},
+}
+pm_dir = tempfile.mkdtemp(prefix="trd_ladder_")
+pm = PositionManager(os.path.join(pm_dir, "positions.json"), snapshot_ttl=0.0, fsync=False)
+strategy = GridStrategy(sim, cfg, "SIMUSDT", pm=pm)
+max_long, fills_seen = 0.0, 0
+for _ in range(2000):
+    if not exchange.step():
+        break
+    strategy.run()
+    long_amt = exchange.positions.get(("SIMUSDT", "LONG"), [0.0, 0.0])[0]
+    assert long_amt >= -1e-9, long_amt                    # SELLs never over-close
+    assert ("SIMUSDT", "SHORT") not in exchange.positions  # nothing ever opens SHORT
+    max_long = max(max_long, long_amt)
+trades = exchange.account_trades("SIMUSDT")
+sells = [t for t in trades if t["side"] == "SELL"]
+assert len(trades) > 50 and sells, len(trades)
+assert all(t["positionSide"] == "LONG" for t in trades)
+assert sum(float(t["realizedPnl"]) != 0.0 for t in sells) == len(sells)
+# the long leg stays within the allocation: 5000 USDT at the lowest price seen
+assert max_long <= 5_000 / float(df["low"].iloc[200:600].min()) + 1e-6, max_long
+# fills recorded as one FILLED record, cleared once the leg is flat
+record = pm.state.get("SIMUSDT")
+long_amt = exchange.positions.get(("SIMUSDT", "LONG"), [0.0, 0.0])[0]
+if long_amt > 0:
+    assert record is not None and record["status"] == "FILLED"
+pm.close()
+
+# 6) Simulated symbols: main.py copies exchange.simulator.template for every
+#    replayed symbol config.yaml does not list, and the ladder takes its
+#    filters from the simulator
+from main import add_simulated_symbols
+exchange = SimExchange({"SYN": source}, {"SIMUSDT": ("SYN", 0), "SIM001USDT": ("SYN", 97),
+                                         "SIM002USDT": ("SYN", 194)}, start_bar=200)
+template = {"strategy": "grid", "allocation_pct": 1, "grid": {"ladder": True}}
+assert add_simulated_symbols(cfg, {}, exchange) == []
+assert add_simulated_symbols(cfg, {"template": template}, exchange) == ["SIM001USDT", "SIM002USDT"]
+assert cfg["symbols"]["SIMUSDT"]["allocation_pct"] == 50           # configured entry kept
+sym_cfg = cfg["symbols"]["SIM002USDT"]
+assert sym_cfg["enabled"] and sym_cfg["grid"] == {"ladder": True}
+assert sym_cfg["grid"] is not template["grid"] and "enabled" not in template
+strategy = GridStrategy(SimFuturesClient(exchange), cfg, "SIM002USDT")
+filters = exchange.symbol_filters("SIM002USDT")
+assert (strategy.ladder.tick_size, strategy.ladder.qty_step) == (filters["tick_size"], filters["qty_step"])
+
+print("OrderLadder checks passed")
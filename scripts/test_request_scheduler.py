@@ -0,0 +1,208 @@
+# scripts/test_request_scheduler.py
+#
+# Checks for client.request_scheduler: TokenBucket refill/limits, the order
+# reserve, RequestScheduler.observe() (used-weight header, 429/418 back-off),
+# priority order in acquire(), and FuturesClient requests going through the
+# scheduler to a local HTTP stand-in (exchange.rest_url). Time passing is
+# simulated by moving the bucket's refill clock.
+#
+#   python scripts/test_request_scheduler.py
+
+import os, sys, time, json, tempfile, threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from binance.exceptions import BinanceAPIException
+from client.request_scheduler import (
+    TokenBucket, RequestScheduler, PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_DATA,
+    request_weight, request_priority
+)
+from client.futures_client import FuturesClient
+
+def elapse(bucket: TokenBucket, seconds: float):
+    """Pretend `seconds` passed since the bucket last refilled."""
+    bucket._updated -= seconds
+
+def close(a: float, b: float, tol: float = 0.05) -> bool:
+    return abs(a - b) <= tol
+
+# 2) TokenBucket: starts full, refills at `rate`, never above capacity
+bucket = TokenBucket(capacity=100, rate=10)
+assert bucket.wait_time(100) == 0.0
+bucket.take(100)
+assert close(bucket.wait_time(50), 5.0)
+elapse(bucket, 2.0)
+assert close(bucket.wait_time(20), 0.0) and close(bucket.wait_time(30), 1.0)
+elapse(bucket, 1000.0)
+assert close(bucket.wait_time(100), 0.0)
+bucket.take(0)
+assert bucket.tokens <= 100.0
+# more than the capacity is served once the bucket is full, not never
+assert close(bucket.wait_time(500), 0.0)
+# limit() only ever lowers the budget
+bucket.limit(30)
+assert close(bucket.tokens, 30.0, 0.01)
+bucket.limit(80)
+assert bucket.tokens < 31.0
+# taking more than is there goes into debt and delays the next request
+bucket.take(50)
+assert close(bucket.wait_time(10), 3.0)
+
+# 3) Order reserve: data requests leave it untouched, orders may use it
+sched = RequestScheduler(weight_per_minute=1200, headroom=0.5, order_reserve=0.1)
+assert sched.bucket.capacity == 600 and sched.reserve == 60
+sched.bucket.tokens = 50.0
+assert sched._delay(1, PRIORITY_ORDER) == 0.0
+assert sched._delay(1, PRIORITY_DATA) > 0.0
+
+# 4) observe(): X-MBX-USED-WEIGHT-1M clamps the budget to what is left
+sched = RequestScheduler(weight_per_minute=1200, headroom=0.5)
+sched.observe(200, {"X-MBX-USED-WEIGHT-1M": "500"})
+assert sched.stats["used_weight"] == 500
+assert sched.bucket.tokens <= 100.0 + 0.1
+sched.observe(200, {"X-MBX-USED-WEIGHT-1M": "100"})   # never raises the budget
+assert sched.bucket.tokens <= 100.0 + 0.1
+sched.observe(200, {})
+assert sched.stats["used_weight"] == 100 and sched.stats["throttled"] == 0
+
+# 5) 429: everything pauses for Retry-After, budget emptied
+sched = RequestScheduler(weight_per_minute=1200, headroom=0.5)
+sched.observe(429, {"Retry-After": "2"})
+assert sched.stats["throttled"] == 1
+assert sched.bucket.tokens <= 0.1
+assert close(sched._delay(1, PRIORITY_ORDER), 2.0, 0.1)     # orders wait too
+# a shorter Retry-After never cuts an existing pause short
+sched.observe(429, {"Retry-After": "1"})
+assert close(sched._delay(1, PRIORITY_ORDER), 2.0, 0.1)
+
+# 6) 418 without Retry-After: 60 s default
+sched = RequestScheduler(weight_per_minute=1200, headroom=0.5)
+sched.observe(418, {})
+assert sched.stats["throttled"] == 1
+assert close(sched._delay(1, PRIORITY_DATA), 60.0, 0.1)
+
+# 7) acquire() really blocks until the back-off and refill allow the request
+sched = RequestScheduler(weight_per_minute=6000, headroom=1.0, order_reserve=0.0)
+sched.observe(429, {"Retry-After": "0.2"})
+started = time.monotonic()
+sched.acquire(1, PRIORITY_ORDER)
+waited = time.monotonic() - started
+assert 0.2 <= waited < 1.0, waited
+assert sched.stats["requests"] == 1 and sched.stats["weight"] == 1
+
+# 8) Request weights and priorities
+assert request_weight("GET", "/fapi/v1/klines", {"limit": 1500}) > request_weight("GET", "/fapi/v1/klines", {"limit": 100})
+assert request_weight("GET", "/fapi/v1/openOrders", {}) == 40
+assert request_weight("GET", "/fapi/v1/openOrders", {"symbol": "BTCUSDT"}) == 1
+assert request_priority("POST", "/fapi/v1/order") == PRIORITY_ORDER
+assert request_priority("GET", "/fapi/v1/klines") == PRIORITY_DATA
+
+# 9) Priority: requests waiting out a pause are admitted orders first, then
+#    account queries, then data; FIFO within a priority
+sched = RequestScheduler(weight_per_minute=60_000, headroom=1.0, order_reserve=0.0)
+sched.observe(429, {"Retry-After": "0.3"})
+admitted = []
+take = sched.bucket.take
+def record_take(amount):
+    admitted.append(threading.current_thread().name)   # called under the scheduler lock
+    take(amount)
+sched.bucket.take = record_take
+arrivals = [("data1", PRIORITY_DATA), ("account1", PRIORITY_ACCOUNT), ("data2", PRIORITY_DATA),
+            ("order1", PRIORITY_ORDER), ("account2", PRIORITY_ACCOUNT), ("order2", PRIORITY_ORDER)]
+threads = []
+for name, priority in arrivals:
+    t = threading.Thread(target=sched.acquire, args=(1, priority), name=name)
+    t.start()
+    threads.append(t)
+    while len(sched._queue) < len(threads):             # queued before the next arrives
+        time.sleep(0.001)
+for t in threads:
+    t.join(5)
+assert admitted == ["order1", "order2", "account1", "account2", "data1", "data2"], admitted
+assert sched.stats["requests"] == 6
+
+# 10) FuturesClient against a local HTTP stand-in (exchange.rest_url): every
+#     request is admitted and weighed by the scheduler, the used-weight header
+#     clamps the budget, and a 429 with Retry-After pauses the next requests
+class StandIn(BaseHTTPRequestHandler):
+    requests = []
+    throttle = 0          # answer the next n requests with 429
+
+    def _reply(self):
+        url = urlparse(self.path)
+        StandIn.requests.append((self.command, url.path, parse_qs(url.query)))
+        if StandIn.throttle:
+            StandIn.throttle -= 1
+            self._send(429, {"code": -1003, "msg": "Too many requests"}, {"Retry-After": "0.5"})
+            return
+        endpoint = url.path.rsplit("/", 1)[-1]
+        if endpoint == "time":
+            body = {"serverTime": int(time.time() * 1000)}
+        elif endpoint == "klines":
+            limit = int(parse_qs(url.query)["limit"][0])
+            body = [[i * 60_000, "1", "2", "0.5", "1.5", "10", i * 60_000 + 59_999] for i in range(limit)]
+        elif endpoint == "openOrders":
+            body = []
+        else:
+            body = {"orderId": 1, "status": "NEW"}
+        self._send(200, body, {"X-MBX-USED-WEIGHT-1M": "300"})
+
+    def _send(self, status, body, headers):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in headers.items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_DELETE = _reply
+
+    def log_message(self, *args):
+        pass
+
+server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+tmp = tempfile.mkdtemp(prefix="trd_sched_")
+secrets = os.path.join(tmp, "secrets.yaml")
+with open(secrets, "w") as f:
+    f.write("binance:\n  testnet_api_key: k\n  testnet_api_secret: s\n")
+cfg = {"exchange": {"testnet": True, "rest_url": f"http://127.0.0.1:{server.server_port}/fapi/",
+                    "rate_limit": {"order_reserve": 0.0}}}   # waits below are Retry-After only
+try:
+    fc = FuturesClient(cfg, secrets_path=secrets)
+    sched = fc.scheduler
+    assert StandIn.requests[-1][1] == "/fapi/v1/time"       # time sync went to the stand-in
+    before = dict(sched.stats)
+    rows = fc.get_klines("BTCUSDT", "1m", limit=1000)
+    assert len(rows) == 1000 and StandIn.requests[-1][1] == "/fapi/v1/klines"
+    assert sched.stats["requests"] == before["requests"] + 1
+    assert sched.stats["weight"] == before["weight"] + request_weight("GET", "/fapi/v1/klines", {"limit": 1000})
+    assert sched.stats["used_weight"] == 300
+    assert sched.bucket.tokens <= sched.bucket.capacity - 300 + 1.0
+    fc.get_open_orders("BTCUSDT")
+    fc.place_order("BTCUSDT", "BUY", "LIMIT", 1.0, price=100.0)
+    assert [r[1] for r in StandIn.requests[-2:]] == ["/fapi/v1/openOrders", "/fapi/v1/order"]
+    assert sched.stats["requests"] == before["requests"] + 3
+
+    StandIn.throttle = 1
+    try:
+        fc.get_open_orders("BTCUSDT")
+        raise AssertionError("a 429 must raise")
+    except BinanceAPIException as e:
+        assert e.status_code == 429
+    assert sched.stats["throttled"] == before["throttled"] + 1
+    started = time.monotonic()
+    assert fc.get_open_orders("BTCUSDT") == []
+    assert time.monotonic() - started >= 0.45                 # held until Retry-After passed
+finally:
+    server.shutdown()
+    server.server_close()
+
+print("RequestScheduler checks passed")
@@ -0,0 +1,145 @@
+# scripts/test_sim_exchange.py
+#
+# Checks for client.sim_exchange.SimExchange matching and accounting: partial
+# fills limited by participation, price-time priority, marketable orders,
+# position averaging and flips, realized PnL and fees.
+#
+#   python scripts/test_sim_exchange.py
+
+import os, sys
+import numpy as np
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from binance.exceptions import BinanceAPIException
+from client.sim_exchange import SimExchange
+
+MAKER, TAKER = 0.0002, 0.0005
+
+def close(a: float, b: float) -> bool:
+    return abs(a - b) <= 1e-9
+
+def make_exchange(participation=0.1) -> SimExchange:
+    """
+    Two flat bars at 100 (history), then up bars 100 → 98 → 102 → 101 with
+    volume 30: with 3 ticks per bar the ticks trade down to 98, up to 102 and
+    back to 101, and each tick offers 30 * participation / 3 to resting orders.
+    """
+    n = 6
+    hour_ns = 3_600_000_000_000
+    src = {
+        "open_time": np.arange(n, dtype=np.int64) * hour_ns + 1_700_000_000_000_000_000,
+        "open": np.array([100.0, 100.0] + [100.0] * (n - 2)),
+        "high": np.array([100.0, 100.0] + [102.0] * (n - 2)),
+        "low": np.array([100.0, 100.0] + [98.0] * (n - 2)),
+        "close": np.array([100.0, 100.0] + [101.0] * (n - 2)),
+        "volume": np.array([30.0] * n),
+    }
+    return SimExchange({"SRC": src}, {"SIMUSDT": ("SRC", 0)}, ticks_per_bar=3, start_bar=2,
+                       participation=participation, maker_fee=MAKER, taker_fee=TAKER,
+                       balance=10_000.0)
+
+def position(ex: SimExchange, side: str = "BOTH"):
+    return ex.positions.get(("SIMUSDT", side), [0.0, 0.0])
+
+# 2) Partial fills: 1 unit of liquidity per tick
+ex = make_exchange()
+assert ex.mark_price("SIMUSDT") == 100.0
+assert ex.symbol_filters("SIMUSDT") == {"tick_size": 0.01, "qty_step": 0.01}
+bid = ex.place_order("SIMUSDT", "BUY", "LIMIT", 3, price=99)
+assert bid["status"] == "NEW" and ex.open_orders("SIMUSDT")
+ex.step()                                    # 100 → 98 crosses 99
+order = ex.orders[bid["orderId"]]
+assert close(order["executedQty"], 1.0) and order["status"] == "PARTIALLY_FILLED"
+assert close(position(ex)[0], 1.0) and close(position(ex)[1], 99.0)
+assert close(ex.balance, 10_000.0 - 99 * MAKER)
+ex.step()                                    # 98 → 102 still spans 99
+assert close(order["executedQty"], 2.0) and order["status"] == "PARTIALLY_FILLED"
+ex.step()                                    # 102 → 101: not crossed
+assert close(order["executedQty"], 2.0)
+ex.step()                                    # next bar opens 100, trades to 98
+assert order["status"] == "FILLED" and not ex.open_orders("SIMUSDT")
+trades = ex.account_trades("SIMUSDT")
+assert len(trades) == 3 and all(t["maker"] for t in trades)
+assert all(t["price"] == "99" and t["qty"] == "1" for t in trades)
+view = ex._order_view(order)
+assert view["executedQty"] == "3" and view["avgPrice"] == "99"
+
+# 3) Price-time priority: best price first, then earliest
+ex = make_exchange()
+a = ex.place_order("SIMUSDT", "BUY", "LIMIT", 0.5, price=99)
+b = ex.place_order("SIMUSDT", "BUY", "LIMIT", 0.5, price=99)
+c = ex.place_order("SIMUSDT", "BUY", "LIMIT", 0.5, price=99.5)
+ex.step()                                    # 1 unit: c, then a
+assert ex.orders[c["orderId"]]["status"] == "FILLED"
+assert ex.orders[a["orderId"]]["status"] == "FILLED"
+assert ex.orders[b["orderId"]]["status"] == "NEW"
+assert close(position(ex)[1], (99.5 * 0.5 + 99 * 0.5) / 1.0)
+
+# 4) Cancel: a partially filled order leaves the book, a second cancel fails
+ex = make_exchange()
+bid = ex.place_order("SIMUSDT", "BUY", "LIMIT", 3, price=99)
+ex.step()
+cancelled = ex.cancel_order("SIMUSDT", bid["orderId"])
+assert cancelled["status"] == "CANCELED" and cancelled["executedQty"] == "1"
+assert not ex.open_orders("SIMUSDT")
+try:
+    ex.cancel_order("SIMUSDT", bid["orderId"])
+    raise AssertionError("cancelling a cancelled order must fail")
+except BinanceAPIException as e:
+    assert e.code == -2011
+ex.step(2)                                   # nothing left to fill
+assert close(position(ex)[0], 1.0)
+
+# 5) Without a participation cap a crossed order fills at once
+ex = make_exchange(participation=None)
+bid = ex.place_order("SIMUSDT", "BUY", "LIMIT", 50, price=99)
+ex.step()
+assert ex.orders[bid["orderId"]]["status"] == "FILLED"
+
+# 6) Marketable orders fill at the current price as taker; closing realizes
+#    PnL, and a larger opposite fill flips the position at the fill price
+ex = make_exchange()
+ex.place_order("SIMUSDT", "BUY", "MARKET", 2)            # long 2 @ 100
+assert close(position(ex)[0], 2.0) and close(position(ex)[1], 100.0)
+ex.step(2)                                                # price 102
+ex.place_order("SIMUSDT", "BUY", "LIMIT", 2, price=105)  # marketable limit: fills at 102
+assert close(position(ex)[0], 4.0) and close(position(ex)[1], 101.0)
+ex.place_order("SIMUSDT", "SELL", "MARKET", 5)            # close 4, open short 1
+amount, entry = position(ex)
+assert close(amount, -1.0) and close(entry, 102.0)
+flip = ex.account_trades("SIMUSDT")[-1]
+assert not flip["maker"] and close(float(flip["realizedPnl"]), 4 * (102 - 101))
+fees = (2 * 100 + 2 * 102 + 5 * 102) * TAKER
+assert close(ex.balance, 10_000.0 + 4.0 - fees)
+pos = ex.account_positions()
+assert len(pos) == 1 and pos[0]["positionAmt"] == "-1" and pos[0]["entryPrice"] == "102"
+
+# 7) Shorts average and close with the sign of the move reversed
+ex = make_exchange()
+short = {"symbol": "SIMUSDT", "side": "SELL", "positionSide": "BOTH", "orderId": 0,
+         "origQty": 2.0, "executedQty": 0.0, "cumQuote": 0.0}
+ex._fill(short, 1.0, 100.0, maker=True)
+ex._fill(short, 1.0, 110.0, maker=True)
+assert short["status"] == "FILLED"
+assert close(position(ex)[0], -2.0) and close(position(ex)[1], 105.0)
+cover = dict(short, side="BUY", origQty=3.0, executedQty=0.0, cumQuote=0.0)
+ex._fill(cover, 3.0, 100.0, maker=False)
+assert close(position(ex)[0], 1.0) and close(position(ex)[1], 100.0)
+assert close(float(ex.account_trades("SIMUSDT")[-1]["realizedPnl"]), 2 * (105 - 100))
+ex._fill(dict(cover, side="SELL", executedQty=0.0), 1.0, 97.0, maker=False)
+assert position(ex) == [0.0, 0.0]            # flat: entry reset
+pnl = sum(float(t["realizedPnl"]) for t in ex.account_trades("SIMUSDT"))
+assert close(pnl, 10.0 - 3.0)
+
+# 8) Hedge mode: LONG and SHORT legs are separate positions
+ex = make_exchange()
+ex.place_order("SIMUSDT", "BUY", "MARKET", 1, position_side="LONG")
+ex.place_order("SIMUSDT", "SELL", "MARKET", 1, position_side="SHORT")
+assert close(position(ex, "LONG")[0], 1.0) and close(position(ex, "SHORT")[0], -1.0)
+assert len(ex.account_positions()) == 2
+
+print("SimExchange checks passed")
@@ -0,0 +1,123 @@
+# scripts/test_state_journal.py
+#
+# Checks for utils.state_journal.JournalStore: replay of snapshot + journals,
+# a torn last line, and compaction (including a crash halfway through it).
+#
+#   python scripts/test_state_journal.py
+
+import os, sys, json, tempfile
+
+# 1) Ensure project root is on sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from utils.state_journal import JournalStore
+
+def read_json(path):
+    with open(path) as f:
+        return json.load(f)
+
+def journal_lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+tmp = tempfile.mkdtemp(prefix="trd_journal_")
+
+# 2) Replay: mutations survive a restart; loading folds them into the snapshot
+path = os.path.join(tmp, "replay.json")
+store = JournalStore(path, fsync=False)
+assert store.load() == {}
+store.set("BTCUSDT", {"order_id": "1", "status": "OPEN"})
+store.set("ETHUSDT", {"order_id": "2", "status": "OPEN"})
+store.set("BTCUSDT", {"order_id": "1", "status": "FILLED"})
+store.delete("ETHUSDT")
+store.close()
+assert len(journal_lines(path + ".journal")) == 4
+
+store = JournalStore(path, fsync=False)
+expected = {"BTCUSDT": {"order_id": "1", "status": "FILLED"}}
+assert store.load() == expected
+assert read_json(path) == expected                      # compacted on load
+assert journal_lines(path + ".journal") == []
+assert not os.path.exists(path + ".journal.1")
+store.close()
+
+# 3) A plain JSON state file from before the journal existed loads as-is
+path = os.path.join(tmp, "legacy.json")
+with open(path, "w") as f:
+    json.dump({"XRPUSDT": {"order_id": "7", "side": "BUY", "status": "OPEN"}}, f)
+store = JournalStore(path, fsync=False)
+assert store.load()["XRPUSDT"]["order_id"] == "7"
+store.close()
+
+# 4) Torn last line (crash mid-append): ignored, and new appends after the
+#    restart are not lost behind it
+path = os.path.join(tmp, "torn.json")
+store = JournalStore(path, fsync=False)
+store.load()
+store.set("a", {"v": 1})
+store.set("b", {"v": 2})
+store.close()
+with open(path + ".journal", "a") as f:
+    f.write('{"op":"set","key":"c","val')
+store = JournalStore(path, fsync=False)
+assert store.load() == {"a": {"v": 1}, "b": {"v": 2}}
+store.set("d", {"v": 4})
+store.close()
+store = JournalStore(path, fsync=False)
+assert store.load() == {"a": {"v": 1}, "b": {"v": 2}, "d": {"v": 4}}
+store.close()
+
+# 5) Background compaction after compact_every lines: the snapshot takes the
+#    state, the journal starts over (lines appended while a compaction is
+#    still running wait for the next one)
+path = os.path.join(tmp, "compact.json")
+store = JournalStore(path, fsync=False, compact_every=5)
+store.load()
+for i in range(5):
+    store.set(f"k{i}", {"i": i})
+store._compactor.join()
+assert read_json(path) == {f"k{i}": {"i": i} for i in range(5)}
+assert journal_lines(path + ".journal") == []
+assert not os.path.exists(path + ".journal.1")
+for i in range(5, 23):
+    store.set(f"k{i % 7}", {"i": i})
+store.delete("k0")
+store.close()                                           # waits for the compactor
+assert len(journal_lines(path + ".journal")) < 19
+expected = {f"k{i % 7}": {"i": i} for i in range(23)}
+del expected["k0"]
+store = JournalStore(path, fsync=False)
+assert store.load() == expected
+store.close()
+
+# 6) Batched mutations land together
+path = os.path.join(tmp, "batch.json")
+store = JournalStore(path, fsync=False)
+store.load()
+with store.batch():
+    store.set("x", {"v": 1})
+    store.set("y", {"v": 2})
+store.close()
+assert len(journal_lines(path + ".journal")) == 2
+
+# 7) Crash during compaction: snapshot not yet rewritten, rotated journal
+#    (.journal.1) still there next to a new .journal; replay covers both
+path = os.path.join(tmp, "crash.json")
+with open(path, "w") as f:
+    json.dump({"old": {"v": 0}, "gone": {"v": 0}}, f)
+with open(path + ".journal.1", "w") as f:
+    f.write(json.dumps({"op": "set", "key": "old", "value": {"v": 1}}) + "\n")
+    f.write(json.dumps({"op": "del", "key": "gone"}) + "\n")
+with open(path + ".journal", "w") as f:
+    f.write(json.dumps({"op": "set", "key": "new", "value": {"v": 2}}) + "\n")
+    f.write(json.dumps({"op": "set", "key": "old", "value": {"v": 3}}) + "\n")
+store = JournalStore(path, fsync=False)
+expected = {"old": {"v": 3}, "new": {"v": 2}}
+assert store.load() == expected
+assert read_json(path) == expected
+assert not os.path.exists(path + ".journal.1")
+store.close()
+
+print("JournalStore checks passed")
@@ -1,5 +1,7 @@
 import os
 import sys
+import copy
+import time
 
 # 1) Ensure src/ is on sys.path so we can import strategies
 SRC_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
@@ -10,79 +12,193 @@ import pandas as pd
 import numpy as np
 from importlib import import_module
 
+from utils.indicator_engine import IndicatorEngine
+from utils.kline_store import read_klines
+from utils.kline_window import KlineWindow, readonly_columns
+
+KLINE_COLUMNS = ["open_time", "open", "high", "low", "close", "volume"]
+
+def kline_path(symbol: str, config: dict, data_dir: str) -> str:
+    """Historical CSV for `symbol`, named {symbol}_{contract_type}_{interval}.csv."""
+    sym_cfg = config["symbols"][symbol]
+    contract_type = sym_cfg.get("contract_type", "PERPETUAL")
+    interval = (
+        sym_cfg.get("mean_reversion", {}).get("interval")
+        or sym_cfg.get("grid", {}).get("interval")
+        or sym_cfg.get("ml", {}).get("interval")
+        or "1h"
+    )
+    filename = f"{symbol}_{contract_type}_{interval}.csv"
+    return os.path.join(data_dir, filename)
+
+def load_klines(filepath: str) -> pd.DataFrame:
+    """
+    Read a historical kline CSV, sorted by open_time with a 0..n-1 index.
+    Served from the binary kline cache (rebuilt when the CSV changes).
+    """
+    if not os.path.isfile(filepath):
+        raise FileNotFoundError(f"Missing historical CSV: {filepath}")
+    return read_klines(filepath)
+
+def apply_overrides(cfg: dict, symbol: str, params: dict) -> dict:
+    """
+    Return a config whose `symbol` block carries `{key}_override` for each
+    param. Only that block is copied, so the base config is left untouched.
+    """
+    test_cfg = dict(cfg)  # shallow copy of top‐level
+    test_cfg["symbols"] = dict(cfg["symbols"])
+    sym_block = copy.deepcopy(cfg["symbols"][symbol])
+    for key, val in params.items():
+        sym_block[f"{key}_override"] = val
+    test_cfg["symbols"][symbol] = sym_block
+    return test_cfg
+
+STRATEGY_OVERRIDES = [
+    "lookback_override", "std_dev_multiplier_override",
+    "rsi_period_override", "rsi_oversold_override",
+    "rsi_overbought_override", "trend_lookback_override"
+]
+
+def strategy_class(strategy_name: str):
+    """Resolve "grid" / "mean_reversion" / "ml" to its strategy class."""
+    if strategy_name == "grid":
+        module_path = "strategies.grid_strategy"
+    elif strategy_name == "mean_reversion":
+        module_path = "strategies.mean_reversion"
+    elif strategy_name == "ml":
+        module_path = "strategies.ml_strategy"
+    else:
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+
+    mod = import_module(module_path)
+    if strategy_name == "ml":
+        class_name = "MLStrategy"
+    else:
+        class_name = "".join(p.capitalize() for p in strategy_name.split("_")) + "Strategy"
+    return getattr(mod, class_name)
+
+def apply_strategy_overrides(strat, sym_cfg: dict):
+    """Copy `{key}_override` entries of a symbol block onto the strategy instance."""
+    for key in STRATEGY_OVERRIDES:
+        if key in sym_cfg:
+            setattr(strat, key.replace("_override", ""), sym_cfg[key])
+
+# One row per round trip; exit fields are only meaningful once `closed` is set
+TRADE_DTYPE = np.dtype([
+    ("timestamp", "datetime64[ns]"),
+    ("price", "f8"),
+    ("qty", "f8"),
+    ("exit_time", "datetime64[ns]"),
+    ("exit_price", "f8"),
+    ("pnl", "f8"),
+    ("closed", "?"),
+])
+
+def _trade_records_to_dicts(records: np.ndarray) -> list:
+    """Convert TRADE_DTYPE rows to the list-of-dicts layout used by Backtester.trades."""
+    trades = []
+    for rec in records:
+        trade = {
+            "timestamp": pd.Timestamp(rec["timestamp"]),
+            "type": "BUY",
+            "price": float(rec["price"]),
+            "qty": float(rec["qty"])
+        }
+        if rec["closed"]:
+            trade.update({
+                "exit_time": pd.Timestamp(rec["exit_time"]),
+                "exit_price": float(rec["exit_price"]),
+                "pnl": float(rec["pnl"])
+            })
+        trades.append(trade)
+    return trades
+
 class Backtester:
     """
     Replays historical OHLC data and simulates strategy logic via run_sim().
     Outputs performance metrics.
     """
 
-    def __init__(self, symbol: str, config: dict, data_dir: str, strategy_name: str):
+    def __init__(self, symbol: str, config: dict, data_dir: str, strategy_name: str,
+                 precompute_indicators: bool = True, engine: str = "array",
+                 window_view: bool = True, df: pd.DataFrame = None,
+                 indicators: IndicatorEngine = None, start: int = 0, end: int = None):
+        """
+        precompute_indicators: expose an IndicatorEngine over the full series to
+        strategies (client.indicators) so run_sim() reads indicator values by
+        index instead of recomputing them on a trailing window every bar.
+        engine: "array" walks NumPy columns by index (default); "pandas" is the
+        original DataFrame.iterrows() loop, kept as a reference.
+        window_view: VirtualClient.get_historical_klines returns a zero-copy
+        KlineWindow over read-only column arrays instead of a new DataFrame.
+        df: already loaded klines (as returned by load_klines); skips reading
+        the CSV from data_dir.
+        indicators: IndicatorEngine built over the same df, to share cached
+        indicators between several Backtesters on one series.
+        start, end: replay only bars [start, end) of df. Strategies still see
+        the full series before `start`, so indicators keep their warmup.
+        """
         self.symbol = symbol
         self.cfg = config
         self.data_dir = data_dir
         self.strategy_name = strategy_name
+        if engine not in ("array", "pandas"):
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = engine
+        self.window_view = window_view
 
-        # Build filename from symbol, contract_type, interval
-        sym_cfg = config["symbols"][symbol]
-        contract_type = sym_cfg.get("contract_type", "PERPETUAL")
-        interval = (
-            sym_cfg.get("mean_reversion", {}).get("interval")
-            or sym_cfg.get("grid", {}).get("interval")
-            or sym_cfg.get("ml", {}).get("interval")
-            or "1h"
-        )
-        filename = f"{symbol}_{contract_type}_{interval}.csv"
-        filepath = os.path.join(data_dir, filename)
-        if not os.path.isfile(filepath):
-            raise FileNotFoundError(f"Missing historical CSV: {filepath}")
-
-        # Load data
-        self.df = pd.read_csv(filepath, parse_dates=["open_time"])
-        self.df.sort_values("open_time", inplace=True)
-        self.df.reset_index(drop=True, inplace=True)
-
-        # Import the correct strategy module
-        if strategy_name == "grid":
-            module_path = "strategies.grid_strategy"
-        elif strategy_name == "mean_reversion":
-            module_path = "strategies.mean_reversion"
-        elif strategy_name == "ml":
-            module_path = "strategies.ml_strategy"
-        else:
-            raise ValueError(f"Unknown strategy: {strategy_name}")
+        # Wall-clock seconds per phase: load (here), setup, loop, metrics (in run)
+        self.timings = {}
+
+        # Load data (or reuse a frame loaded once by the caller)
+        if df is None:
+            t0 = time.perf_counter()
+            df = load_klines(kline_path(symbol, config, data_dir))
+            self.timings["load"] = time.perf_counter() - t0
+        self.df = df
+        self.start = start
+        self.end = len(df) if end is None else end
+        if not 0 <= self.start < self.end <= len(df):
+            raise ValueError(f"Invalid bar range [{start}, {end}) for {len(df)} bars")
 
-        mod = import_module(module_path)
-        if strategy_name == "ml":
-            class_name = "MLStrategy"
+        # Indicators are computed lazily, once per (indicator, params)
+        if indicators is not None:
+            self.indicators = indicators
         else:
-            class_name = "".join(p.capitalize() for p in strategy_name.split("_")) + "Strategy"
+            self.indicators = IndicatorEngine(self.df) if precompute_indicators else None
 
-        self.StrategyClass = getattr(mod, class_name)
+        self.StrategyClass = strategy_class(strategy_name)
 
         # Placeholders
         self.equity_curve = []
         self.trades = []
 
     def run(self) -> dict:
-        client = VirtualClient(self.df)
+        t0 = time.perf_counter()
+        client = VirtualClient(self.df, indicators=self.indicators, window_view=self.window_view)
         strat = self.StrategyClass(client, self.cfg, self.symbol, pm=None)
 
-        # Apply overrides
-        sym_cfg = self.cfg["symbols"][self.symbol]
-        for key in [
-            "lookback_override", "std_dev_multiplier_override",
-            "rsi_period_override", "rsi_oversold_override",
-            "rsi_overbought_override", "trend_lookback_override"
-        ]:
-            if key in sym_cfg:
-                setattr(strat, key.replace("_override", ""), sym_cfg[key])
+        apply_strategy_overrides(strat, self.cfg["symbols"][self.symbol])
 
         initial_equity = self.cfg.get("capital_usdt", 100000)
+        t1 = time.perf_counter()
+        if self.engine == "array":
+            self._run_arrays(client, strat, initial_equity)
+        else:
+            self._run_pandas(client, strat, initial_equity)
+        t2 = time.perf_counter()
+        metrics = self._compute_metrics(initial_equity)
+        t3 = time.perf_counter()
+        self.timings.update(setup=t1 - t0, loop=t2 - t1, metrics=t3 - t2)
+        return metrics
+
+    def _run_pandas(self, client, strat, initial_equity: float):
+        """Reference event loop over DataFrame.iterrows()."""
         cash = float(initial_equity)
         position = 0.0
         entry_price = 0.0
 
-        for idx, row in self.df.iterrows():
+        for idx, row in self.df.iloc[self.start:self.end].iterrows():
             client.current_index = idx
             client.current_price = float(row["close"])
             signal = strat.run_sim()
@@ -115,7 +231,62 @@ class Backtester:
             mtm = position * client.current_price
             self.equity_curve.append(cash + mtm)
 
-        # Metrics
+    def _run_arrays(self, client, strat, initial_equity: float):
+        """
+        Same event loop as _run_pandas(), but walks contiguous NumPy columns by
+        index, writes equity into a preallocated float64 array and records
+        trades in a structured array. Results are converted back to the
+        equity_curve / trades lists at the end.
+        """
+        n = self.end - self.start
+        open_time = self.df["open_time"].to_numpy(dtype="datetime64[ns]")
+        close = np.ascontiguousarray(self.df["close"].to_numpy(dtype=np.float64))
+
+        equity = np.empty(n, dtype=np.float64)
+        trades = np.zeros(max(16, n // 8), dtype=TRADE_DTYPE)
+        n_trades = 0
+
+        cash = float(initial_equity)
+        position = 0.0
+        entry_price = 0.0
+
+        for idx in range(self.start, self.end):
+            price_now = float(close[idx])
+            client.current_index = idx
+            client.current_price = price_now
+            signal = strat.run_sim()
+            if signal:
+                act = signal["action"]
+                price = signal["price"]
+                qty = signal["qty"]
+                if act == "BUY" and position == 0.0:
+                    position = qty
+                    entry_price = price
+                    cash -= qty * price
+                    if n_trades == len(trades):
+                        trades = np.concatenate([trades, np.zeros(len(trades), dtype=TRADE_DTYPE)])
+                    trades[n_trades] = (open_time[idx], entry_price, position, np.datetime64("NaT"), np.nan, np.nan, False)
+                    n_trades += 1
+                elif act == "SELL" and position > 0.0:
+                    proceeds = position * price
+                    cash += proceeds
+                    pnl = (price - entry_price) * position
+                    rec = trades[n_trades - 1]
+                    rec["exit_time"] = open_time[idx]
+                    rec["exit_price"] = price
+                    rec["pnl"] = pnl
+                    rec["closed"] = True
+                    position = 0.0
+                    entry_price = 0.0
+
+            equity[idx - self.start] = cash + position * price_now
+
+        self.equity = equity
+        self.trade_records = trades[:n_trades]
+        self.equity_curve = equity.tolist()
+        self.trades = _trade_records_to_dicts(self.trade_records)
+
+    def _compute_metrics(self, initial_equity: float) -> dict:
         eq = np.array(self.equity_curve)
         returns = pd.Series(eq).pct_change().dropna()
         total_return = (eq[-1] / initial_equity) - 1
@@ -142,11 +313,16 @@ class VirtualClient:
     """
     Provides the same interface that your strategies expect, using historical data.
     """
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, indicators: IndicatorEngine = None, window_view: bool = False):
         self.df = df
+        self.indicators = indicators
         self.current_index = -1
         self.current_price = None
 
+        # Columns converted once; windows are slices over these arrays
+        self.window_view = window_view
+        self._columns = readonly_columns(df, KLINE_COLUMNS) if window_view else None
+
     def get_mark_price(self, symbol: str):
         return {"markPrice": str(self.current_price)}
 
@@ -154,12 +330,18 @@ class VirtualClient:
                     quantity: float, price: float, leverage: int, position_side: str):
         return {"orderId": -1, "status": "FILLED"}
 
-    def get_historical_klines(self, symbol: str, interval: str, lookback: int) -> pd.DataFrame:
+    def get_historical_klines(self, symbol: str, interval: str, lookback: int):
+        """
+        Bars [current_index - lookback, current_index] as a DataFrame, or as a
+        read-only KlineWindow when window_view is enabled.
+        """
         start = max(0, self.current_index - lookback)
+        if self.window_view:
+            return KlineWindow(self._columns, start, self.current_index + 1)
         subset = self.df.iloc[start:self.current_index+1].copy()
         return subset[["open_time","open","high","low","close","volume"]].reset_index(drop=True)
 
-    def get_open_orders(self, symbol: str):
+    def get_open_orders(self, symbol: str = None):
         return []
 
     def get_account_positions(self):
@@ -1,12 +1,36 @@
+import csv
+import argparse
 import yaml
 import itertools
+import numpy as np
 import pandas as pd
-from backtesting.backtester import Backtester
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from backtesting.backtester import Backtester, apply_overrides, kline_path, load_klines
+from backtesting.sweep import sweep_mean_reversion
+from utils.indicator_engine import IndicatorEngine
+
+METRIC_KEYS = ["total_return", "sharpe", "max_drawdown", "win_rate", "n_trades"]
+SHARED_COLUMNS = ["open_time", "open", "high", "low", "close", "volume"]
 
 def load_config(path: str) -> dict:
     with open(path, "r") as f:
         return yaml.safe_load(f)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Hyperparameter scan for mean-reversion symbols.")
+    parser.add_argument("--config",   type=str, default="config/config.yaml",
+                        help="Bot configuration file")
+    parser.add_argument("--data_dir", type=str, default="data/klines",
+                        help="Folder with OHLC CSVs")
+    parser.add_argument("--out_dir",  type=str, default="backtesting",
+                        help="Where results_{symbol}.csv are written")
+    parser.add_argument("--workers",  type=int, default=1,
+                        help="Processes to spread parameter sets over (1 = run in-process)")
+    parser.add_argument("--vectorized", action="store_true",
+                        help="Evaluate parameter sets in batches with the vectorized sweep engine")
+    return parser.parse_args()
+
 def generate_param_grid():
     """
     Generate all combinations of:
@@ -39,9 +63,137 @@ def generate_param_grid():
         })
     return grid
 
+def run_params(symbol: str, cfg: dict, df: pd.DataFrame, indicators: IndicatorEngine,
+               params: dict, strategy_name: str = "mean_reversion",
+               start: int = 0, end: int = None) -> dict:
+    """
+    Backtest one parameter set on an already loaded series (optionally only
+    bars [start, end)); returns params + metrics.
+    """
+    bt = Backtester(
+        symbol=symbol,
+        config=apply_overrides(cfg, symbol, params),
+        data_dir=None,
+        strategy_name=strategy_name,
+        df=df,
+        indicators=indicators,
+        start=start,
+        end=end
+    )
+    metrics = bt.run()
+    return dict(symbol=symbol, **params, **metrics)
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Shared-memory OHLC for worker processes
+# The parent packs open_time (int64 ns) and OHLCV (float64) into one
+# shared block; workers attach read-only and rebuild the frame without
+# touching the CSV.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def share_klines(df: pd.DataFrame):
+    """Copy df's kline columns into a new SharedMemory block. Returns (shm, n_rows)."""
+    n = len(df)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, n * len(SHARED_COLUMNS) * 8))
+    block = np.ndarray((len(SHARED_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    for i, col in enumerate(SHARED_COLUMNS):
+        if col == "open_time":
+            block[i].view(np.int64)[:] = df[col].to_numpy(dtype="datetime64[ns]").view(np.int64)
+        else:
+            block[i][:] = df[col].to_numpy(dtype=np.float64)
+    return shm, n
+
+def attach_klines(shm_name: str, n: int):
+    """Attach to a block created by share_klines(). Returns (shm, df) — keep shm alive while df is used."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray((len(SHARED_COLUMNS), n), dtype=np.float64, buffer=shm.buf)
+    block.setflags(write=False)
+    cols = {}
+    for i, col in enumerate(SHARED_COLUMNS):
+        if col == "open_time":
+            cols[col] = block[i].view(np.int64).view("datetime64[ns]")
+        else:
+            cols[col] = block[i]
+    return shm, pd.DataFrame(cols, copy=False)
+
+# Per-process state set up once by _init_worker
+_WORKER = {}
+
+def _init_worker(shm_name: str, n: int, symbol: str, cfg: dict):
+    shm, df = attach_klines(shm_name, n)
+    _WORKER.update(shm=shm, df=df, indicators=IndicatorEngine(df), symbol=symbol, cfg=cfg)
+
+def _worker_run(params: dict) -> dict:
+    w = _WORKER
+    return run_params(w["symbol"], w["cfg"], w["df"], w["indicators"], params)
+
+def _worker_sweep(chunk: list) -> list:
+    w = _WORKER
+    return sweep_mean_reversion(w["symbol"], w["cfg"], w["df"], chunk, indicators=w["indicators"])
+
+def scan_symbol(symbol: str, cfg: dict, data_dir: str, param_grid: list,
+                out_path: str, workers: int = 1, vectorized: bool = False,
+                chunk_size: int = 64) -> list:
+    """
+    Backtest every parameter set in param_grid for `symbol`. The series is
+    loaded once; with workers > 1 it is shared with a process pool through
+    shared memory. Rows are appended to out_path as they complete.
+    With vectorized=True, batches of chunk_size parameter sets are evaluated
+    at once by sweep_mean_reversion() instead of one Backtester each.
+    """
+    df = load_klines(kline_path(symbol, cfg, data_dir))
+    fieldnames = ["symbol"] + list(param_grid[0].keys()) + METRIC_KEYS
+    results = []
+
+    with open(out_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+
+        def record(row):
+            writer.writerow(row)
+            f.flush()
+            results.append(row)
+            print(f"  [{len(results)}/{len(param_grid)}] sharpe={row['sharpe']:.3f}")
+
+        chunks = [param_grid[i:i + chunk_size] for i in range(0, len(param_grid), chunk_size)]
+
+        if workers <= 1:
+            indicators = IndicatorEngine(df)
+            if vectorized:
+                for chunk in chunks:
+                    for row in sweep_mean_reversion(symbol, cfg, df, chunk, indicators=indicators):
+                        record(row)
+            else:
+                for params in param_grid:
+                    record(run_params(symbol, cfg, df, indicators, params))
+            return results
+
+        shm, n = share_klines(df)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, n, symbol, cfg)
+            ) as pool:
+                if vectorized:
+                    futures = [pool.submit(_worker_sweep, chunk) for chunk in chunks]
+                    for fut in as_completed(futures):
+                        for row in fut.result():
+                            record(row)
+                else:
+                    futures = [pool.submit(_worker_run, params) for params in param_grid]
+                    for fut in as_completed(futures):
+                        record(fut.result())
+        finally:
+            shm.close()
+            shm.unlink()
+
+    return results
+
 def main():
+    args = parse_args()
+
     # 1) Load base config
-    cfg = load_config("config/config.yaml")
+    cfg = load_config(args.config)
 
     # 2) Identify which symbols use mean_reversion
     symbols = []
@@ -49,53 +201,22 @@ def main():
         if sym_cfg.get("enabled", False) and sym_cfg.get("strategy", "") == "mean_reversion":
             symbols.append(sym)
 
-    # 3) Path to historical OHLC
-    hist_data_dir = "data/klines"  # e.g. contains ETHUSDT_1h.csv, BTCUSDT_1h.csv, etc.
-
     param_grid = generate_param_grid()
     all_results = []
 
     for symbol in symbols:
-        print(f"\n=== Scanning hyperparameters for {symbol} ===")
-        results = []
-
-        for params in param_grid:
-            # Build a modified config for this test
-            test_cfg = dict(cfg)  # shallow copy of top‐level
-            sym_block = test_cfg["symbols"][symbol]
-
-            # Inject override keys
-            sym_block["lookback_override"] = params["lookback"]
-            sym_block["std_dev_multiplier_override"] = params["std_dev_multiplier"]
-            sym_block["rsi_period_override"] = params["rsi_period"]
-            sym_block["rsi_oversold_override"] = params["rsi_oversold"]
-            sym_block["rsi_overbought_override"] = params["rsi_overbought"]
-            sym_block["trend_lookback_override"] = params["trend_lookback"]
-
-            # Run backtester
-            bt = Backtester(
-                symbol=symbol,
-                config=test_cfg,
-                data_dir=hist_data_dir,
-                strategy_name="mean_reversion"
-            )
-            metrics = bt.run()
-            # Record both the params and the resulting performance
-            row = dict(symbol=symbol, **params, **metrics)
-            results.append(row)
-
-        # Save per‐symbol results to CSV
-        df_res = pd.DataFrame(results)
-        out_path = f"backtesting/results_{symbol}.csv"
-        df_res.to_csv(out_path, index=False)
+        print(f"\n=== Scanning hyperparameters for {symbol} ({args.workers} worker(s)) ===")
+        out_path = f"{args.out_dir}/results_{symbol}.csv"
+        results = scan_symbol(symbol, cfg, args.data_dir, param_grid, out_path,
+                              workers=args.workers, vectorized=args.vectorized)
         print(f"Saved results to {out_path}")
 
         all_results.extend(results)
 
     # Optionally save everything combined
     df_all = pd.DataFrame(all_results)
-    df_all.to_csv("backtesting/all_results.csv", index=False)
-    print("Hyperparameter scan complete. Combined results in backtesting/all_results.csv")
+    df_all.to_csv(f"{args.out_dir}/all_results.csv", index=False)
+    print(f"Hyperparameter scan complete. Combined results in {args.out_dir}/all_results.csv")
 
 
 if __name__ == "__main__":
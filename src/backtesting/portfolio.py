@@ -0,0 +1,220 @@
+# TRD_BOT_V3/src/backtesting/portfolio.py
+
+import copy
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from backtesting.backtester import (
+    TRADE_DTYPE, VirtualClient, apply_strategy_overrides, kline_path, load_klines,
+    strategy_class, _trade_records_to_dicts
+)
+from backtesting.sweep import metrics_matrix
+from utils.indicator_engine import IndicatorEngine
+from utils.risk_management import RiskManager
+
+SUPPORTED_STRATEGIES = ["grid", "mean_reversion", "ml"]
+
+def align_timelines(open_times: List[np.ndarray]):
+    """
+    Union of several sorted datetime64[ns] open_time arrays.
+    Returns (times, local) where local[s, t] is symbol s's bar index at
+    times[t], or -1 if that symbol has no bar there.
+    """
+    as_int = [np.asarray(t, dtype="datetime64[ns]").view(np.int64) for t in open_times]
+    times = np.unique(np.concatenate(as_int)) if as_int else np.empty(0, dtype=np.int64)
+    local = np.full((len(as_int), len(times)), -1, dtype=np.int64)
+    for s, sym_times in enumerate(as_int):
+        pos = np.searchsorted(sym_times, times)
+        hit = pos < len(sym_times)
+        hit[hit] = sym_times[pos[hit]] == times[hit]
+        local[s, hit] = pos[hit]
+    return times.view("datetime64[ns]"), local
+
+class PortfolioBacktester:
+    """
+    Backtests all enabled symbols together on one shared timeline.
+
+    - Allocations go through RiskManager exactly as in main.py (correlation
+      cuts, then the net allocation cap) before strategies are built.
+    - Every strategy is stepped bar by bar in a single pass over the union of
+      all timestamps; a symbol without a bar at a timestamp is skipped and
+      valued at its last close.
+    - One cash balance is shared by all symbols. An entry is rejected when
+      the open notional of all positions plus the new order would exceed
+      max_leverage × current portfolio equity.
+    Cash and position changes are recorded as per-bar deltas in arrays, so the
+    equity curve is built with one vectorized pass at the end.
+    """
+
+    def __init__(self, config: dict, data_dir: str, symbols: List[str] = None,
+                 corr_threshold: float = 0.8, reduction_pct: float = 0.5,
+                 max_net_pct: float = 50, max_leverage: float = None,
+                 apply_risk: bool = True):
+        """
+        symbols: restrict to these symbols (default: every enabled symbol with a
+        supported strategy). Symbols without a historical CSV are skipped.
+        corr_threshold, reduction_pct, max_net_pct: passed to RiskManager as main.py does.
+        max_leverage: account-level exposure limit (default: defaults.leverage).
+        apply_risk: False keeps the configured allocation_pct untouched.
+        """
+        self.cfg = copy.deepcopy(config)
+        self.data_dir = data_dir
+        self.max_leverage = float(
+            max_leverage if max_leverage is not None else self.cfg["defaults"]["leverage"]
+        )
+
+        # 1) Symbols with data
+        if symbols is None:
+            symbols = [
+                s for s, v in self.cfg["symbols"].items()
+                if v.get("enabled", False) and v.get("strategy", "").lower() in SUPPORTED_STRATEGIES
+            ]
+        self.symbols = []
+        self.frames: Dict[str, pd.DataFrame] = {}
+        for symbol in symbols:
+            try:
+                self.frames[symbol] = load_klines(kline_path(symbol, self.cfg, data_dir))
+            except FileNotFoundError as e:
+                print(f"⚠️  Skipping {symbol}: {e}")
+                continue
+            self.symbols.append(symbol)
+        if not self.symbols:
+            raise ValueError("No symbols with historical data to backtest")
+
+        # 2) Portfolio-level allocations, as applied before live trading
+        base_allocs = {s: self.cfg["symbols"][s].get("allocation_pct", 0) for s in self.symbols}
+        if apply_risk and len(self.symbols) > 1:
+            rm = RiskManager(self.cfg, data_dir)
+            adjusted = rm.adjust_allocations(self.symbols, base_allocs, corr_threshold, reduction_pct)
+            self.allocations = rm.enforce_notional_cap(adjusted, max_net_pct=max_net_pct)
+        elif apply_risk:
+            self.allocations = RiskManager(self.cfg, data_dir).enforce_notional_cap(base_allocs, max_net_pct)
+        else:
+            self.allocations = base_allocs
+        for s in self.symbols:
+            self.cfg["symbols"][s]["allocation_pct"] = self.allocations.get(s, 0)
+
+        # 3) Shared time axis and a (symbols × timestamps) matrix of last closes
+        self.times, self.local = align_timelines(
+            [self.frames[s]["open_time"].to_numpy(dtype="datetime64[ns]") for s in self.symbols]
+        )
+        self.closes = [
+            np.ascontiguousarray(self.frames[s]["close"].to_numpy(dtype=np.float64))
+            for s in self.symbols
+        ]
+        last_bar = np.maximum.accumulate(self.local, axis=1)
+        self.mark = np.zeros(self.local.shape, dtype=np.float64)
+        for s, close in enumerate(self.closes):
+            seen = last_bar[s] >= 0
+            self.mark[s, seen] = close[last_bar[s, seen]]
+
+        # Placeholders
+        self.equity = None
+        self.trades: Dict[str, list] = {}
+        self.symbol_metrics: Dict[str, dict] = {}
+
+    def _build_strategies(self):
+        clients, strats = [], []
+        for symbol in self.symbols:
+            df = self.frames[symbol]
+            client = VirtualClient(df, indicators=IndicatorEngine(df), window_view=True)
+            sym_cfg = self.cfg["symbols"][symbol]
+            strat = strategy_class(sym_cfg["strategy"].lower())(client, self.cfg, symbol, pm=None)
+            apply_strategy_overrides(strat, sym_cfg)
+            clients.append(client)
+            strats.append(strat)
+        return clients, strats
+
+    def run(self) -> dict:
+        """Run the portfolio; returns metrics of the combined equity curve."""
+        S, T = self.local.shape
+        clients, strats = self._build_strategies()
+        initial_equity = float(self.cfg.get("capital_usdt", 100000))
+
+        cash_delta = np.zeros(T)
+        cash_delta[0] = initial_equity
+        pos_delta = np.zeros((S, T))
+        position = np.zeros(S)
+        entry_price = np.zeros(S)
+        cash = initial_equity
+        records = [[] for _ in range(S)]
+        rejected = np.zeros(S, dtype=np.int64)
+
+        # Plain lists in the hot loop: indexing NumPy scalars per bar costs
+        # more than the bookkeeping itself
+        mark = self.mark
+        bar_rows = self.local.T.tolist()
+        closes = [c.tolist() for c in self.closes]
+        for t, row in enumerate(bar_rows):
+            for s, i in enumerate(row):
+                if i < 0:
+                    continue
+                client = clients[s]
+                client.current_index = i
+                client.current_price = closes[s][i]
+                signal = strats[s].run_sim()
+                if not signal:
+                    continue
+                act, price, qty = signal["action"], signal["price"], signal["qty"]
+
+                if act == "BUY" and position[s] == 0.0:
+                    cost = qty * price
+                    open_notional = float(np.abs(position) @ mark[:, t])
+                    equity_now = cash + float(position @ mark[:, t])
+                    if open_notional + cost > self.max_leverage * equity_now:
+                        # Keep the strategy's view consistent with the rejected order
+                        rejected[s] += 1
+                        if hasattr(strats[s], "in_position"):
+                            strats[s].in_position = False
+                        continue
+                    position[s] = qty
+                    entry_price[s] = price
+                    cash -= cost
+                    cash_delta[t] -= cost
+                    pos_delta[s, t] += qty
+                    records[s].append((self.times[t], price, qty, np.datetime64("NaT"), np.nan, np.nan, False))
+
+                elif act == "SELL" and position[s] > 0.0:
+                    proceeds = position[s] * price
+                    pnl = (price - entry_price[s]) * position[s]
+                    cash += proceeds
+                    cash_delta[t] += proceeds
+                    pos_delta[s, t] -= position[s]
+                    records[s][-1] = records[s][-1][:3] + (self.times[t], price, pnl, True)
+                    position[s] = 0.0
+                    entry_price[s] = 0.0
+
+        # Equity = shared cash + every position marked at its last close
+        cash_path = np.cumsum(cash_delta)
+        pos_path = np.cumsum(pos_delta, axis=1)
+        self.equity = cash_path + (pos_path * mark).sum(axis=0)
+        self.cash = cash_path
+        self.positions = pos_path
+
+        wins_total = n_total = 0
+        for s, symbol in enumerate(self.symbols):
+            recs = np.array(records[s], dtype=TRADE_DTYPE)
+            self.trades[symbol] = _trade_records_to_dicts(recs)
+            n_trades = len(recs)
+            wins = int((recs["pnl"][recs["closed"]] > 0).sum())
+            wins_total += wins
+            n_total += n_trades
+            self.symbol_metrics[symbol] = {
+                "strategy": self.cfg["symbols"][symbol]["strategy"],
+                "allocation_pct": float(self.allocations.get(symbol, 0)),
+                "n_trades": n_trades,
+                "win_rate": wins / max(1, n_trades),
+                "realized_pnl": float(recs["pnl"][recs["closed"]].sum()),
+                "rejected_entries": int(rejected[s]),
+            }
+
+        return metrics_matrix(self.equity[None, :], initial_equity,
+                              np.array([wins_total]), np.array([n_total]))[0]
+
+    def equity_frame(self) -> pd.DataFrame:
+        """Timestamp, equity, cash and per-symbol position size for each bar."""
+        data = {"timestamp": self.times, "equity": self.equity, "cash": self.cash}
+        for s, symbol in enumerate(self.symbols):
+            data[f"position_{symbol}"] = self.positions[s]
+        return pd.DataFrame(data)
@@ -0,0 +1,155 @@
+# TRD_BOT_V3/src/backtesting/sweep.py
+
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+from backtesting.backtester import apply_overrides
+from strategies.mean_reversion import MeanReversionStrategy
+from utils.indicator_engine import IndicatorEngine
+
+def _shift1(arr: np.ndarray) -> np.ndarray:
+    """Value of the previous bar at each index (NaN at 0)."""
+    out = np.empty_like(arr)
+    out[0] = np.nan
+    out[1:] = arr[:-1]
+    return out
+
+def metrics_matrix(eq: np.ndarray, initial_equity: float, wins: np.ndarray, n_trades: np.ndarray) -> List[dict]:
+    """
+    Backtester._compute_metrics() for every row of an equity matrix at once
+    (same formulas as pandas pct_change/mean/std with ddof=1).
+    """
+    returns = eq[:, 1:] / eq[:, :-1] - 1
+    m = returns.shape[1]
+    mean = returns.sum(axis=1) / m if m else np.full(len(eq), np.nan)
+    if m > 1:
+        std = np.sqrt(((mean[:, None] - returns) ** 2).sum(axis=1) / (m - 1))
+    else:
+        std = np.full(len(eq), np.nan)
+    total_return = eq[:, -1] / initial_equity - 1
+    peak = np.maximum.accumulate(eq, axis=1)
+    max_dd = ((eq - peak) / peak).min(axis=1)
+
+    out = []
+    for i in range(len(eq)):
+        sharpe = mean[i] / std[i] * np.sqrt(365 * 24) if std[i] else 0.0
+        out.append({
+            "total_return": float(total_return[i]),
+            "sharpe": float(sharpe),
+            "max_drawdown": float(max_dd[i]),
+            "win_rate": float(wins[i] / max(1, n_trades[i])),
+            "n_trades": int(n_trades[i])
+        })
+    return out
+
+def _sweep_chunk(strats: List[MeanReversionStrategy], eng: IndicatorEngine,
+                 initial_equity: float, start: int, end: int) -> List[dict]:
+    P, n = len(strats), end - start
+    idx = np.arange(start, end)
+    close = eng.column("close")[start:end]
+
+    # Per-parameter-set rows (params × bars in range); identical lookbacks
+    # share the engine's cached full-series arrays, so only thresholds cost
+    # extra work and bars before `start` still provide warmup.
+    def rows(fn):
+        return np.stack([fn(s)[start:end] for s in strats])
+
+    atr_lt = rows(lambda s: eng.atr(s.lt_vol_lookback))
+    atr_st = rows(lambda s: eng.atr(s.lookback))
+    ma = rows(lambda s: _shift1(eng.sma(s.lookback)))
+    std = rows(lambda s: _shift1(eng.rolling_std(s.lookback)))
+    sma = rows(lambda s: eng.sma(s.trend_lookback))
+    rsi = rows(lambda s: eng.rsi(s.rsi_period))
+    needed = np.array([s._bars_needed() for s in strats])[:, None]
+    notional = np.array([s._compute_order_size(1.0) for s in strats])
+    oversold = np.array([s.rsi_oversold for s in strats], dtype=np.float64)[:, None]
+    overbought = np.array([s.rsi_overbought for s in strats], dtype=np.float64)[:, None]
+    bank = np.array([s.sigma_bank[:4] for s in strats], dtype=np.float64)
+
+    # Band width multiplier from the short/long volatility ratio
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_lt_pct = atr_lt / close
+        vol_st_pct = atr_st / close
+        ratio = np.where(vol_lt_pct > 0, vol_st_pct / vol_lt_pct, 1.0)
+    std_mul = np.select(
+        [ratio < 0.8, ratio < 1.2, ratio < 1.6],
+        [bank[:, [0]], bank[:, [1]], bank[:, [2]]],
+        default=bank[:, [3]]
+    )
+    upper = ma + std_mul * std
+    lower = ma - std_mul * std
+
+    valid = (idx[None, :] + 1 >= needed) & (notional[:, None] > 0)
+    buy = valid & (close < lower) & (close > sma) & (rsi < oversold)
+    sell = valid & (close > upper) & (rsi > overbought)
+    del atr_lt, atr_st, ma, std, sma, rsi, ratio, std_mul, upper, lower
+
+    # Position state machine for all parameter sets, visiting only bars
+    # where at least one set has a condition.
+    cash_delta = np.zeros((P, n))
+    pos_delta = np.zeros((P, n))
+    cash_delta[:, 0] = initial_equity
+    in_pos = np.zeros(P, dtype=bool)
+    position = np.zeros(P)
+    entry_price = np.zeros(P)
+    n_trades = np.zeros(P, dtype=np.int64)
+    wins = np.zeros(P, dtype=np.int64)
+
+    for t in np.nonzero((buy | sell).any(axis=0))[0]:
+        price = close[t]
+        b = buy[:, t] & ~in_pos
+        s = sell[:, t] & in_pos
+        if b.any():
+            qty = notional[b] / price
+            position[b] = qty
+            entry_price[b] = price
+            cash_delta[b, t] += -(qty * price)
+            pos_delta[b, t] += qty
+            n_trades += b
+        if s.any():
+            pnl = (price - entry_price[s]) * position[s]
+            cash_delta[s, t] += position[s] * price
+            pos_delta[s, t] += -position[s]
+            wins[s] += pnl > 0
+            position[s] = 0.0
+            entry_price[s] = 0.0
+        in_pos = (in_pos | b) & ~s
+
+    # Same left-to-right accumulation as the event loop
+    cash = np.cumsum(cash_delta, axis=1)
+    pos = np.cumsum(pos_delta, axis=1)
+    equity = cash + pos * close
+    return metrics_matrix(equity, initial_equity, wins, n_trades)
+
+def sweep_mean_reversion(symbol: str, cfg: dict, df: pd.DataFrame, param_grid: List[Dict],
+                         indicators: IndicatorEngine = None, chunk_size: int = 64,
+                         start: int = 0, end: int = None) -> List[dict]:
+    """
+    Evaluate many mean-reversion parameter sets in one pass over the series.
+
+    Band, RSI and trend conditions are built as (params × bars) arrays and the
+    position state machine advances all parameter sets together. Returns one
+    row per parameter set — {"symbol", **params, **metrics} — with the same
+    metrics Backtester.run() reports, so it is a drop-in for run_params().
+
+    Parameters are resolved exactly like the Backtester does (via
+    `{key}_override`), so std_dev_multiplier is accepted but, as in
+    MeanReversionStrategy, bands are sized from sigma_bank.
+    chunk_size bounds memory: each chunk holds a few (chunk × bars) arrays.
+    start, end: evaluate only bars [start, end), like Backtester(start, end).
+    """
+    eng = indicators if indicators is not None else IndicatorEngine(df)
+    end = len(eng) if end is None else end
+    initial_equity = float(cfg.get("capital_usdt", 100000))
+
+    results = []
+    for i in range(0, len(param_grid), chunk_size):
+        chunk = param_grid[i:i + chunk_size]
+        strats = [
+            MeanReversionStrategy(None, apply_overrides(cfg, symbol, params), symbol)
+            for params in chunk
+        ]
+        metrics = _sweep_chunk(strats, eng, initial_equity, start, end)
+        results.extend(dict(symbol=symbol, **params, **m) for params, m in zip(chunk, metrics))
+    return results
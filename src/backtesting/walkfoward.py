@@ -2,10 +2,14 @@
 
 import os
 import yaml
+import numpy as np
 import pandas as pd
-from datetime import timedelta
-from backtesting.backtester import Backtester
-from backtesting.hyperscan import generate_param_grid
+from concurrent.futures import ProcessPoolExecutor
+from pandas.tseries.offsets import DateOffset
+from backtesting.hyperscan import generate_param_grid, run_params, share_klines, _WORKER, _init_worker
+from backtesting.sweep import sweep_mean_reversion
+from utils.indicator_engine import IndicatorEngine
+from utils.kline_store import find_kline_csv, read_klines
 
 def load_config(path: str = "config/config.yaml") -> dict:
     with open(path, "r") as f:
@@ -15,144 +19,166 @@ def ensure_dir(path: str):
     os.makedirs(path, exist_ok=True)
 
 
+def build_windows(open_time: pd.Series, train_months: int = 1, test_months: int = 1,
+                  min_bars: int = 100) -> list:
+    """
+    Split a sorted open_time series into consecutive train/test windows,
+    advancing by test_months. Each window carries its dates plus the bar
+    index ranges [train_lo, train_hi) and [test_lo, test_hi) into the series.
+    Windows with fewer than `min_bars` train or test bars are skipped.
+    """
+    times = open_time.to_numpy(dtype="datetime64[ns]")
+    start_time = open_time.min()
+    end_time = open_time.max()
+
+    windows = []
+    cur_train_start = start_time
+    while True:
+        train_end = cur_train_start + DateOffset(months=train_months)
+        test_start = train_end
+        test_end = train_end + DateOffset(months=test_months)
+
+        # Stop if test_end exceeds available data
+        if test_end > end_time:
+            break
+
+        lo, mid, hi = np.searchsorted(
+            times, np.array([cur_train_start, test_start, test_end], dtype="datetime64[ns]")
+        )
+        if mid - lo >= min_bars and hi - mid >= min_bars:
+            windows.append({
+                "train_start": cur_train_start,
+                "train_end": train_end,
+                "test_start": test_start,
+                "test_end": test_end,
+                "train_lo": int(lo), "train_hi": int(mid),
+                "test_lo": int(mid), "test_hi": int(hi),
+            })
+
+        # Advance window
+        cur_train_start = test_start
+    return windows
+
+def evaluate_window(symbol: str, cfg: dict, df: pd.DataFrame, indicators: IndicatorEngine,
+                    window: dict, vectorized: bool = False) -> dict:
+    """
+    1) On train bars: scan all hyperparameter combinations → pick best Sharpe
+    2) On test bars: backtest that best parameter set → record metrics
+    Both run as index ranges over the full series and share its indicators.
+    """
+    strategy = cfg["symbols"][symbol]["strategy"]
+    param_grid = generate_param_grid()
+    best_sharpe = -float("inf")
+    best_params = None
+
+    if vectorized and strategy == "mean_reversion":
+        # Score the whole grid in one vectorized pass over the train bars
+        rows = sweep_mean_reversion(symbol, cfg, df, param_grid, indicators=indicators,
+                                    start=window["train_lo"], end=window["train_hi"])
+    else:
+        rows = (
+            run_params(symbol, cfg, df, indicators, params, strategy_name=strategy,
+                       start=window["train_lo"], end=window["train_hi"])
+            for params in param_grid
+        )
+    for params, row in zip(param_grid, rows):
+        if row["sharpe"] > best_sharpe:
+            best_sharpe = row["sharpe"]
+            best_params = params
+
+    metrics_test = run_params(symbol, cfg, df, indicators, best_params, strategy_name=strategy,
+                              start=window["test_lo"], end=window["test_hi"])
+    print(f"→ {symbol} {window['train_start'].date()}..{window['test_end'].date()}: "
+          f"train Sharpe={best_sharpe:.2f}, test Sharpe={metrics_test['sharpe']:.2f}")
+
+    return {
+        "symbol": symbol,
+        "train_start": window["train_start"].date(),
+        "train_end": window["train_end"].date(),
+        "test_start": window["test_start"].date(),
+        "test_end": window["test_end"].date(),
+        **best_params,
+        "train_sharpe": best_sharpe,
+        "test_sharpe": metrics_test["sharpe"],
+        "test_return": metrics_test["total_return"],
+        "test_max_drawdown": metrics_test["max_drawdown"],
+        "test_win_rate": metrics_test["win_rate"],
+        "test_n_trades": metrics_test["n_trades"]
+    }
+
+# Per-process state (_WORKER) is set up once by hyperscan's _init_worker
+def _worker_window(window: dict, vectorized: bool) -> dict:
+    w = _WORKER
+    return evaluate_window(w["symbol"], w["cfg"], w["df"], w["indicators"], window, vectorized)
+
 def walk_forward(
     symbol: str,
     cfg: dict,
     data_dir: str = "data/klines",
-    temp_dir: str = "data/temp",
     output_csv: str = "backtesting/walkforward_results.csv",
     train_months: int = 1,
-    test_months: int = 1
+    test_months: int = 1,
+    vectorized: bool = False,
+    workers: int = 1
 ):
     """
-    Perform walk-forward on `symbol` using hourly data in data_dir/{symbol}_1h.csv.
+    Perform walk-forward on `symbol` using hourly data in data_dir
+    ({symbol}_{contract_type}_1h.csv, read through the binary kline cache).
+    The series is loaded once and windows are index ranges into it, so no
+    per-window files are written and indicators computed on the full series
+    are reused (test windows keep their warmup bars).
     For each window:
       1) Train window = train_months months
       2) Test window = next test_months months
       3) On train: scan all hyperparameter combinations → pick best Sharpe
       4) On test: backtest that best parameter set → record metrics
     Saves a CSV of results to output_csv.
+    vectorized: for mean_reversion symbols, score the train grid with
+    sweep_mean_reversion() instead of one Backtester per combination.
+    workers: windows are independent; with workers > 1 they run in a process
+    pool that shares the series through shared memory.
     """
 
     # 1) Load full hourly DataFrame
-    hist_path = os.path.join(data_dir, f"{symbol}_1h.csv")
-    if not os.path.isfile(hist_path):
-        raise FileNotFoundError(f"Missing historical CSV: {hist_path}")
-    df = pd.read_csv(hist_path, parse_dates=["open_time"])
-    df.sort_values("open_time", inplace=True)
-    df.reset_index(drop=True, inplace=True)
+    contract_type = cfg["symbols"][symbol].get("contract_type", "PERPETUAL")
+    hist_path = find_kline_csv(data_dir, symbol, "1h", contract_type)
+    df = read_klines(hist_path)
 
     # 2) Build train/test windows
-    #    We'll advance by test_months each iteration.
-    results = []
-    start_time = df["open_time"].min()
-    end_time = df["open_time"].max()
-
-    cur_train_start = start_time
-
-    # Helper to add months (approx by pandas DateOffset)
-    from pandas.tseries.offsets import DateOffset
-
-    while True:
-        train_end = cur_train_start + DateOffset(months=train_months)
-        test_start = train_end
-        test_end = train_end + DateOffset(months=test_months)
-
-        # Stop if test_end exceeds available data
-        if test_end > end_time:
-            break
-
-        # Slice DataFrames
-        df_train = df[(df["open_time"] >= cur_train_start) & (df["open_time"] < train_end)].copy()
-        df_test = df[(df["open_time"] >= test_start) & (df["open_time"] < test_end)].copy()
-
-        # Skip if insufficient data (e.g. less than 100 hourly bars)
-        if len(df_train) < 100 or len(df_test) < 100:
-            cur_train_start = test_start
-            continue
-
-        # 3) Save train/test to temp CSVs for the Backtester to use
-        ensure_dir(temp_dir)
-        train_file = os.path.join(temp_dir, f"{symbol}_train_{cur_train_start.date()}.csv")
-        test_file = os.path.join(temp_dir, f"{symbol}_test_{test_start.date()}.csv")
-        df_train.to_csv(train_file, index=False)
-        df_test.to_csv(test_file, index=False)
-
-        # 4) Hyperparameter scan on train set
-        print(f"\n=== Walk-forward: Training {symbol} from {cur_train_start.date()} to {train_end.date()} ===")
-        best_sharpe = -float("inf")
-        best_params = None
-
-        # Iterate over the same grid as in hyperscan.py
-        for params in generate_param_grid():
-            # Create a shallow copy of config and inject overrides for this symbol
-            cfg_train = dict(cfg)
-            sym_cfg = cfg_train["symbols"][symbol]
-            for key, val in params.items():
-                sym_cfg[f"{key}_override"] = val
-
-            # Backtest on train CSV
-            bt_train = Backtester(
-                symbol=symbol,
-                config=cfg_train,
-                data_dir=temp_dir,
-                strategy_name=sym_cfg["strategy"]
-            )
-            metrics_train = bt_train.run()
-            if metrics_train["sharpe"] > best_sharpe:
-                best_sharpe = metrics_train["sharpe"]
-                best_params = params
-
-        print(f"→ Best train params: {best_params} with Sharpe={best_sharpe:.2f}")
-
-        # 5) Backtest on test set with best_params
-        cfg_test = dict(cfg)
-        sym_cfg_test = cfg_test["symbols"][symbol]
-        for key, val in best_params.items():
-            sym_cfg_test[f"{key}_override"] = val
-
-        print(f"=== Testing {symbol} from {test_start.date()} to {test_end.date()} ===")
-        bt_test = Backtester(
-            symbol=symbol,
-            config=cfg_test,
-            data_dir=temp_dir,
-            strategy_name=sym_cfg_test["strategy"]
-        )
-        metrics_test = bt_test.run()
-        print(f"→ Test metrics: {metrics_test}")
-
-        # 6) Record results
-        results.append({
-            "symbol": symbol,
-            "train_start": cur_train_start.date(),
-            "train_end": train_end.date(),
-            "test_start": test_start.date(),
-            "test_end": test_end.date(),
-            **best_params,
-            "train_sharpe": best_sharpe,
-            "test_sharpe": metrics_test["sharpe"],
-            "test_return": metrics_test["total_return"],
-            "test_max_drawdown": metrics_test["max_drawdown"],
-            "test_win_rate": metrics_test["win_rate"],
-            "test_n_trades": metrics_test["n_trades"]
-        })
-
-        # Advance window
-        cur_train_start = test_start
-
-    # 7) Save all results to output CSV
+    windows = build_windows(df["open_time"], train_months, test_months)
+    print(f"\n=== Walk-forward: {symbol}, {len(windows)} windows, {workers} worker(s) ===")
+
+    # 3) Evaluate each window
+    if workers <= 1:
+        indicators = IndicatorEngine(df)
+        results = [evaluate_window(symbol, cfg, df, indicators, w, vectorized) for w in windows]
+    else:
+        shm, n = share_klines(df)
+        try:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(shm.name, n, symbol, cfg)
+            ) as pool:
+                # map() keeps window order
+                results = list(pool.map(_worker_window, windows, [vectorized] * len(windows)))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    # 4) Save all results to output CSV
     out_dir = os.path.dirname(output_csv)
     ensure_dir(out_dir)
     df_res = pd.DataFrame(results)
     df_res.to_csv(output_csv, index=False)
     print(f"\nWalk-forward complete for {symbol}. Results saved to {output_csv}")
+    return df_res
 
 
 if __name__ == "__main__":
     # Example usage: walk-forward on all enabled symbols
     cfg = load_config("config/config.yaml")
     data_dir = "data/klines"
-    temp_dir = "data/temp"
     out_dir = "backtesting"
     ensure_dir(out_dir)
 
@@ -168,8 +194,9 @@ if __name__ == "__main__":
             symbol=symbol,
             cfg=cfg,
             data_dir=data_dir,
-            temp_dir=temp_dir,
             output_csv=output_csv,
             train_months=1,
-            test_months=1
+            test_months=1,
+            vectorized=True,
+            workers=os.cpu_count() or 1
         )
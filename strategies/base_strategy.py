@@ -8,6 +8,10 @@ class BaseStrategy:
     - symbol: Trading symbol (e.g. "SOLUSDT")
     - pm: PositionManager instance (or None in backtests)
     - notifier: NotificationManager (optional)
+
+    Live run() is called every tick, but signals only change when a bar
+    closes: bar_cached() keeps heavy per-bar work (features, inference,
+    grid construction) for the ticks that follow.
     """
 
     def __init__(self, client, cfg, symbol: str, pm=None, notifier=None):
@@ -16,6 +20,23 @@ class BaseStrategy:
         self.symbol = symbol
         self.pm = pm
         self.notifier = notifier
+        self._bar_cache = {}
+        self.bar_cache_stats = {"hits": 0, "misses": 0}
+
+    def bar_cached(self, name: str, bar_time, compute):
+        """
+        compute() for the last closed bar, identified by its open_time:
+        computed the first time that bar is seen, then reused until a newer
+        bar closes.
+        """
+        hit = self._bar_cache.get(name)
+        if hit is not None and hit[0] == bar_time:
+            self.bar_cache_stats["hits"] += 1
+            return hit[1]
+        self.bar_cache_stats["misses"] += 1
+        value = compute()
+        self._bar_cache[name] = (bar_time, value)
+        return value
 
     def run_sim(self):
         """
@@ -1,10 +1,13 @@
 # src/strategies/grid_strategy.py
 
 import logging
+import math
 import numpy as np
 import pandas as pd
 
 from .base_strategy import BaseStrategy
+from utils.streaming_indicators import RollingMean, IndicatorFeed
+from utils.order_ladder import OrderLadder
 
 class GridStrategy(BaseStrategy):
     """
@@ -35,24 +38,54 @@ class GridStrategy(BaseStrategy):
         self.vol_multiplier  = grid_cfg.get("vol_multiplier", 2.0)
         self.base_spacing_pct = grid_cfg.get("base_spacing_pct", 0.01)
 
+        # Live ladder mode: keep an order resting at every grid level
+        # (batched creates/cancels, only the levels that changed)
+        self.ladder = None
+        if grid_cfg.get("ladder", False):
+            tick_size, qty_step = self._exchange_filters(client, grid_cfg)
+            self.ladder = OrderLadder(client, symbol, tag="grid",
+                                      tick_size=tick_size, qty_step=qty_step)
+
+        # Rolling high-low range fed only with bars not seen yet
+        self._feed = IndicatorFeed({"vol": lambda: RollingMean(self.vol_lookback, source="range")})
+
         # State
         self.in_position = False
         if self.pm:
             self.pm.reconcile(self.client)
             self.in_position = self.pm.is_in_position(self.symbol)
 
+    def _exchange_filters(self, client, grid_cfg: dict):
+        """
+        (tick_size, qty_step) for the ladder: from the grid config, else from
+        the exchange (client.get_symbol_filters). Raises ValueError if neither
+        has them, rather than sending unrounded prices and quantities.
+        """
+        tick_size, qty_step = grid_cfg.get("tick_size"), grid_cfg.get("qty_step")
+        if not (tick_size and qty_step) and hasattr(client, "get_symbol_filters"):
+            filters = client.get_symbol_filters(self.symbol)
+            tick_size = tick_size or filters.get("tick_size")
+            qty_step = qty_step or filters.get("qty_step")
+        if not (tick_size and qty_step):
+            raise ValueError(f"GridStrategy {self.symbol}: ladder mode needs grid.tick_size "
+                             f"and grid.qty_step (not available from the exchange client)")
+        return tick_size, qty_step
+
     def _compute_order_size(self, price: float) -> float:
         """Calculate how many contracts to buy/sell."""
         notional = self.allocation_usdt * self.leverage
         return notional / price
 
-    def _determine_grid_parameters(self, df: pd.DataFrame, current_price: float):
+    def _determine_grid_parameters(self, df: pd.DataFrame, current_price: float, vol: float = None):
         """
         Based on recent volatility, set lower/upper band and grid levels.
+        `vol` (mean high-low range) may be passed in precomputed; otherwise it
+        is taken from the last `vol_lookback` rows of df.
         """
         # ATR as proxy: use high-low range
-        recent = df["high"].iloc[-self.vol_lookback:] - df["low"].iloc[-self.vol_lookback:]
-        vol = recent.mean()
+        if vol is None:
+            recent = df["high"].iloc[-self.vol_lookback:] - df["low"].iloc[-self.vol_lookback:]
+            vol = recent.mean()
         band = vol * self.vol_multiplier
 
         lower = current_price - band
@@ -65,21 +98,95 @@ class GridStrategy(BaseStrategy):
         spacing = (upper - lower) / levels
         return lower, upper, levels, spacing
 
+    def _ladder_levels(self, grid_levels: list, current_price: float, spacing: float,
+                       long_qty: float = None) -> list:
+        """
+        Desired resting orders: BUY at levels below the price, SELL above,
+        with the allocation split evenly across them. Levels within half a
+        spacing of the price are left out (they would fill at once).
+        HEDGE mode trades the LONG leg only: BUYs open it and SELLs close it.
+        Quantities are allotted nearest level first: SELLs add up to at most
+        long_qty (the open long position) and BUYs to at most what the
+        allocation leaves on top of it, so the leg never outgrows the
+        allocation. (Opening SHORT with the SELLs would leave both legs
+        growing and no fill ever realizing PnL.)
+        """
+        prices = [p for p in grid_levels if abs(p - current_price) > spacing / 2]
+        if not prices:
+            return []
+        hedge = self.position_mode == "HEDGE"
+        long_qty = max(0.0, long_qty or 0.0)
+        budget = {"SELL": long_qty,
+                  "BUY": max(0.0, self._compute_order_size(current_price) - long_qty)}
+        step = self.ladder.qty_step if self.ladder is not None else None
+        levels = []
+        for price in sorted(prices, key=lambda p: abs(p - current_price)):
+            side = "BUY" if price < current_price else "SELL"
+            qty = self._compute_order_size(price) / len(prices)
+            if hedge:
+                # Round down so the leg's orders never exceed their budget
+                qty = min(qty, budget[side])
+                qty = math.floor(qty / step + 1e-9) * step if step else qty
+                budget[side] -= qty
+                if qty <= 0:
+                    continue
+            level = {"side": side, "price": price, "qty": qty}
+            if hedge:
+                level["positionSide"] = "LONG"
+            levels.append(level)
+        return sorted(levels, key=lambda l: l["price"])
+
+    def _long_position(self):
+        """Open LONG-leg quantity of the symbol (None if positions are unavailable)."""
+        if self.pm:
+            legs = self.pm.position_legs(self.client, self.symbol)
+        else:
+            try:
+                legs = {}
+                for p in self.client.get_account_positions():
+                    if p["symbol"] == self.symbol:
+                        side = p.get("positionSide", "BOTH")
+                        legs[side] = legs.get(side, 0.0) + float(p.get("positionAmt", 0))
+            except Exception as e:
+                logging.error(f"GridStrategy: failed to fetch positions: {e}")
+                legs = None
+        return None if legs is None else legs.get("LONG", 0.0)
+
+    def _build_grid(self, df: pd.DataFrame, current_price: float) -> dict:
+        """Grid levels, spacing and matching tolerance around current_price."""
+        vol = self._streaming_vol(df)
+        lower, upper, levels, spacing = self._determine_grid_parameters(df, current_price, vol=vol)
+        return {
+            "levels": [lower + i * spacing for i in range(levels + 1)],
+            "spacing": spacing,
+            "tol": self.base_spacing_pct * current_price,
+        }
+
+    def _streaming_vol(self, df) -> float:
+        """Mean high-low range of the last vol_lookback bars of df, updated incrementally."""
+        return self._feed.sync(df)["vol"]
+
     def run_sim(self) -> dict:
         """
         Backtest logic: returns {"action","price","qty"} or None.
         """
-        # 1) Load enough bars
         needed = self.vol_lookback + 1
-        df = self.client.get_historical_klines(self.symbol, "1h", needed)
-
-        if df is None or len(df) < needed:
-            return None
-
         current_price = self.client.current_price
+        engine = getattr(self.client, "indicators", None)
 
-        # 2) Compute grid
-        lower, upper, levels, spacing = self._determine_grid_parameters(df, current_price)
+        # 1+2) Volatility from the precomputed engine, or from a fetched window
+        if engine is not None:
+            idx = self.client.current_index
+            if idx + 1 < needed:
+                return None
+            vol = float(engine.range_mean(self.vol_lookback)[idx])
+            lower, upper, levels, spacing = self._determine_grid_parameters(None, current_price, vol=vol)
+        else:
+            df = self.client.get_historical_klines(self.symbol, "1h", needed)
+            if df is None or len(df) < needed:
+                return None
+            vol = self._streaming_vol(df)
+            lower, upper, levels, spacing = self._determine_grid_parameters(df, current_price, vol=vol)
         grid_levels = [lower + i * spacing for i in range(levels + 1)]
 
         # 3) Tolerance-based matching
@@ -123,12 +230,39 @@ class GridStrategy(BaseStrategy):
         if df is None or len(df) < needed:
             return
 
-        # 4) Compute grid and tolerance
-        lower, upper, levels, spacing = self._determine_grid_parameters(df, current_price)
-        grid_levels = [lower + i * spacing for i in range(levels + 1)]
-        tol = self.base_spacing_pct * current_price
+        # 4) Grid and tolerance: built once per closed bar (around the first
+        #    price seen after it closed); later ticks only check crossings
+        grid = self.bar_cached("grid", df["open_time"].iloc[-1],
+                               lambda: self._build_grid(df, current_price))
+        grid_levels, spacing, tol = grid["levels"], grid["spacing"], grid["tol"]
+
+        # 5) Ladder mode: diff the whole grid against the book. Fills since
+        #    the last tick become one FILLED record in the PositionManager
+        #    (cleared by reconcile once the position is flat); in HEDGE mode
+        #    the SELL levels are sized from the LONG position after them
+        if self.ladder is not None:
+            book = self.ladder.refresh()
+            if book["filled"]:
+                logging.info(f"Grid ladder {self.symbol}: {len(book['filled'])} order(s) filled")
+                if self.pm:
+                    self.pm.record_fills(self.symbol, book["filled"])
+                    self.pm.invalidate_snapshot()
+            if book["removed"]:
+                logging.warning(f"Grid ladder {self.symbol}: {len(book['removed'])} order(s) "
+                                f"cancelled outside the ladder")
+            long_qty = None
+            if self.position_mode == "HEDGE":
+                long_qty = self._long_position()
+                if long_qty is None:
+                    return   # do not size closing orders from missing data
+            result = self.ladder.sync(self._ladder_levels(grid_levels, current_price, spacing, long_qty),
+                                      price_tolerance=spacing / 2, book=book)
+            if result["cancelled"] or result["created"]:
+                logging.info(f"Grid ladder {self.symbol}: kept {result['kept']}, "
+                             f"cancelled {result['cancelled']}, created {result['created']}")
+            return
 
-        # 5) Check for entry/exit
+        # 6) Single-order mode: check for entry/exit
         for level in grid_levels:
             if abs(current_price - level) <= tol:
                 qty = self._compute_order_size(current_price)
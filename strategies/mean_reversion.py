@@ -1,8 +1,11 @@
 # TRD_BOT_V3/src/strategies/mean_reversion.py
 
 import logging
+import numpy as np
 import pandas as pd
 from .base_strategy import BaseStrategy
+from utils import indicator_engine as ie
+from utils.streaming_indicators import ATR, RSI, RollingMean, RollingStd, Lagged, IndicatorFeed
 # Note: we no longer import PositionManager here since run_sim ignores pm
 # PositionManager is only used in run() for live trading
 
@@ -55,6 +58,10 @@ class MeanReversionStrategy(BaseStrategy):
         self.lt_vol_lookback = sym_cfg.get("lt_vol_lookback_override", mr_cfg.get("lt_vol_lookback", 200))
         self.sigma_bank = sym_cfg.get("sigma_bank_override", mr_cfg.get("sigma_bank", [1.5, 2.0, 2.5, 3.0]))
 
+        # Incremental indicators for fetched windows (see _indicator_feed)
+        self.streaming = mr_cfg.get("streaming_indicators", True)
+        self._feed = None
+
     def _compute_order_size(self, current_price: float) -> float:
         desired_notional = self.allocation_usdt * self.leverage
         max_notional = self.max_position_size_usdt * self.leverage
@@ -65,34 +72,96 @@ class MeanReversionStrategy(BaseStrategy):
     def _fetch_ohlc(self, interval: str, limit: int) -> pd.DataFrame:
         return self.client.get_historical_klines(self.symbol, interval, limit)
 
-    def _compute_atr(self, df: pd.DataFrame, lookback: int) -> float:
-        high = df["high"]
-        low = df["low"]
-        close = df["close"]
-        prev_close = close.shift(1)
+    def _compute_atr(self, df, lookback: int) -> float:
+        # Only the last lookback+1 rows matter; the first of them just supplies prev_close
+        high = np.asarray(df["high"], dtype=np.float64)[-(lookback + 1):]
+        low = np.asarray(df["low"], dtype=np.float64)[-(lookback + 1):]
+        close = np.asarray(df["close"], dtype=np.float64)[-(lookback + 1):]
+        return float(ie.atr(high, low, close, lookback)[-1])
+
+    def _compute_sma(self, series, period: int) -> float:
+        values = np.asarray(series, dtype=np.float64)
+        if len(values) < period:
+            return float("nan")
+        return float(values[-period:].mean())
+
+    def _compute_rsi(self, series, period: int) -> float:
+        closes = np.asarray(series, dtype=np.float64)[-(period + 1):]
+        avg_gain, avg_loss = ie.average_gain_loss(closes, period)
+        avg_gain, avg_loss = avg_gain[-1], avg_loss[-1]
+        if avg_loss == 0:
+            return 100.0
+        rs = avg_gain / avg_loss
+        return float(100.0 - (100.0 / (1.0 + rs)))
 
-        tr1 = high - low
-        tr2 = (high - prev_close).abs()
-        tr3 = (low - prev_close).abs()
+    def _bars_needed(self) -> int:
+        return max(self.lookback + 1, self.trend_lookback + 1, self.rsi_period + 1, self.lt_vol_lookback + 1)
 
-        tr = pd.concat([tr1, tr2, tr3], axis=1).max(axis=1)
-        atr = tr.rolling(window=lookback, min_periods=lookback).mean().iloc[-1]
-        return float(atr)
+    def _indicator_feed(self) -> IndicatorFeed:
+        """
+        Streaming indicators behind _compute_signal_inputs(). Built lazily so
+        that *_override attributes set after __init__ are honoured.
+        """
+        if self._feed is None:
+            self._feed = IndicatorFeed({
+                "atr_lt": lambda: ATR(self.lt_vol_lookback),
+                "atr_st": lambda: ATR(self.lookback),
+                # Bands use the `lookback` closes *before* the current bar
+                "ma": lambda: Lagged(RollingMean(self.lookback)),
+                "std": lambda: Lagged(RollingStd(self.lookback)),
+                "sma": lambda: RollingMean(self.trend_lookback),
+                "rsi": lambda: RSI(self.rsi_period),
+            })
+        return self._feed
+
+    def _compute_signal_inputs(self):
+        """
+        Returns (atr_lt, atr_st, ma, std, sma, rsi) for the current bar, or None
+        if there is not enough history yet.
+        In backtests the VirtualClient exposes a precomputed IndicatorEngine, so
+        every value is an O(1) array lookup at client.current_index. Otherwise a
+        window is fetched and, with `streaming` on, only the bars not seen on
+        earlier calls are fed to the streaming indicators, so the cost per call
+        does not grow with lt_vol_lookback. With `streaming` off every value is
+        recomputed from the window.
+        """
+        needed = self._bars_needed()
+        engine = getattr(self.client, "indicators", None)
+
+        if engine is not None:
+            idx = self.client.current_index
+            if idx + 1 < needed:
+                return None
+            return (
+                float(engine.atr(self.lt_vol_lookback)[idx]),
+                float(engine.atr(self.lookback)[idx]),
+                # Bands use the `lookback` closes *before* the current bar
+                float(engine.sma(self.lookback)[idx - 1]),
+                float(engine.rolling_std(self.lookback)[idx - 1]),
+                float(engine.sma(self.trend_lookback)[idx]),
+                float(engine.rsi(self.rsi_period)[idx]),
+            )
 
-    def _compute_sma(self, series: pd.Series, period: int) -> float:
-        return float(series.rolling(window=period, min_periods=period).mean().iloc[-1])
+        df = self._fetch_ohlc(self.interval, needed)
+        if df is None or len(df) < needed:
+            return None
 
-    def _compute_rsi(self, series: pd.Series, period: int) -> float:
-        delta = series.diff().dropna()
-        gain = delta.where(delta > 0, 0.0)
-        loss = -delta.where(delta < 0, 0.0)
+        if self.streaming:
+            feed = self._indicator_feed().sync(df)
+            return tuple(feed[name] for name in ("atr_lt", "atr_st", "ma", "std", "sma", "rsi"))
 
-        avg_gain = gain.rolling(window=period, min_periods=period).mean().iloc[-1]
-        avg_loss = loss.rolling(window=period, min_periods=period).mean().iloc[-1]
-        if avg_loss == 0:
-            return 100.0
-        rs = avg_gain / avg_loss
-        return float(100.0 - (100.0 / (1.0 + rs)))
+        closes = df["close"]
+
+        atr_lt = self._compute_atr(df, self.lt_vol_lookback)
+        df_st = df.iloc[-(self.lookback + 1):]
+        atr_st = self._compute_atr(df_st, self.lookback)
+
+        ma = closes.iloc[-(self.lookback + 1):-1].mean()
+        std = closes.iloc[-(self.lookback + 1):-1].std()
+
+        sma = self._compute_sma(closes, self.trend_lookback)
+        rsi = self._compute_rsi(closes, self.rsi_period)
+        return atr_lt, atr_st, ma, std, sma, rsi
 
     def run_sim(self) -> dict:
         """
@@ -107,17 +176,14 @@ class MeanReversionStrategy(BaseStrategy):
         if quantity <= 0:
             return None
 
-        # 3) Fetch enough candles for calculations
-        needed = max(self.lookback + 1, self.trend_lookback + 1, self.rsi_period + 1, self.lt_vol_lookback + 1)
-        df = self._fetch_ohlc(self.interval, needed)
-        closes = df["close"]
+        # 3) Indicators for the current bar (None while warming up)
+        inputs = self._compute_signal_inputs()
+        if inputs is None:
+            return None
+        atr_lt, atr_st, ma, std, sma, rsi = inputs
 
-        # 4) Compute Long/Short ATRs
-        atr_lt = self._compute_atr(df, self.lt_vol_lookback)
+        # 4) Long/Short ATRs as % of price
         vol_lt_pct = atr_lt / current_price
-
-        df_st = df.iloc[-(self.lookback + 1):]
-        atr_st = self._compute_atr(df_st, self.lookback)
         vol_st_pct = atr_st / current_price
 
         # 5) Determine σ‐multiplier
@@ -131,17 +197,11 @@ class MeanReversionStrategy(BaseStrategy):
         else:
             std_mul = self.sigma_bank[3]
 
-        # 6) Compute mean & std for bands
-        ma = closes.iloc[-(self.lookback + 1):-1].mean()
-        std = closes.iloc[-(self.lookback + 1):-1].std()
+        # 6) Bands from mean & std of the previous `lookback` closes
         upper_band = ma + std_mul * std
         lower_band = ma - std_mul * std
 
-        # 7) Compute SMA (trend) and RSI
-        sma = self._compute_sma(closes, self.trend_lookback)
-        rsi = self._compute_rsi(closes, self.rsi_period)
-
-        # 8) Entry / exit logic
+        # 7) Entry / exit logic
         entry_price = current_price
         buy_limit = entry_price
         sell_limit = entry_price
@@ -1,10 +1,14 @@
 # TRD_BOT_V3/src/strategies/ml_strategy.py
 
 import logging
+import numpy as np
+import pandas as pd
 from .base_strategy import BaseStrategy
 
 from ml.feature_engineering import engineer_features
+from ml.feature_store import FeatureSpec, shared_store
 from ml.model import MLModel
+from utils.kline_cache import MAX_LIMIT, interval_ms, rows_to_frame
 from utils.trade_history_manager import TradeHistoryManager
 
 class MLStrategy(BaseStrategy):
@@ -64,6 +68,13 @@ class MLStrategy(BaseStrategy):
         # Load model trained on your past fills
         self.model = MLModel(self.model_path)
         self.lookback = ml_cfg.get("lookback", 50)
+        # Backtests: predict every bar in one batched call (see _batch_probs)
+        self.batch_inference = ml_cfg.get("batch_inference", True)
+        self._probs = None
+        # Engineered features are read from (and added to) the feature store
+        self.features = shared_store(ml_cfg.get("feature_dir", "data/features"))
+        # Live: most bars fetched (paged, once) to join the stored feature history
+        self.feature_gap_bars = ml_cfg.get("feature_gap_bars", 2000)
 
         # TradeHistoryManager to keep trade cache up to date
         self.thm = TradeHistoryManager(
@@ -79,24 +90,55 @@ class MLStrategy(BaseStrategy):
             desired_notional = max_notional
         return desired_notional / current_price
 
+    def _batch_probs(self) -> np.ndarray:
+        """
+        prob_buy for every bar of the backtest series, NaN where the per-bar
+        path would skip the bar. Features (from the feature store) are those
+        of the same window run_sim() fetches (the current bar plus lookback+1
+        before it), so the probabilities match the per-bar ones exactly; the
+        model is called once.
+        """
+        if self._probs is None:
+            spec = FeatureSpec(self.lookback, window=self.lookback + 2)
+            features = self.features.features(self.symbol, self.interval, spec, self.client.df)
+            X = features.to_numpy(dtype=np.float64)
+            finite = np.isfinite(X).all(axis=1)
+            probs = np.full(len(X), np.nan)
+            if finite.any():
+                probs[finite] = self.model.predict_proba(features[finite])
+            self._probs = probs
+        return self._probs
+
     def run_sim(self) -> dict:
         """
         Backtesting path (uses VirtualClient). Returns:
           {"action":"BUY"/"SELL","price":..., "qty":...} or None.
+        With batch_inference (and the full series as client.df) prob_buy is
+        looked up in _batch_probs(); otherwise it is computed from a fetched
+        window every bar.
         """
         current_price = self.client.current_price
         if not (self.zone_lower <= current_price <= self.zone_upper):
             return None
 
-        needed = self.lookback + 1
-        df_ohlc = self.client.get_historical_klines(self.symbol, self.interval, needed)
-        features = engineer_features(df_ohlc, lookback=self.lookback)
-        features_clean = features.dropna()
-        if features_clean.empty:
-            return None
+        if self.batch_inference and getattr(self.client, "df", None) is not None:
+            prob_buy = float(self._batch_probs()[self.client.current_index])
+            if np.isnan(prob_buy):
+                return None
+        else:
+            needed = self.lookback + 1
+            df_ohlc = self.client.get_historical_klines(self.symbol, self.interval, needed)
+            if not isinstance(df_ohlc, pd.DataFrame):
+                # Zero-copy KlineWindow from the VirtualClient; features need pandas
+                df_ohlc = df_ohlc.to_frame()
+            features = engineer_features(df_ohlc, lookback=self.lookback)
 
-        X_latest = features_clean.iloc[[-1]]
-        prob_buy = float(self.model.predict_proba(X_latest)[0])
+            # Only the current bar's features; skip it during warmup or when a
+            # feature is undefined (e.g. vol_chg after a zero-volume bar is inf)
+            X_latest = features.iloc[[-1]]
+            if not np.isfinite(X_latest.to_numpy(dtype=np.float64)).all():
+                return None
+            prob_buy = float(self.model.predict_proba(X_latest)[0])
         quantity = self._compute_order_size(current_price)
         if quantity <= 0:
             return None
@@ -109,6 +151,52 @@ class MLStrategy(BaseStrategy):
             return {"action": "SELL", "price": current_price, "qty": quantity}
         return None
 
+    def _predict_live(self, df_ohlc: pd.DataFrame):
+        """
+        prob_buy for the last bar of df_ohlc (None if its feature row is not
+        complete). Features come from the feature store. If the stored bars
+        end before df_ohlc starts, the bars in between (up to feature_gap_bars)
+        are fetched first so the window joins them; from then on each new bar
+        is appended and its EMA continues the stored history, as in training.
+        A window that cannot be joined is computed on its own (EMA over the
+        window only) and does not touch the stored entry.
+        """
+        spec = FeatureSpec(self.lookback)
+        gap = self.features.missing_bars(self.symbol, self.interval, spec, df_ohlc["open_time"].iloc[0])
+        if gap and gap <= self.feature_gap_bars:
+            df_ohlc = self._join_stored(df_ohlc, gap)
+        features = self.features.features(self.symbol, self.interval, spec, df_ohlc)
+        X_latest = features.iloc[[-1]]
+        if not np.isfinite(X_latest.to_numpy(dtype=np.float64)).all():
+            return None
+        return float(self.model.predict_proba(X_latest)[0])
+
+    def _join_stored(self, df_ohlc: pd.DataFrame, gap: int) -> pd.DataFrame:
+        """
+        df_ohlc preceded by the last stored bar and the `gap` bars after it,
+        fetched in pages of MAX_LIMIT with start_time (a gap can be longer
+        than one klines request). Unchanged if the fetch fails.
+        """
+        step = interval_ms(self.interval)
+        first_ms = pd.Timestamp(df_ohlc["open_time"].iloc[0]).as_unit("ns").value // 1_000_000
+        start = first_ms - (gap + 1) * step   # overlap the last stored bar
+        rows = []
+        try:
+            while start < first_ms:
+                limit = int(min(MAX_LIMIT, (first_ms - start) // step))
+                page = self.client.get_klines(self.symbol, self.interval, limit=limit, start_time=start)
+                page = [r for r in page if int(r[0]) < first_ms]
+                if not page:
+                    break
+                rows.extend(page)
+                start = int(page[-1][0]) + step
+        except Exception as e:
+            logging.error(f"MLStrategy: failed to fetch {gap} bars before {self.symbol} window: {e}")
+            return df_ohlc
+        if not rows:
+            return df_ohlc
+        return pd.concat([rows_to_frame(rows), df_ohlc], ignore_index=True)
+
     def run(self):
         """
         Live/paper-trading path. Steps:
@@ -128,8 +216,7 @@ class MLStrategy(BaseStrategy):
 
         # 3) Get current mark price
         try:
-            ticker = self.client.client.get_mark_price(symbol=self.symbol)
-            current_price = float(ticker["markPrice"])
+            current_price = float(self.client.get_mark_price(self.symbol))
         except Exception as e:
             logging.error(f"MLStrategy: failed to fetch mark price for {self.symbol}: {e}")
             return
@@ -138,16 +225,16 @@ class MLStrategy(BaseStrategy):
         if not (self.zone_lower <= current_price <= self.zone_upper):
             return
 
-        # 5) Fetch candles & compute features
+        # 5) Fetch candles; features & prob_buy only change when a bar closes
+        #    (or when a retrained model is swapped in)
         needed = self.lookback + 1
         df_ohlc = self.client.get_historical_klines(self.symbol, self.interval, needed)
-        features = engineer_features(df_ohlc, lookback=self.lookback)
-        features_clean = features.dropna()
-        if features_clean.empty:
+        if df_ohlc is None or df_ohlc.empty:
+            return
+        prob_buy = self.bar_cached("prob_buy", (df_ohlc["open_time"].iloc[-1], self.model.sha256),
+                                   lambda: self._predict_live(df_ohlc))
+        if prob_buy is None:
             return
-
-        X_latest = features_clean.iloc[[-1]]
-        prob_buy = float(self.model.predict_proba(X_latest)[0])
         quantity = self._compute_order_size(current_price)
         if quantity <= 0:
             return
@@ -0,0 +1,108 @@
+# TRD_BOT_V3/src/utils/async_runtime.py
+
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from utils.metrics import METRICS
+
+def next_boundary(now: float, tick_seconds: float, offset_seconds: float = 0.0) -> float:
+    """
+    First wall-clock time strictly after `now` that is a multiple of
+    tick_seconds (epoch-aligned) plus offset_seconds.
+    """
+    base = (now - offset_seconds) // tick_seconds * tick_seconds + offset_seconds
+    return base + tick_seconds
+
+class AsyncRuntime:
+    """
+    Runs every strategy's blocking run() as its own asyncio task.
+
+    - Ticks are scheduled on wall-clock boundaries (e.g. every full minute
+      plus a small offset so the exchange has closed the bar), not after a
+      fixed sleep, so the cadence does not drift with run() duration.
+    - run() executes in a bounded thread pool; with one thread per strategy
+      (the default), a slow or hanging symbol only holds its own thread.
+    - A strategy never overlaps itself: if run() takes longer than a tick,
+      the missed ticks are skipped and logged.
+    - Exceptions are logged per strategy and never stop the other tasks.
+    - Each run() is recorded in METRICS as "strategy.run", and its delay
+      behind the scheduled boundary as "loop.lag" (both per symbol).
+    """
+
+    def __init__(self, strategies: List, tick_seconds: float = 60.0,
+                 offset_seconds: float = 1.0, max_workers: Optional[int] = None):
+        self.strategies = strategies
+        self.tick_seconds = float(tick_seconds)
+        self.offset_seconds = float(offset_seconds)
+        self.max_workers = max_workers or max(1, len(strategies))
+        # Per-strategy counters, keyed by "SYMBOL (StrategyClass)"
+        self.stats = {self._name(s): {"runs": 0, "errors": 0, "skipped_ticks": 0,
+                                      "last_duration": None, "last_lag": None}
+                      for s in strategies}
+        self._stop: Optional[asyncio.Event] = None
+
+    @staticmethod
+    def _name(strat) -> str:
+        return f"{strat.symbol} ({strat.__class__.__name__})"
+
+    async def _sleep_until(self, due: float) -> bool:
+        """Sleep until wall-clock `due`; returns False if stop() was requested meanwhile."""
+        delay = max(0.0, due - time.time())
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _run_strategy(self, strat, pool: ThreadPoolExecutor, max_ticks: Optional[int]):
+        loop = asyncio.get_running_loop()
+        stats = self.stats[self._name(strat)]
+        due = next_boundary(time.time(), self.tick_seconds, self.offset_seconds)
+        ticks = 0
+
+        while max_ticks is None or ticks < max_ticks:
+            if not await self._sleep_until(due):
+                return
+            ticks += 1
+
+            labels = {"symbol": strat.symbol, "strategy": strat.__class__.__name__}
+            started = time.time()
+            stats["last_lag"] = started - due
+            METRICS.observe("loop.lag", max(0.0, started - due), **labels)
+            error = False
+            try:
+                await loop.run_in_executor(pool, strat.run)
+                stats["runs"] += 1
+            except Exception as e:
+                error = True
+                stats["errors"] += 1
+                logging.error(f"[ERROR] {self._name(strat)}: {e}")
+            finished = time.time()
+            stats["last_duration"] = finished - started
+            METRICS.observe("strategy.run", finished - started, error=error, **labels)
+
+            # Next boundary after this run; anything in between was missed
+            next_due = next_boundary(finished, self.tick_seconds, self.offset_seconds)
+            missed = int(round((next_due - due) / self.tick_seconds)) - 1
+            if missed > 0:
+                stats["skipped_ticks"] += missed
+                logging.warning(f"{self._name(strat)}: run() took {finished - started:.1f}s, "
+                                f"skipped {missed} tick(s)")
+            due = next_due
+
+    async def run(self, max_ticks: Optional[int] = None):
+        """Run all strategies until stop() (or max_ticks ticks each, for tests)."""
+        self._stop = asyncio.Event()
+        pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="strategy")
+        try:
+            await asyncio.gather(*(self._run_strategy(s, pool, max_ticks) for s in self.strategies))
+        finally:
+            # Do not wait for a hung run(); its thread ends with the process
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
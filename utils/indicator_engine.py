@@ -0,0 +1,160 @@
+# TRD_BOT_V3/src/utils/indicator_engine.py
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Callable, Dict, Tuple
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Array kernels
+# Each kernel takes float64 arrays covering the full series and returns an
+# array of the same length, NaN where there is not enough history yet.
+# Semantics match the pandas rolling(..., min_periods=period) versions used by
+# the strategies and ml.feature_engineering.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def rolling_mean(values: np.ndarray, period: int) -> np.ndarray:
+    """Mean of the last `period` values ending at each bar."""
+    out = np.full(len(values), np.nan)
+    if period <= 0 or len(values) < period:
+        return out
+    out[period - 1:] = sliding_window_view(values, period).mean(axis=1)
+    return out
+
+def rolling_std(values: np.ndarray, period: int, ddof: int = 1) -> np.ndarray:
+    """Sample standard deviation of the last `period` values ending at each bar."""
+    out = np.full(len(values), np.nan)
+    if period <= ddof or len(values) < period:
+        return out
+    out[period - 1:] = sliding_window_view(values, period).std(axis=1, ddof=ddof)
+    return out
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """
+    max(high-low, |high-prev_close|, |low-prev_close|).
+    The first bar has no previous close, so its TR falls back to high-low.
+    """
+    prev_close = np.empty_like(close)
+    prev_close[0] = np.nan
+    prev_close[1:] = close[:-1]
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+def atr(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int) -> np.ndarray:
+    """Simple-average ATR over `period` bars."""
+    return rolling_mean(true_range(high, low, close), period)
+
+def average_gain_loss(close: np.ndarray, period: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Rolling mean of up-moves and down-moves (as positive numbers) over `period` deltas."""
+    delta = np.empty_like(close)
+    delta[0] = np.nan
+    delta[1:] = np.diff(close)
+    gain = np.clip(delta, 0.0, None)
+    loss = -np.clip(delta, None, 0.0)
+    return rolling_mean(gain, period), rolling_mean(loss, period)
+
+def rsi(close: np.ndarray, period: int) -> np.ndarray:
+    """Simple-average RSI; 100 when there were no losses in the window."""
+    avg_gain, avg_loss = average_gain_loss(close, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out = 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+    out[avg_loss == 0] = 100.0
+    return out
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """EMA with span=`period`, seeded with the first value (pandas adjust=False)."""
+    return pd.Series(values).ewm(span=period, adjust=False).mean().to_numpy()
+
+def window_ema(values: np.ndarray, period: int, window: int) -> np.ndarray:
+    """
+    EMA of only the `window` values ending at each bar, seeded with the first
+    of them: what ema() gives for the last bar of a `window`-bar slice.
+    Bars with less history use the slice from the start of the series.
+    Follows the pandas adjust=False recursion step for step, so results are
+    identical to calling ema() on each slice, not just close to it.
+    """
+    out = np.array(ema(values, period), dtype=np.float64)
+    if window <= 0 or len(values) < window:
+        return out
+    alpha = 2.0 / (period + 1.0)
+    old_wt = 1.0 - alpha
+    windows = sliding_window_view(values, window)
+    weighted = windows[:, 0].copy()
+    for k in range(1, window):
+        cur = windows[:, k]
+        # pandas skips the update when the value repeats (constant series)
+        weighted = np.where(weighted != cur,
+                            (old_wt * weighted + alpha * cur) / (old_wt + alpha),
+                            weighted)
+    out[window - 1:] = weighted
+    return out
+
+
+class IndicatorEngine:
+    """
+    Computes each indicator once over a full OHLCV series and caches the result
+    as a NumPy array keyed by (indicator, params).
+
+    Strategies read the value for the current bar with e.g.
+        client.indicators.atr(14)[client.current_index]
+    instead of recomputing it on a trailing window every bar.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        """
+        Args:
+          df: DataFrame with at least high/low/close columns
+              (open/volume are used when present).
+        """
+        self.n = len(df)
+        self.columns: Dict[str, np.ndarray] = {}
+        for col in ("open", "high", "low", "close", "volume"):
+            if col in df.columns:
+                self.columns[col] = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64))
+        self._cache: Dict[tuple, object] = {}
+
+    def __len__(self) -> int:
+        return self.n
+
+    def _cached(self, key: tuple, fn: Callable):
+        if key not in self._cache:
+            self._cache[key] = fn()
+        return self._cache[key]
+
+    def column(self, name: str) -> np.ndarray:
+        """Raw float64 column (open, high, low, close, volume)."""
+        return self.columns[name]
+
+    def true_range(self) -> np.ndarray:
+        c = self.columns
+        return self._cached(("true_range",), lambda: true_range(c["high"], c["low"], c["close"]))
+
+    def atr(self, period: int) -> np.ndarray:
+        return self._cached(("atr", period), lambda: rolling_mean(self.true_range(), period))
+
+    def sma(self, period: int, source: str = "close") -> np.ndarray:
+        return self._cached(("sma", period, source),
+                            lambda: rolling_mean(self.columns[source], period))
+
+    def rolling_std(self, period: int, source: str = "close", ddof: int = 1) -> np.ndarray:
+        return self._cached(("rolling_std", period, source, ddof),
+                            lambda: rolling_std(self.columns[source], period, ddof))
+
+    def ema(self, period: int, source: str = "close") -> np.ndarray:
+        return self._cached(("ema", period, source), lambda: ema(self.columns[source], period))
+
+    def window_ema(self, period: int, window: int, source: str = "close") -> np.ndarray:
+        return self._cached(("window_ema", period, window, source),
+                            lambda: window_ema(self.columns[source], period, window))
+
+    def average_gain_loss(self, period: int) -> Tuple[np.ndarray, np.ndarray]:
+        return self._cached(("avg_gain_loss", period),
+                            lambda: average_gain_loss(self.columns["close"], period))
+
+    def rsi(self, period: int) -> np.ndarray:
+        return self._cached(("rsi", period), lambda: rsi(self.columns["close"], period))
+
+    def range_mean(self, period: int) -> np.ndarray:
+        """Mean of (high - low) over `period` bars (GridStrategy volatility proxy)."""
+        c = self.columns
+        return self._cached(("range_mean", period),
+                            lambda: rolling_mean(c["high"] - c["low"], period))
@@ -0,0 +1,125 @@
+# TRD_BOT_V3/src/utils/kline_cache.py
+
+import threading
+import time
+import pandas as pd
+from typing import Callable, Dict, Tuple
+
+# ──────────────────────────────────────────────────────────────────────────────
+# In-process cache of closed klines for live strategies, keyed by
+# (symbol, interval). The full window is fetched once; afterwards only bars
+# that closed since the last fetch are requested, and only once a new bar
+# can actually have closed — so most ticks cost no REST call at all.
+# ──────────────────────────────────────────────────────────────────────────────
+
+KLINE_COLUMNS = ["open_time", "open", "high", "low", "close", "volume"]
+MAX_LIMIT = 1500   # Binance futures klines limit
+
+_UNIT_MS = {"m": 60_000, "h": 3_600_000, "d": 86_400_000, "w": 604_800_000}
+
+def interval_ms(interval: str) -> int:
+    """Binance interval string ("1m", "4h", "1d", ...) → milliseconds."""
+    try:
+        return int(interval[:-1]) * _UNIT_MS[interval[-1]]
+    except (KeyError, ValueError):
+        raise ValueError(f"Unsupported kline interval: {interval}")
+
+def klines_weight(limit: int) -> int:
+    """Request weight of GET /fapi/v1/klines for a given limit."""
+    if limit < 100:
+        return 1
+    if limit < 500:
+        return 2
+    if limit <= 1000:
+        return 5
+    return 10
+
+def rows_to_frame(rows: list) -> pd.DataFrame:
+    """Raw kline rows [open_time, o, h, l, c, v, close_time, ...] → DataFrame of KLINE_COLUMNS."""
+    df = pd.DataFrame([r[:6] for r in rows], columns=KLINE_COLUMNS)
+    df["open_time"] = pd.to_datetime(df["open_time"].astype("int64"), unit="ms")
+    for col in KLINE_COLUMNS[1:]:
+        df[col] = df[col].astype(float)
+    return df
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.df = None          # closed bars, oldest first
+        self.capacity = 0       # bars kept (largest lookback requested)
+        self.last_open_ms = None
+
+class KlineCache:
+    """
+    Shared cache of closed bars per (symbol, interval).
+
+    fetch(symbol, interval, limit, start_time) must return raw kline rows
+    (as GET /fapi/v1/klines does), oldest first. The still-forming bar is
+    dropped, so strategies always see closed bars only.
+    Concurrent get() calls for the same key are coalesced: one thread
+    fetches, the others wait for it and read the result.
+    """
+
+    def __init__(self, fetch: Callable, clock: Callable[[], int] = None):
+        self.fetch = fetch
+        self.clock = clock or (lambda: int(time.time() * 1000))
+        self._entries: Dict[Tuple[str, str], _Entry] = {}
+        self._entries_lock = threading.Lock()
+        self.stats = {"requests": 0, "weight": 0, "hits": 0}
+
+    def _entry(self, key) -> _Entry:
+        with self._entries_lock:
+            return self._entries.setdefault(key, _Entry())
+
+    def _request(self, symbol: str, interval: str, limit: int, start_time: int = None) -> list:
+        with self._entries_lock:
+            self.stats["requests"] += 1
+            self.stats["weight"] += klines_weight(limit)
+        return self.fetch(symbol, interval, limit, start_time)
+
+    def _closed(self, rows: list, now_ms: int) -> list:
+        # Field 6 is close_time; a bar is final once it has passed
+        return [r for r in rows if int(r[6]) < now_ms]
+
+    def _refresh_full(self, entry: _Entry, symbol: str, interval: str, now_ms: int):
+        # One extra row: the last one returned is usually still forming
+        limit = min(entry.capacity + 1, MAX_LIMIT)
+        rows = self._closed(self._request(symbol, interval, limit), now_ms)
+        entry.df = rows_to_frame(rows).iloc[-entry.capacity:].reset_index(drop=True)
+        entry.last_open_ms = int(rows[-1][0]) if rows else None
+
+    def _refresh_new(self, entry: _Entry, symbol: str, interval: str, now_ms: int, step: int):
+        missing = (now_ms - entry.last_open_ms) // step
+        if missing >= MAX_LIMIT or missing >= entry.capacity:
+            return self._refresh_full(entry, symbol, interval, now_ms)
+        rows = self._request(symbol, interval, int(missing) + 1, entry.last_open_ms + step)
+        rows = [r for r in self._closed(rows, now_ms) if int(r[0]) > entry.last_open_ms]
+        if not rows:
+            return  # bar not published yet; retried on the next call
+        new = rows_to_frame(rows)
+        entry.df = pd.concat([entry.df, new], ignore_index=True).iloc[-entry.capacity:].reset_index(drop=True)
+        entry.last_open_ms = int(rows[-1][0])
+
+    def get(self, symbol: str, interval: str, lookback: int) -> pd.DataFrame:
+        """The last `lookback` closed bars (a copy; fewer if the exchange has fewer)."""
+        entry = self._entry((symbol, interval))
+        step = interval_ms(interval)
+        with entry.lock:
+            now_ms = self.clock()
+            if entry.df is None or entry.last_open_ms is None or lookback > entry.capacity:
+                entry.capacity = max(entry.capacity, lookback)
+                self._refresh_full(entry, symbol, interval, now_ms)
+            elif now_ms >= entry.last_open_ms + 2 * step:
+                # The bar after the last cached one has closed
+                self._refresh_new(entry, symbol, interval, now_ms, step)
+            else:
+                with self._entries_lock:
+                    self.stats["hits"] += 1
+            return entry.df.iloc[-lookback:].reset_index(drop=True)
+
+    def invalidate(self, symbol: str = None, interval: str = None):
+        """Drop cached bars (all keys, or those matching symbol/interval)."""
+        with self._entries_lock:
+            for (sym, ivl) in list(self._entries):
+                if (symbol is None or sym == symbol) and (interval is None or ivl == interval):
+                    del self._entries[(sym, ivl)]
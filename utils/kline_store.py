@@ -0,0 +1,163 @@
+# TRD_BOT_V3/src/utils/kline_store.py
+
+import os
+import glob
+import json
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional, Tuple
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Binary columnar cache for data/klines/*.csv
+#
+# File layout (little-endian):
+#   8 bytes   magic  b"TRDKLN1\n"
+#   8 bytes   uint64 header length
+#   N bytes   JSON header: n_rows, columns [{name, dtype, offset}],
+#             source_size, source_mtime_ns
+#   ...       one contiguous block per column, 64-byte aligned
+#
+# open_time is stored as int64 epoch nanoseconds, OHLCV as float64 (or
+# float32). The cache sits in a ".kline_cache" folder next to the CSV and is
+# rebuilt automatically when the CSV's size or mtime changes.
+# ──────────────────────────────────────────────────────────────────────────────
+
+MAGIC = b"TRDKLN1\n"
+CACHE_DIRNAME = ".kline_cache"
+PRICE_COLUMNS = ["open", "high", "low", "close", "volume"]
+_ALIGN = 64
+
+def _align(n: int) -> int:
+    return (n + _ALIGN - 1) // _ALIGN * _ALIGN
+
+def find_kline_csv(data_dir: str, symbol: str, interval: str, contract_type: str = None) -> str:
+    """
+    Locate the CSV for symbol/interval in data_dir. Tries
+    {symbol}_{contract_type}_{interval}.csv, then {symbol}_{interval}.csv,
+    then any {symbol}_*_{interval}.csv.
+    """
+    candidates = []
+    if contract_type:
+        candidates.append(os.path.join(data_dir, f"{symbol}_{contract_type}_{interval}.csv"))
+    candidates.append(os.path.join(data_dir, f"{symbol}_{interval}.csv"))
+    for path in candidates:
+        if os.path.isfile(path):
+            return path
+    matches = sorted(glob.glob(os.path.join(data_dir, f"{symbol}_*_{interval}.csv")))
+    if matches:
+        return matches[0]
+    raise FileNotFoundError(f"No OHLC CSV for {symbol} {interval} in {data_dir}")
+
+def kline_cache_path(csv_path: str, cache_dir: str = None) -> str:
+    cache_dir = cache_dir or os.path.join(os.path.dirname(csv_path), CACHE_DIRNAME)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(cache_dir, f"{stem}.bin")
+
+def _source_stamp(csv_path: str) -> Tuple[int, int]:
+    st = os.stat(csv_path)
+    return st.st_size, st.st_mtime_ns
+
+def build_kline_cache(csv_path: str, cache_path: str = None, price_dtype: str = "float64") -> str:
+    """
+    Parse csv_path once and write it as a binary columnar file (sorted by
+    open_time). The file is written to a temp name and renamed into place,
+    so readers never see a partial cache.
+    """
+    cache_path = cache_path or kline_cache_path(csv_path)
+    size, mtime_ns = _source_stamp(csv_path)
+
+    df = pd.read_csv(csv_path, parse_dates=["open_time"])
+    df.sort_values("open_time", inplace=True)
+    df.reset_index(drop=True, inplace=True)
+
+    arrays = {"open_time": df["open_time"].to_numpy(dtype="datetime64[ns]").view(np.int64)}
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            arrays[col] = df[col].to_numpy(dtype=price_dtype)
+
+    # Column offsets are relative to the start of the data section
+    columns, offset = [], 0
+    for name, arr in arrays.items():
+        columns.append({"name": name, "dtype": arr.dtype.str, "offset": offset})
+        offset = _align(offset + arr.nbytes)
+
+    header = json.dumps({
+        "n_rows": len(df),
+        "columns": columns,
+        "time_unit": "ns",
+        "source_size": size,
+        "source_mtime_ns": mtime_ns,
+    }).encode()
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for col, arr in zip(columns, arrays.values()):
+            f.seek(data_start + col["offset"])
+            f.write(np.ascontiguousarray(arr).tobytes())
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+def _read_header(cache_path: str) -> Tuple[dict, int]:
+    with open(cache_path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"Not a kline cache file: {cache_path}")
+        header_len = int(np.frombuffer(f.read(8), dtype=np.uint64)[0])
+        meta = json.loads(f.read(header_len))
+    return meta, _align(len(MAGIC) + 8 + header_len)
+
+def _is_fresh(csv_path: str, cache_path: str) -> bool:
+    if not os.path.isfile(cache_path):
+        return False
+    try:
+        meta, _ = _read_header(cache_path)
+    except (ValueError, OSError, json.JSONDecodeError):
+        return False
+    size, mtime_ns = _source_stamp(csv_path)
+    return meta.get("source_size") == size and meta.get("source_mtime_ns") == mtime_ns
+
+def open_klines(csv_path: str, cache_dir: str = None) -> Tuple[dict, Dict[str, np.ndarray]]:
+    """
+    Memory-map the cached columns for csv_path, (re)building the cache first
+    if it is missing or stale. Returns (meta, {column: read-only array});
+    open_time is int64 epoch nanoseconds.
+    """
+    if not os.path.isfile(csv_path):
+        raise FileNotFoundError(f"Missing historical CSV: {csv_path}")
+    cache_path = kline_cache_path(csv_path, cache_dir)
+    if not _is_fresh(csv_path, cache_path):
+        build_kline_cache(csv_path, cache_path)
+
+    meta, data_start = _read_header(cache_path)
+    n = meta["n_rows"]
+    columns = {}
+    if n:
+        mm = np.memmap(cache_path, dtype=np.uint8, mode="r")
+        for col in meta["columns"]:
+            dtype = np.dtype(col["dtype"])
+            start = data_start + col["offset"]
+            columns[col["name"]] = mm[start:start + n * dtype.itemsize].view(dtype)
+    else:
+        for col in meta["columns"]:
+            columns[col["name"]] = np.empty(0, dtype=np.dtype(col["dtype"]))
+    return meta, columns
+
+def read_klines(csv_path: str, cache_dir: str = None, columns: Optional[list] = None) -> pd.DataFrame:
+    """
+    Drop-in for pd.read_csv(csv_path, parse_dates=["open_time"]) sorted by
+    open_time, served from the binary cache. The frame owns its data (a plain
+    copy of the mapped columns), so callers may modify it freely.
+    """
+    _, cols = open_klines(csv_path, cache_dir)
+    names = columns or list(cols)
+    data = {}
+    for name in names:
+        if name == "open_time":
+            data[name] = cols[name].astype("datetime64[ns]")
+        else:
+            data[name] = np.array(cols[name])
+    return pd.DataFrame(data)
@@ -0,0 +1,138 @@
+# TRD_BOT_V3/src/utils/kline_window.py
+
+import numpy as np
+import pandas as pd
+from typing import Dict
+
+class _ILoc:
+    """Positional indexer mirroring pandas `.iloc` for the window classes below."""
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    def __getitem__(self, key):
+        return self._owner._take(key)
+
+
+class ColumnView:
+    """
+    Read-only, zero-copy view over one kline column.
+    Supports the subset of pd.Series used by the strategies:
+    `.iloc[...]`, `.mean()`, `.std()`, `len()`, element-wise arithmetic and
+    `.to_numpy()`.
+    """
+    __slots__ = ("values",)
+
+    def __init__(self, values: np.ndarray):
+        self.values = values
+
+    @property
+    def iloc(self) -> _ILoc:
+        return _ILoc(self)
+
+    def _take(self, key):
+        out = self.values[key]
+        if isinstance(out, np.ndarray):
+            return ColumnView(out)
+        return pd.Timestamp(out) if isinstance(out, np.datetime64) else out.item()
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def __array__(self, dtype=None, copy=None):
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def to_numpy(self, dtype=None) -> np.ndarray:
+        return self.values if dtype is None else self.values.astype(dtype)
+
+    def mean(self) -> float:
+        return float(self.values.mean()) if len(self.values) else float("nan")
+
+    def std(self, ddof: int = 1) -> float:
+        # pandas default ddof=1
+        return float(self.values.std(ddof=ddof)) if len(self.values) > ddof else float("nan")
+
+    def min(self) -> float:
+        return float(self.values.min())
+
+    def max(self) -> float:
+        return float(self.values.max())
+
+    def _binop(self, other, op):
+        other = other.values if isinstance(other, ColumnView) else other
+        return ColumnView(op(self.values, other))
+
+    def __add__(self, other):
+        return self._binop(other, np.add)
+
+    def __sub__(self, other):
+        return self._binop(other, np.subtract)
+
+    def __mul__(self, other):
+        return self._binop(other, np.multiply)
+
+    def __truediv__(self, other):
+        return self._binop(other, np.divide)
+
+
+class KlineWindow:
+    """
+    Lightweight, frame-like window over preconverted kline column arrays.
+    `window["close"]` returns a ColumnView and `window.iloc[-n:]` a narrower
+    KlineWindow; neither copies data. Call to_frame() when a real DataFrame
+    is required.
+    """
+    __slots__ = ("_columns", "_start", "_stop")
+
+    def __init__(self, columns: Dict[str, np.ndarray], start: int, stop: int):
+        self._columns = columns
+        self._start = start
+        self._stop = stop
+
+    @property
+    def columns(self) -> list:
+        return list(self._columns)
+
+    @property
+    def iloc(self) -> _ILoc:
+        return _ILoc(self)
+
+    def _take(self, key):
+        if not isinstance(key, slice):
+            raise TypeError("KlineWindow.iloc only supports slices")
+        start, stop, step = key.indices(self._stop - self._start)
+        if step != 1:
+            raise ValueError("KlineWindow.iloc does not support a step")
+        return KlineWindow(self._columns, self._start + start, self._start + max(start, stop))
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, list):
+            return KlineWindow({k: self._columns[k] for k in key}, self._start, self._stop)
+        return ColumnView(self._columns[key][self._start:self._stop])
+
+    def __contains__(self, key) -> bool:
+        return key in self._columns
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the window as a DataFrame with a fresh 0..n-1 index."""
+        return pd.DataFrame({k: v[self._start:self._stop] for k, v in self._columns.items()})
+
+
+def readonly_columns(df: pd.DataFrame, columns) -> Dict[str, np.ndarray]:
+    """
+    Convert `columns` of df once to contiguous, read-only NumPy arrays
+    (datetime64[ns] for open_time, float64 otherwise).
+    """
+    out = {}
+    for col in columns:
+        if col == "open_time":
+            arr = np.array(df[col].to_numpy(dtype="datetime64[ns]"))
+        else:
+            arr = np.ascontiguousarray(df[col].to_numpy(dtype=np.float64)).copy()
+        arr.setflags(write=False)
+        out[col] = arr
+    return out
@@ -0,0 +1,199 @@
+# TRD_BOT_V3/src/utils/metrics.py
+
+import bisect
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# ──────────────────────────────────────────────────────────────────────────────
+# In-process latency histograms and error counters for the live loop.
+#
+# Series are keyed by a name ("exchange", "strategy.run", "loop.lag", ...)
+# plus labels (call, symbol, ...). Histograms use fixed log-spaced buckets
+# (10 per decade, 10µs–100s), so recording is a bisect and an increment and
+# p50/p95/p99 come out within one bucket (~26%). The exporter writes a JSON
+# snapshot (per series and rolled up across symbols) every interval.
+# ──────────────────────────────────────────────────────────────────────────────
+
+BUCKET_BOUNDS = [1e-5 * 10 ** (i / 10) for i in range(71)]   # seconds, upper bounds
+
+class LatencyHistogram:
+    """Counts of observations per bucket, plus count/sum/max (not thread-safe)."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)   # last one: above 100s
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(BUCKET_BOUNDS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def merge(self, other: "LatencyHistogram"):
+        self.buckets = [a + b for a, b in zip(self.buckets, other.buckets)]
+        self.count += other.count
+        self.errors += other.errors
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (capped at the max seen)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                bound = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else self.max
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        ms = 1000.0
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": round(self.total / self.count * ms, 3) if self.count else 0.0,
+            "p50_ms": round(self.quantile(0.50) * ms, 3),
+            "p95_ms": round(self.quantile(0.95) * ms, 3),
+            "p99_ms": round(self.quantile(0.99) * ms, 3),
+            "max_ms": round(self.max * ms, 3),
+        }
+
+class MetricsRegistry:
+    """Thread-safe collection of histograms keyed by (name, sorted labels)."""
+
+    def __init__(self):
+        self._series: Dict[Tuple, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+        self._exporter = None
+        self._stop = threading.Event()
+
+    def _get(self, name: str, labels: dict) -> LatencyHistogram:
+        key = (name, tuple(sorted(labels.items())))
+        hist = self._series.get(key)
+        if hist is None:
+            hist = self._series.setdefault(key, LatencyHistogram())
+        return hist
+
+    def observe(self, name: str, seconds: float, error: bool = False, **labels):
+        with self._lock:
+            hist = self._get(name, labels)
+            hist.observe(seconds)
+            if error:
+                hist.errors += 1
+
+    @contextmanager
+    def timed(self, name: str, **labels):
+        """Time the block; an exception counts as an error (and is re-raised)."""
+        started = time.perf_counter()
+        error = False
+        try:
+            yield
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, error=error, **labels)
+
+    def snapshot(self) -> dict:
+        """
+        {"time", "series": [...], "rollup": [...]}: one entry per series, and
+        per name+call summed over symbols.
+        """
+        with self._lock:
+            items = [(k, h) for k, h in self._series.items()]
+            series, rollup = [], {}
+            for (name, labels), hist in items:
+                labels = dict(labels)
+                series.append({"name": name, "labels": labels, **hist.summary()})
+                key = (name, tuple(sorted((k, v) for k, v in labels.items() if k != "symbol")))
+                rollup.setdefault(key, LatencyHistogram()).merge(hist)
+        return {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "series": sorted(series, key=lambda s: (s["name"], sorted(s["labels"].items()))),
+            "rollup": [{"name": name, "labels": dict(labels), **hist.summary()}
+                       for (name, labels), hist in sorted(rollup.items())],
+        }
+
+    def write(self, path: str):
+        """Write the snapshot as JSON (atomically)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+    def start_exporter(self, path: str, interval_seconds: float = 60.0):
+        """Write the snapshot to `path` every interval on a background thread."""
+        self._stop.clear()
+        def loop():
+            while not self._stop.wait(interval_seconds):
+                try:
+                    self.write(path)
+                except OSError as e:
+                    logging.error(f"Metrics export to {path} failed: {e}")
+        self._exporter = threading.Thread(target=loop, name="metrics-exporter", daemon=True)
+        self._exporter.start()
+
+    def stop_exporter(self, path: str = None):
+        """Stop the exporter (writing a final snapshot to `path` if given)."""
+        self._stop.set()
+        if self._exporter is not None:
+            self._exporter.join()
+        if path:
+            self.write(path)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+# Process-wide registry used by the decorators below
+METRICS = MetricsRegistry()
+
+def _symbol_of(args, kwargs) -> str:
+    symbol = kwargs.get("symbol")
+    if symbol is None and args and isinstance(args[0], str):
+        symbol = args[0]
+    return symbol or "-"
+
+def _timed_method(component: str, call: str, fn):
+    @functools.wraps(fn)
+    def timed_fn(self, *args, **kwargs):
+        with METRICS.timed(component, call=call, symbol=_symbol_of(args, kwargs)):
+            return fn(self, *args, **kwargs)
+    return timed_fn
+
+def timed_methods(component: str):
+    """
+    Class decorator: time every public method defined on the class as
+    METRICS series `component` with labels call=<method> and symbol=<the
+    symbol argument, if any>.
+    """
+    def wrap(cls):
+        for attr, fn in list(vars(cls).items()):
+            if attr.startswith("_") or not callable(fn) or isinstance(fn, (staticmethod, classmethod, type)):
+                continue
+            setattr(cls, attr, _timed_method(component, attr, fn))
+        return cls
+    return wrap
+
+def timed(name: str):
+    """Method decorator: time each call as METRICS series `name`."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        def timed_fn(*args, **kwargs):
+            with METRICS.timed(name):
+                return fn(*args, **kwargs)
+        return timed_fn
+    return wrap
@@ -0,0 +1,179 @@
+# TRD_BOT_V3/src/utils/order_ladder.py
+
+import logging
+import uuid
+from typing import Dict, List
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Keeps a ladder of resting LIMIT orders in line with a desired grid using the
+# fewest requests: open orders that already sit at a wanted level (same side,
+# price within tolerance, same quantity) stay on the book, the others are
+# cancelled and the missing levels created, both in batches.
+# Only orders whose clientOrderId carries the ladder's tag are considered, so
+# manual orders on the same symbol are never touched.
+# Prices and quantities are always rounded to the symbol's exchange filters
+# (tick size, quantity step), which the ladder therefore requires. The ladder
+# remembers the orders it left resting; one that has gone from the book by
+# the next refresh without the ladder cancelling it is looked up by id and
+# reported as filled (it executed, fully or partly) or removed (cancelled or
+# expired elsewhere).
+# ──────────────────────────────────────────────────────────────────────────────
+
+def round_step(value: float, step: float) -> float:
+    """value rounded to a multiple of step (> 0)."""
+    if not step or step <= 0:
+        raise ValueError(f"Invalid rounding step: {step!r}")
+    return round(round(value / step) * step, 12)
+
+def diff_ladder(desired: List[Dict], open_orders: List[Dict],
+                price_tolerance: float, qty_tolerance: float = 0.01):
+    """
+    Match open orders against desired levels ({"side", "price", "qty"[, "positionSide"]}).
+    Returns (keep, cancel, create):
+      - keep:   open orders that satisfy a desired level
+      - cancel: open orders that satisfy none
+      - create: desired levels with no matching open order
+    Each open order satisfies at most one level (the nearest in price).
+    """
+    unmatched = list(open_orders)
+    keep, create = [], []
+    for level in sorted(desired, key=lambda l: l["price"]):
+        best, best_dist = None, None
+        for order in unmatched:
+            if order["side"] != level["side"]:
+                continue
+            if order.get("positionSide", "BOTH") != (level.get("positionSide") or "BOTH"):
+                continue
+            dist = abs(float(order["price"]) - level["price"])
+            if dist > price_tolerance:
+                continue
+            if abs(float(order["origQty"]) - level["qty"]) > qty_tolerance * level["qty"]:
+                continue
+            if best is None or dist < best_dist:
+                best, best_dist = order, dist
+        if best is None:
+            create.append(level)
+        else:
+            unmatched.remove(best)
+            keep.append(best)
+    return keep, unmatched, create
+
+class OrderLadder:
+    """
+    Resting-order ladder for one symbol.
+
+    client: needs get_open_orders(symbol), get_order(symbol, orderId),
+    place_orders(orders) and cancel_orders(symbol, order_ids) (see FuturesClient).
+    tag: clientOrderId prefix marking this ladder's orders.
+    tick_size / qty_step: exchange filters (required); prices and quantities
+    are rounded to them before diffing, so an order placed last tick compares
+    equal to the same level this tick and nothing off-filter is sent.
+    """
+
+    def __init__(self, client, symbol: str, tag: str = "grid",
+                 tick_size: float = None, qty_step: float = None,
+                 qty_tolerance: float = 0.01):
+        if not tick_size or not qty_step or tick_size <= 0 or qty_step <= 0:
+            raise ValueError(f"OrderLadder {symbol}: tick_size and qty_step are required "
+                             f"(got tick_size={tick_size!r}, qty_step={qty_step!r})")
+        self.client = client
+        self.symbol = symbol
+        self.prefix = f"{tag}_"
+        self.tick_size = tick_size
+        self.qty_step = qty_step
+        self.qty_tolerance = qty_tolerance
+        # Orders left resting by the last sync, by orderId
+        self._resting: Dict[str, Dict] = {}
+
+    def open_orders(self) -> List[Dict]:
+        """This ladder's open orders (one get_open_orders call)."""
+        return [o for o in self.client.get_open_orders(self.symbol)
+                if str(o.get("clientOrderId", "")).startswith(self.prefix)]
+
+    def refresh(self) -> Dict:
+        """
+        This ladder's open orders and what became of the orders the last sync
+        left resting: {"open", "filled", "removed"}. filled/removed hold the
+        orders as get_order returns them; an order whose lookup fails is
+        looked up again on the next refresh.
+        """
+        open_orders = self.open_orders()
+        open_ids = {str(o["orderId"]) for o in open_orders}
+        filled, removed, unresolved = [], [], {}
+        for oid, order in self._resting.items():
+            if oid in open_ids:
+                continue
+            try:
+                order = self.client.get_order(self.symbol, order["orderId"])
+            except Exception as e:
+                logging.warning(f"OrderLadder {self.symbol}: lookup of order {oid} failed: {e}")
+                unresolved[oid] = order
+                continue
+            (filled if float(order.get("executedQty", 0)) > 0 else removed).append(order)
+        self._resting = {**unresolved, **{str(o["orderId"]): o for o in open_orders}}
+        return {"open": open_orders, "filled": filled, "removed": removed}
+
+    def _order_params(self, level: Dict) -> Dict:
+        return {
+            "symbol": self.symbol,
+            "side": level["side"],
+            "type": "LIMIT",
+            "quantity": level["qty"],
+            "price": level["price"],
+            "timeInForce": "GTC",
+            "positionSide": level.get("positionSide"),
+            # clientOrderId: at most 36 chars
+            "newClientOrderId": self.prefix + uuid.uuid4().hex[:20],
+        }
+
+    def sync(self, desired: List[Dict], price_tolerance: float = 0.0, book: Dict = None) -> Dict:
+        """
+        Make the book match `desired` with the minimal set of cancels and creates.
+        book: the result of a refresh() just made (one is made otherwise).
+        Returns {"kept", "cancelled", "created", "filled", "removed", "errors"}:
+          - filled / removed: as refresh() reports them
+          - errors: rejected orders, logged (the next sync retries them)
+        """
+        levels = []
+        for level in desired:
+            qty = round_step(level["qty"], self.qty_step)
+            if qty > 0:
+                levels.append(dict(level, price=round_step(level["price"], self.tick_size), qty=qty))
+
+        book = self.refresh() if book is None else book
+        keep, cancel, create = diff_ladder(levels, book["open"], price_tolerance, self.qty_tolerance)
+        resting = self._resting
+
+        errors = []
+        cancelled = created = 0
+        # Cancel first, so the margin they hold is free for the new orders
+        if cancel:
+            for r in self.client.cancel_orders(self.symbol, [o["orderId"] for o in cancel]):
+                if "orderId" in r:
+                    cancelled += 1
+                    resting.pop(str(r["orderId"]), None)
+                else:
+                    errors.append(r)
+        if create:
+            for r in self.client.place_orders([self._order_params(l) for l in create]):
+                if "orderId" in r:
+                    created += 1
+                    resting[str(r["orderId"])] = r
+                else:
+                    errors.append(r)
+        for e in errors:
+            logging.error(f"OrderLadder {self.symbol}: {e.get('code')} {e.get('msg')}")
+
+        return {"kept": len(keep), "cancelled": cancelled, "created": created,
+                "filled": book["filled"], "removed": book["removed"], "errors": errors}
+
+    def cancel_all(self) -> int:
+        """Cancel every order of this ladder; returns how many were cancelled."""
+        ids = [o["orderId"] for o in self.open_orders()]
+        if not ids:
+            return 0
+        results = self.client.cancel_orders(self.symbol, ids)
+        for r in results:
+            if "orderId" in r:
+                self._resting.pop(str(r["orderId"]), None)
+        return sum(1 for r in results if "orderId" in r)
@@ -1,55 +1,240 @@
 # TRD_BOT_V3/src/utils/position_manager.py
 
 import json
+import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
 from typing import Dict
 
+from utils.metrics import timed
+from utils.state_journal import JournalStore, _write_json_atomic
+
 class PositionManager:
     """
     Tracks open orders and positions via a JSON on disk.
     On startup or periodically, calls Binance to reconcile
     which orders filled and which positions remain.
+    Safe to share between strategy threads: state changes and writes are
+    serialized by a lock, exchange calls are made outside it.
+
+    batch_reconcile=True (default): reconcile() fetches all open orders and
+    all positions with one call each and reuses that snapshot for
+    snapshot_ttl seconds, so every strategy reconciling in the same cycle
+    shares it. batch_reconcile=False keeps the per-symbol calls.
+
+    storage="journal" (default): each change appends one line to
+    {filepath}.journal, which is folded into {filepath} in the background
+    (see utils.state_journal); storage="json" rewrites {filepath} on every
+    change (atomically). Both read existing positions.json files as-is.
+    fsync: make every change durable before returning; wrap several changes
+    in `with pm.batch():` to pay for one fsync.
     """
-    def __init__(self, filepath: str = "state/positions.json"):
+    def __init__(self, filepath: str = "state/positions.json",
+                 batch_reconcile: bool = True, snapshot_ttl: float = 5.0,
+                 storage: str = "journal", fsync: bool = True):
         self.filepath = filepath
+        if storage not in ("journal", "json"):
+            raise ValueError(f"Unknown storage backend: {storage}")
+        self.fsync = fsync
+        self._lock = threading.RLock()
+        self.batch_reconcile = batch_reconcile
+        self.snapshot_ttl = snapshot_ttl
+        # Exchange snapshot shared by reconcile() calls within snapshot_ttl
+        self._snapshot = None
+        self._snapshot_lock = threading.Lock()
+        # When each record was (re)written locally; a snapshot taken before
+        # that cannot know about the order yet
+        self._recorded_at: Dict[str, float] = {}
+        self._batch_depth = 0
+        self._dirty = False
         os.makedirs(os.path.dirname(filepath), exist_ok=True)
 
-        if os.path.isfile(self.filepath):
-            with open(self.filepath, "r") as f:
-                self.state: Dict[str, Dict] = json.load(f)
+        if storage == "journal":
+            self._store = JournalStore(filepath, fsync=fsync)
+            self.state: Dict[str, Dict] = self._store.load()
         else:
-            self.state = {}
-            self._save()
+            self._store = None
+            if os.path.isfile(self.filepath):
+                with open(self.filepath, "r") as f:
+                    self.state = json.load(f)
+            else:
+                self.state = {}
+                self._save()
 
+    @timed("position_manager.save")
     def _save(self):
-        with open(self.filepath, "w") as f:
-            json.dump(self.state, f, indent=2)
+        """Rewrite the whole state file (json storage)."""
+        with self._lock:
+            _write_json_atomic(self.filepath, self.state, fsync=self.fsync)
+
+    @timed("position_manager.persist")
+    def _persist(self, symbol: str):
+        """Record the current state of `symbol` (call with the lock held)."""
+        if self._store is not None:
+            if symbol in self.state:
+                self._store.set(symbol, self.state[symbol])
+            else:
+                self._store.delete(symbol)
+        elif self._batch_depth:
+            self._dirty = True
+        else:
+            self._save()
+
+    @contextmanager
+    def batch(self):
+        """Group several changes into one write/fsync."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                if self._store is not None:
+                    with self._store.batch():
+                        yield self
+                else:
+                    yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0 and self._dirty:
+                    self._dirty = False
+                    self._save()
+
+    def close(self):
+        """Flush and close the journal (no-op for json storage)."""
+        if self._store is not None:
+            self._store.close()
 
     def add_order(self, symbol: str, order_id: str, side: str):
         """
         Record a newly placed order for `symbol`.
         side = "BUY" or "SELL". Status starts as "OPEN".
         """
-        self.state[symbol] = {
-            "order_id": str(order_id),
-            "side": side,
-            "status": "OPEN"
-        }
-        self._save()
+        with self._lock:
+            self.state[symbol] = {
+                "order_id": str(order_id),
+                "side": side,
+                "status": "OPEN"
+            }
+            self._recorded_at[symbol] = time.monotonic()
+            self._persist(symbol)
+
+    def record_fills(self, symbol: str, orders: list):
+        """
+        Record that orders of `symbol` executed (e.g. a batch of ladder fills)
+        as one FILLED record for the latest of them; reconcile() clears it
+        once the position is flat.
+        """
+        if not orders:
+            return
+        latest = max(orders, key=lambda o: int(o.get("updateTime", 0)))
+        with self._lock:
+            self.state[symbol] = {
+                "order_id": str(latest["orderId"]),
+                "side": latest["side"],
+                "status": "FILLED",
+                "fills": len(orders)
+            }
+            self._recorded_at[symbol] = time.monotonic()
+            self._persist(symbol)
 
     def mark_filled(self, symbol: str):
         """Mark the recorded order for `symbol` as FILLED."""
-        if symbol in self.state:
-            self.state[symbol]["status"] = "FILLED"
-            self._save()
+        with self._lock:
+            if symbol in self.state:
+                self.state[symbol]["status"] = "FILLED"
+                self._persist(symbol)
 
     def clear(self, symbol: str):
         """Remove any record for `symbol` (e.g., order canceled or position closed)."""
-        if symbol in self.state:
-            del self.state[symbol]
-            self._save()
+        with self._lock:
+            if symbol in self.state:
+                del self.state[symbol]
+                self._persist(symbol)
 
+    @timed("position_manager.reconcile")
     def reconcile(self, client):
+        """
+        Bring recorded orders in line with the exchange: batched (one
+        open-orders call, one positions call, shared per cycle) or one
+        symbol at a time, depending on batch_reconcile.
+        """
+        with self._lock:
+            if not self.state:
+                return
+        if self.batch_reconcile:
+            self._reconcile_batched(client)
+        else:
+            self._reconcile_per_symbol(client)
+
+    def _exchange_snapshot(self, client):
+        """
+        {"taken_at", "open_orders": {symbol: {orderId, ...}}, "positions": {symbol: amt},
+         "legs": {symbol: {positionSide: signed amt}}}
+        fetched at most once per snapshot_ttl; concurrent callers wait for
+        the one fetch in progress. Returns None if the exchange calls fail.
+        """
+        with self._snapshot_lock:
+            snap = self._snapshot
+            if snap is not None and time.monotonic() - snap["taken_at"] < self.snapshot_ttl:
+                return snap
+            taken_at = time.monotonic()
+            try:
+                orders = client.get_open_orders()
+                positions = client.get_account_positions()
+            except Exception as e:
+                logging.error(f"PositionManager: reconcile snapshot failed: {e}")
+                return None
+
+            open_orders: Dict[str, set] = {}
+            for o in orders:
+                open_orders.setdefault(o["symbol"], set()).add(str(o["orderId"]))
+            # Hedge mode lists LONG and SHORT separately; any nonzero leg counts
+            position_amt: Dict[str, float] = {}
+            legs: Dict[str, Dict[str, float]] = {}
+            for p in positions:
+                signed = float(p.get("positionAmt", 0))
+                position_amt[p["symbol"]] = position_amt.get(p["symbol"], 0.0) + abs(signed)
+                leg = legs.setdefault(p["symbol"], {})
+                side = p.get("positionSide", "BOTH")
+                leg[side] = leg.get(side, 0.0) + signed
+            self._snapshot = {"taken_at": taken_at, "open_orders": open_orders,
+                              "positions": position_amt, "legs": legs}
+            return self._snapshot
+
+    def position_legs(self, client, symbol: str):
+        """
+        Signed position per positionSide ("BOTH", or "LONG"/"SHORT" in hedge
+        mode) of `symbol`, from the shared exchange snapshot; None if the
+        exchange could not be queried.
+        """
+        snap = self._exchange_snapshot(client)
+        return None if snap is None else dict(snap["legs"].get(symbol, {}))
+
+    def invalidate_snapshot(self):
+        """Force the next reconcile() to query the exchange again."""
+        with self._snapshot_lock:
+            self._snapshot = None
+
+    def _reconcile_batched(self, client):
+        snap = self._exchange_snapshot(client)
+        if snap is None:
+            return  # keep records as they are rather than acting on missing data
+
+        with self.batch():
+            for symbol, record in list(self.state.items()):
+                if self._recorded_at.get(symbol, 0.0) > snap["taken_at"]:
+                    continue  # placed after the snapshot was taken
+                if record["order_id"] in snap["open_orders"].get(symbol, ()):
+                    continue
+                if snap["positions"].get(symbol, 0.0) != 0:
+                    if record.get("status") != "FILLED":
+                        record["status"] = "FILLED"
+                        self._persist(symbol)
+                else:
+                    del self.state[symbol]
+                    self._persist(symbol)
+
+    def _reconcile_per_symbol(self, client):
         """
         Check each recorded order against Binance:
          1) If still in open orders → leave as is.
@@ -59,7 +244,10 @@ class PositionManager:
           - client.get_open_orders(symbol) → list of orders
           - client.get_account_positions() → list of positions like {"symbol": "...", "positionAmt": "..."}
         """
-        for symbol, record in list(self.state.items()):
+        with self._lock:
+            records = list(self.state.items())
+
+        for symbol, record in records:
             order_id = record["order_id"]
 
             # 1) Check if order is still open
@@ -79,14 +267,17 @@ class PositionManager:
                 positions = []
 
             pos = next((p for p in positions if p["symbol"] == symbol), None)
-            if pos and float(pos.get("positionAmt", 0)) != 0:
-                # A position remains → mark as FILLED
-                self.state[symbol]["status"] = "FILLED"
-                self._save()
-            else:
-                # No order and no position → remove record
-                del self.state[symbol]
-                self._save()
+            with self._lock:
+                # Another thread may have replaced the record meanwhile
+                if self.state.get(symbol) is not record:
+                    continue
+                if pos and float(pos.get("positionAmt", 0)) != 0:
+                    # A position remains → mark as FILLED
+                    self.state[symbol]["status"] = "FILLED"
+                else:
+                    # No order and no position → remove record
+                    del self.state[symbol]
+                self._persist(symbol)
 
     def is_in_position(self, symbol: str) -> bool:
         """Return True if `symbol` has status == 'FILLED' in state."""
@@ -0,0 +1,63 @@
+# TRD_BOT_V3/src/utils/price_snapshot.py
+
+import threading
+import time
+from typing import Callable, Dict
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Shared mark-price snapshot for live strategies. All symbols are fetched in
+# one symbol-less request (GET /fapi/v1/premiumIndex) and kept in a dict
+# indexed by symbol; every strategy reads from it until it is older than the
+# staleness bound. With the runtime ticking all strategies on the same
+# boundary, that is one price request per tick instead of one per strategy.
+# ──────────────────────────────────────────────────────────────────────────────
+
+class MarkPriceSnapshot:
+    """
+    fetch_all() must return the premiumIndex entries of all symbols
+    (dicts with "symbol", "markPrice" and "time").
+    max_age: seconds a snapshot may be served before it is refreshed.
+    Concurrent callers needing a refresh share one request.
+    """
+
+    def __init__(self, fetch_all: Callable, max_age: float = 5.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.fetch_all = fetch_all
+        self.max_age = max_age
+        self.clock = clock
+        self.prices: Dict[str, Dict] = {}   # symbol → {"price", "time" (exchange ms)}
+        self.fetched_at = None
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0}
+
+    def age(self) -> float:
+        """Seconds since the last refresh (inf before the first one)."""
+        return float("inf") if self.fetched_at is None else self.clock() - self.fetched_at
+
+    def refresh(self):
+        """Replace the snapshot with a fresh one (one request)."""
+        entries = self.fetch_all()
+        if isinstance(entries, dict):
+            entries = [entries]
+        fetched_at = self.clock()
+        self.prices = {e["symbol"]: {"price": float(e["markPrice"]), "time": int(e.get("time", 0))}
+                       for e in entries}
+        self.fetched_at = fetched_at
+        self.stats["requests"] += 1
+
+    def get(self, symbol: str, max_age: float = None) -> float:
+        """
+        Mark price of `symbol` from a snapshot no older than max_age
+        (default: self.max_age), refreshing it first if needed.
+        Raises KeyError if the exchange does not list the symbol.
+        """
+        max_age = self.max_age if max_age is None else max_age
+        with self._lock:
+            if self.age() > max_age:
+                self.refresh()
+            else:
+                self.stats["hits"] += 1
+            try:
+                return self.prices[symbol]["price"]
+            except KeyError:
+                raise KeyError(f"No mark price for {symbol}")
@@ -1,9 +1,10 @@
 # TRD_BOT_V3/src/utils/risk_management.py
 
-import os
 import pandas as pd
 from typing import Dict, List
 
+from utils.kline_store import find_kline_csv, read_klines
+
 class RiskManager:
     """
     • Computes rolling correlations among symbols.
@@ -23,18 +24,17 @@ class RiskManager:
 
     def _load_price_series(self, symbol: str, interval: str, lookback: int) -> pd.Series:
         """
-        Loads the last `lookback` closes from CSV.
-        Assumes file named "{symbol}_{interval}.csv" in data_dir, with columns:
+        Loads the last `lookback` closes from CSV (via the binary kline cache).
+        Looks for "{symbol}_{interval}.csv" or "{symbol}_*_{interval}.csv" in
+        data_dir, with columns:
           open_time, open, high, low, close, volume
         Returns a pd.Series of the last `lookback` close prices.
         """
         key = f"{symbol}_{interval}"
         if key not in self.history_cache:
-            path = os.path.join(self.data_dir, f"{symbol}_{interval}.csv")
-            df = pd.read_csv(path, parse_dates=["open_time"])
-            # Ensure sorted by time
-            df = df.sort_values("open_time").reset_index(drop=True)
-            self.history_cache[key] = df
+            path = find_kline_csv(self.data_dir, symbol, interval)
+            # Already sorted by open_time
+            self.history_cache[key] = read_klines(path)
         df = self.history_cache[key]
         return df["close"].iloc[-lookback:].reset_index(drop=True)
 
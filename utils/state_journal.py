@@ -0,0 +1,173 @@
+# TRD_BOT_V3/src/utils/state_journal.py
+
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Append-only journal for small key → JSON-value state (e.g. PositionManager).
+#
+# Files:
+#   {path}            compacted snapshot: a plain JSON object (indent=2), so
+#                     state files written before the journal existed load as-is
+#   {path}.journal    one JSON line per mutation: {"op": "set"|"del", "key", "value"}
+#   {path}.journal.1  journal being folded into the snapshot by compaction
+#
+# Recovery = snapshot, then replay .journal.1 and .journal. Replaying a "set"
+# or "del" twice gives the same result, so a crash at any point during
+# compaction recovers correctly; a torn last line (crash mid-append) is
+# ignored.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _write_json_atomic(path: str, data: dict, fsync: bool = True):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2)
+        f.flush()
+        if fsync:
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def _replay(path: str, state: dict) -> int:
+    """Apply journal lines from path to state; returns the number applied."""
+    if not os.path.isfile(path):
+        return 0
+    applied = 0
+    with open(path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Ignoring torn journal line in {path}")
+                break
+            if entry["op"] == "set":
+                state[entry["key"]] = entry["value"]
+            else:
+                state.pop(entry["key"], None)
+            applied += 1
+    return applied
+
+class JournalStore:
+    """
+    Durable dict: load() recovers it, set()/delete() append one line each.
+
+    fsync: flush every mutation to disk (skipped inside batch(), which
+    fsyncs once at the end).
+    compact_every: after this many journal lines, fold the journal into the
+    snapshot on a background thread.
+    """
+
+    def __init__(self, path: str, fsync: bool = True, compact_every: int = 1000):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.pending_path = f"{path}.journal.1"
+        self.fsync = fsync
+        self.compact_every = compact_every
+        self._lock = threading.RLock()
+        self._journal = None
+        self._lines = 0
+        self._batch_depth = 0
+        self._compactor = None
+        self.state: Dict[str, dict] = {}
+
+    def load(self) -> Dict[str, dict]:
+        """Recover state from snapshot + journals and open the journal for appends."""
+        with self._lock:
+            state = {}
+            if os.path.isfile(self.path):
+                with open(self.path, "r") as f:
+                    state = json.load(f)
+            had_journal = os.path.isfile(self.pending_path) or os.path.isfile(self.journal_path)
+            self._lines = _replay(self.pending_path, state) + _replay(self.journal_path, state)
+            self.state = state
+            self._journal = open(self.journal_path, "a")
+            if had_journal:
+                # Start from a clean snapshot and an empty journal, so a torn
+                # line from a crash never ends up in front of new appends
+                self.compact(background=False)
+        return self.state
+
+    def _append(self, entry: dict):
+        with self._lock:
+            self._journal.write(json.dumps(entry, separators=(",", ":")) + "\n")
+            self._lines += 1
+            if self._batch_depth == 0:
+                self._sync()
+
+    def _sync(self):
+        self._journal.flush()
+        if self.fsync:
+            os.fsync(self._journal.fileno())
+        if self._lines >= self.compact_every:
+            self.compact(background=True)
+
+    def set(self, key: str, value: dict):
+        with self._lock:
+            self.state[key] = value
+            self._append({"op": "set", "key": key, "value": value})
+
+    def delete(self, key: str):
+        with self._lock:
+            self.state.pop(key, None)
+            self._append({"op": "del", "key": key})
+
+    @contextmanager
+    def batch(self):
+        """Group several mutations into one flush/fsync."""
+        with self._lock:
+            self._batch_depth += 1
+            try:
+                yield self
+            finally:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._sync()
+
+    def compact(self, background: bool = False):
+        """
+        Rotate the journal and write the current state as the new snapshot.
+        The rotation is quick and done under the lock; writing the snapshot
+        happens outside it (on a thread with background=True).
+        """
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            self._journal.flush()
+            self._journal.close()
+            if os.path.isfile(self.pending_path):
+                # Append the live journal to the unfinished one instead of overwriting it
+                with open(self.pending_path, "a") as dst, open(self.journal_path, "r") as src:
+                    dst.write(src.read())
+                os.remove(self.journal_path)
+            else:
+                os.replace(self.journal_path, self.pending_path)
+            self._journal = open(self.journal_path, "a")
+            self._lines = 0
+            snapshot = json.loads(json.dumps(self.state))
+
+        def write():
+            try:
+                _write_json_atomic(self.path, snapshot, fsync=self.fsync)
+                os.remove(self.pending_path)
+            except OSError as e:
+                logging.error(f"Journal compaction of {self.path} failed: {e}")
+
+        if background:
+            self._compactor = threading.Thread(target=write, name="journal-compactor", daemon=True)
+            self._compactor.start()
+        else:
+            write()
+
+    def close(self):
+        with self._lock:
+            if self._compactor is not None:
+                self._compactor.join()
+            if self._journal is not None:
+                self._journal.flush()
+                if self.fsync:
+                    os.fsync(self._journal.fileno())
+                self._journal.close()
+                self._journal = None
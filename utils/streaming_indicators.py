@@ -0,0 +1,366 @@
+# TRD_BOT_V3/src/utils/streaming_indicators.py
+
+import math
+import numpy as np
+from collections import deque
+from typing import Dict
+
+# ──────────────────────────────────────────────────────────────────────────────
+# Incremental indicators with constant cost per bar.
+#
+# Every indicator supports:
+#   update(bar) → append a new bar
+#   revise(bar) → replace the most recent bar (e.g. the still-forming candle)
+#   value       → current value, NaN until enough bars have been seen
+# `bar` is either a number (taken as the close) or a mapping with
+# open/high/low/close/volume keys.
+# Values match the batch kernels in utils.indicator_engine (simple-average
+# ATR/RSI, sample std) up to floating-point rounding.
+# ──────────────────────────────────────────────────────────────────────────────
+
+def _field(bar, source: str) -> float:
+    if not hasattr(bar, "__getitem__"):
+        return float(bar)
+    if source == "range":
+        return float(bar["high"]) - float(bar["low"])
+    return float(bar[source])
+
+
+class RollingMean:
+    """Mean of the last `period` values, via a running sum."""
+
+    def __init__(self, period: int, source: str = "close"):
+        self.period = period
+        self.source = source
+        self._window = deque()
+        self._sum = 0.0
+        self._updates = 0
+
+    def update(self, bar) -> float:
+        x = _field(bar, self.source)
+        self._window.append(x)
+        self._sum += x
+        if len(self._window) > self.period:
+            self._sum -= self._window.popleft()
+        self._updates += 1
+        if self._updates % self.period == 0:
+            # Re-sum now and then so rounding error cannot accumulate
+            self._sum = math.fsum(self._window)
+        return self.value
+
+    def revise(self, bar) -> float:
+        if not self._window:
+            return self.update(bar)
+        x = _field(bar, self.source)
+        self._sum += x - self._window[-1]
+        self._window[-1] = x
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) == self.period
+
+    @property
+    def value(self) -> float:
+        return self._sum / self.period if self.ready else float("nan")
+
+
+class RollingStd:
+    """Sample standard deviation of the last `period` values (windowed Welford)."""
+
+    def __init__(self, period: int, source: str = "close", ddof: int = 1):
+        self.period = period
+        self.source = source
+        self.ddof = ddof
+        self._window = deque()
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._updates = 0
+
+    def _add(self, x: float):
+        n = len(self._window)
+        delta = x - self._mean
+        self._mean += delta / n
+        self._m2 += delta * (x - self._mean)
+
+    def _remove(self, x: float):
+        n = len(self._window)
+        if n == 0:
+            self._mean, self._m2 = 0.0, 0.0
+            return
+        old_mean = self._mean
+        self._mean = (old_mean * (n + 1) - x) / n
+        self._m2 -= (x - old_mean) * (x - self._mean)
+
+    def _resync(self):
+        arr = np.fromiter(self._window, dtype=np.float64, count=len(self._window))
+        self._mean = float(arr.mean()) if len(arr) else 0.0
+        self._m2 = float(((arr - self._mean) ** 2).sum())
+
+    def update(self, bar) -> float:
+        x = _field(bar, self.source)
+        self._window.append(x)
+        self._add(x)
+        if len(self._window) > self.period:
+            self._remove(self._window.popleft())
+        self._updates += 1
+        if self._updates % self.period == 0:
+            self._resync()
+        return self.value
+
+    def revise(self, bar) -> float:
+        if not self._window:
+            return self.update(bar)
+        x = _field(bar, self.source)
+        self._remove(self._window.pop())
+        self._window.append(x)
+        self._add(x)
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return len(self._window) == self.period
+
+    @property
+    def value(self) -> float:
+        if not self.ready or self.period <= self.ddof:
+            return float("nan")
+        return math.sqrt(max(self._m2, 0.0) / (self.period - self.ddof))
+
+
+class EMA:
+    """EMA with span=`period`, seeded with the first value (pandas adjust=False)."""
+
+    def __init__(self, period: int, source: str = "close"):
+        self.period = period
+        self.source = source
+        self.alpha = 2.0 / (period + 1.0)
+        self._value = float("nan")
+        self._prev = float("nan")
+        self._count = 0
+
+    def _step(self, prev: float, x: float) -> float:
+        return x if math.isnan(prev) else (1.0 - self.alpha) * prev + self.alpha * x
+
+    def update(self, bar) -> float:
+        self._prev = self._value
+        self._value = self._step(self._prev, _field(bar, self.source))
+        self._count += 1
+        return self._value
+
+    def revise(self, bar) -> float:
+        if self._count == 0:
+            return self.update(bar)
+        self._value = self._step(self._prev, _field(bar, self.source))
+        return self._value
+
+    @property
+    def ready(self) -> bool:
+        return self._count > 0
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class RSI:
+    """
+    RSI over `period` deltas.
+    method="simple": plain averages of gains/losses (as in the strategies);
+    method="wilder": Wilder smoothing, seeded with the simple average.
+    Returns 100 when there were no losses.
+    """
+
+    def __init__(self, period: int = 14, method: str = "simple", source: str = "close"):
+        if method not in ("simple", "wilder"):
+            raise ValueError(f"Unknown RSI method: {method}")
+        self.period = period
+        self.method = method
+        self.source = source
+        self._closes = deque(maxlen=2)   # last two closes, to revise the last delta
+        self._gain = RollingMean(period)
+        self._loss = RollingMean(period)
+        # Wilder state: current and previous smoothed averages
+        self._avg = None
+        self._prev_avg = None
+
+    def _push(self, delta: float, revise: bool):
+        gain, loss = max(delta, 0.0), max(-delta, 0.0)
+        # Wilder smoothing starts with the delta after the seeding one; a
+        # revise of the seeding delta itself re-seeds from the plain averages.
+        base = self._prev_avg if revise else self._avg
+        if self.method == "simple" or base is None:
+            if revise:
+                self._gain.revise(gain)
+                self._loss.revise(loss)
+            else:
+                self._gain.update(gain)
+                self._loss.update(loss)
+            if self.method == "wilder" and self._gain.ready:
+                self._avg = (self._gain.value, self._loss.value)
+            return
+        if not revise:
+            self._prev_avg = self._avg
+        g0, l0 = self._prev_avg
+        p = self.period
+        self._avg = ((g0 * (p - 1) + gain) / p, (l0 * (p - 1) + loss) / p)
+
+    def update(self, bar) -> float:
+        x = _field(bar, self.source)
+        self._closes.append(x)
+        if len(self._closes) == 2:
+            self._push(self._closes[1] - self._closes[0], revise=False)
+        return self.value
+
+    def revise(self, bar) -> float:
+        if not self._closes:
+            return self.update(bar)
+        x = _field(bar, self.source)
+        self._closes[-1] = x
+        if len(self._closes) == 2:
+            self._push(self._closes[1] - self._closes[0], revise=True)
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self._gain.ready
+
+    @property
+    def value(self) -> float:
+        if not self.ready:
+            return float("nan")
+        if self.method == "wilder":
+            avg_gain, avg_loss = self._avg
+        else:
+            avg_gain, avg_loss = self._gain.value, self._loss.value
+        if avg_loss == 0:
+            return 100.0
+        return 100.0 - (100.0 / (1.0 + avg_gain / avg_loss))
+
+
+class ATR:
+    """Simple-average true range over `period` bars; the first bar's TR is high-low."""
+
+    def __init__(self, period: int = 14):
+        self.period = period
+        self._closes = deque(maxlen=2)   # previous and last close
+        self._tr = RollingMean(period)
+
+    @staticmethod
+    def _true_range(bar, prev_close) -> float:
+        high, low = float(bar["high"]), float(bar["low"])
+        if prev_close is None:
+            return high - low
+        return max(high - low, abs(high - prev_close), abs(low - prev_close))
+
+    def update(self, bar) -> float:
+        prev_close = self._closes[-1] if self._closes else None
+        self._closes.append(float(bar["close"]))
+        return self._tr.update(self._true_range(bar, prev_close))
+
+    def revise(self, bar) -> float:
+        if not self._closes:
+            return self.update(bar)
+        prev_close = self._closes[0] if len(self._closes) == 2 else None
+        self._closes[-1] = float(bar["close"])
+        return self._tr.revise(self._true_range(bar, prev_close))
+
+    @property
+    def ready(self) -> bool:
+        return self._tr.ready
+
+    @property
+    def value(self) -> float:
+        return self._tr.value
+
+
+class Lagged:
+    """
+    Feeds the wrapped indicator with each bar only once the next bar arrives,
+    so `value` covers the bars *before* the most recent one (e.g. the
+    mean-reversion bands, which exclude the current candle).
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self._pending = None
+
+    def update(self, bar) -> float:
+        if self._pending is not None:
+            self.inner.update(self._pending)
+        self._pending = bar
+        return self.value
+
+    def revise(self, bar) -> float:
+        self._pending = bar
+        return self.value
+
+    @property
+    def ready(self) -> bool:
+        return self.inner.ready
+
+    @property
+    def value(self) -> float:
+        return self.inner.value
+
+
+class IndicatorFeed:
+    """
+    Keeps a set of streaming indicators in sync with kline windows fetched on
+    every tick. Only bars newer than the last seen open_time are fed; a bar
+    with the same open_time as the last one revises it. If the window no
+    longer overlaps what was seen (first run, or a gap), every indicator is
+    rebuilt from the window.
+    """
+
+    FIELDS = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, factories: Dict[str, callable]):
+        """
+        factories: name → zero-argument callable returning a fresh indicator,
+        e.g. {"atr_14": lambda: ATR(14)}.
+        """
+        self.factories = factories
+        self.indicators = {}
+        self.bars_seen = 0
+        self.last_open_time = None
+        self.reset()
+
+    def reset(self):
+        self.indicators = {name: make() for name, make in self.factories.items()}
+        self.bars_seen = 0
+        self.last_open_time = None
+
+    def _bar(self, cols: dict, i: int) -> dict:
+        return {k: v[i] for k, v in cols.items()}
+
+    def sync(self, df) -> "IndicatorFeed":
+        """Feed the rows of df (DataFrame or KlineWindow) not seen yet."""
+        n = len(df)
+        if n == 0:
+            return self
+        times = np.asarray(df["open_time"])
+        cols = {k: np.asarray(df[k], dtype=np.float64) for k in self.FIELDS if k in df}
+
+        if self.last_open_time is None or times[0] > self.last_open_time:
+            # Nothing seen yet, or a gap: rebuild from the whole window
+            self.reset()
+            start = 0
+        else:
+            start = int(np.searchsorted(times, self.last_open_time, side="left"))
+            if start < n and times[start] == self.last_open_time:
+                bar = self._bar(cols, start)
+                for ind in self.indicators.values():
+                    ind.revise(bar)
+                start += 1
+
+        for i in range(start, n):
+            bar = self._bar(cols, i)
+            for ind in self.indicators.values():
+                ind.update(bar)
+            self.bars_seen += 1
+        self.last_open_time = times[-1]
+        return self
+
+    def __getitem__(self, name: str) -> float:
+        return self.indicators[name].value
@@ -21,7 +21,7 @@ class TradeHistoryManager:
         """
         Args:
           symbol: e.g. "XRPUSDT"
-          client: your FuturesClient instance with .client.futures_account_trades()
+          client: your FuturesClient instance (or SimFuturesClient), with .get_account_trades()
           cache_dir: folder to store CSV cache
           cache_filename: override default filename
           refresh_interval: seconds before re-fetching from API
@@ -43,16 +43,16 @@ class TradeHistoryManager:
     def _fetch_all_trades(self) -> pd.DataFrame:
         """
         Fetch full trade history via Binance Futures API.
-        Expects client.client.futures_account_trades(symbol).
+        Expects client.get_account_trades(symbol).
         """
         records = []
-        trades = self.client.client.futures_account_trades(symbol=self.symbol)
+        trades = self.client.get_account_trades(self.symbol)
         for t in trades:
             qty = float(t["qty"])
             records.append({
                 "timestamp": pd.to_datetime(t["time"], unit="ms", utc=True),
                 "symbol": t["symbol"],
-                "side": "BUY" if qty > 0 else "SELL",
+                "side": t.get("side") or ("BUY" if qty > 0 else "SELL"),
                 "price": float(t["price"]),
                 "qty": abs(qty)
             })